@@ -0,0 +1,108 @@
+"""
+响应编码基准测试
+
+对比默认编码（FastAPI JSONResponse: jsonable_encoder + json.dumps，无压缩）
+与 codec 编码（orjson + gzip/zstd）在节点上下文类负载上的序列化耗时和传输字节数。
+
+用法:
+    python benchmark/bench_response_encoding.py [--nodes 30] [--repeat 20]
+"""
+
+import argparse
+import json
+import time
+
+from simple_llm_workflow import codec
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+
+TOOL_OUTPUT = "\n".join(f"    - {h}~{h + 1} : 0.{h:02d}" for h in range(24)) * 8
+
+
+def build_context_payload(num_nodes: int) -> list[dict]:
+    """构造与 NodeContextResponse 结构一致的负载，消息随节点数线性增长"""
+    messages = [{"role": "user", "content": "总结今天我做了什么"}]
+    contexts = []
+    for node_id in range(1, num_nodes + 1):
+        before = list(messages)
+        messages.append({
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"name": "get_daily_stats", "args": {"module": "all"}, "id": f"call_{node_id}"}]
+        })
+        messages.append({"role": "tool", "content": TOOL_OUTPUT, "tool_call_id": f"call_{node_id}"})
+        messages.append({"role": "assistant", "content": f"节点 {node_id} 的分析结论。" * 20})
+        contexts.append({
+            "node_id": node_id,
+            "node_name": f"node_{node_id}",
+            "thread_id": "main",
+            "thread_messages_before": before,
+            "thread_messages_after": list(messages),
+            "llm_input": "请分析以上数据。" * 10,
+            "llm_output": messages[-1]["content"],
+            "tool_calls": [],
+            "data_out_content": None,
+        })
+    return contexts
+
+
+def encode_default(payload) -> bytes:
+    """FastAPI 默认 JSONResponse 的编码路径"""
+    if jsonable_encoder is not None:
+        payload = jsonable_encoder(payload)
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def bench(fn, payload, repeat: int) -> tuple[float, bytes]:
+    best = float("inf")
+    result = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=30, help="节点数量（默认 30）")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数，取最小值（默认 20）")
+    args = parser.parse_args()
+
+    contexts = build_context_payload(args.nodes)
+    # 最后一个节点的上下文 (/context) 与全部节点的批量负载
+    cases = {
+        "context (last node)": contexts[-1],
+        f"batch ({args.nodes} contexts)": contexts,
+    }
+
+    print(f"JSON 后端: {'orjson' if codec.orjson else 'json (stdlib)'} | "
+          f"可用压缩: {', '.join(codec.SUPPORTED_ENCODINGS)}")
+    print()
+    header = f"{'payload':<24} {'encoding':<22} {'cpu ms':>9} {'bytes':>12} {'ratio':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for name, payload in cases.items():
+        base_ms, base_body = bench(encode_default, payload, args.repeat)
+        print(f"{name:<24} {'default json':<22} {base_ms:>9.2f} {len(base_body):>12,} {1.0:>7.2f}")
+
+        fast_ms, fast_body = bench(codec.dumps, payload, args.repeat)
+        print(f"{'':<24} {'codec.dumps':<22} {fast_ms:>9.2f} {len(fast_body):>12,} "
+              f"{len(base_body) / len(fast_body):>7.2f}")
+
+        for encoding in codec.SUPPORTED_ENCODINGS:
+            ms, body = bench(lambda p: codec.compress(codec.dumps(p), encoding), payload, args.repeat)
+            print(f"{'':<24} {'codec.dumps + ' + encoding:<22} {ms:>9.2f} {len(body):>12,} "
+                  f"{len(base_body) / len(body):>7.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,10 @@ Simple LLM Playground - 统一入口
 
 import sys
 import os
+import json
 import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
 
 # 确保能找到包
@@ -28,10 +30,58 @@ else:
 os.chdir(BASE_DIR)
 
 
+# =============================================================================
+# 启动耗时统计
+# =============================================================================
+class StartupTimer:
+    """启动耗时统计：按阶段记录开始时间与耗时，可在多个线程中使用"""
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._phases: list[tuple[str, str, float, float]] = []  # (阶段, 线程, 开始偏移, 耗时)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个启动阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._phases.append((name, threading.current_thread().name, start - self._origin, duration))
+
+    def report(self):
+        """打印各阶段耗时（同时运行的阶段可能相互重叠）"""
+        total = time.perf_counter() - self._origin
+        with self._lock:
+            phases = sorted(self._phases, key=lambda p: p[2])
+        print("⏱️ 启动耗时:")
+        for name, thread, offset, duration in phases:
+            print(f"   {name:<16} [{thread:<10}] 开始 +{offset * 1000:>6.0f}ms  耗时 {duration * 1000:>6.0f}ms")
+        print(f"   {'总计（窗口显示）':<16} {total * 1000:.0f}ms")
+        print()
+
+
+startup_timer = StartupTimer()
+
+
+# =============================================================================
+# 后端
+# =============================================================================
 def start_backend(port: int = 8001):
-    """启动后端服务"""
-    import uvicorn
-    from simple_llm_workflow.server.backend_api import app
+    """
+    启动后端服务（在后台线程中运行）
+
+    配置加载和后端模块导入都在此线程中完成，与主线程的 Qt 导入并行。
+    """
+    with startup_timer.phase("加载配置"):
+        setup_from_config()
+
+    with startup_timer.phase("导入后端模块"):
+        import uvicorn
+        from simple_llm_workflow.server.backend_api import app
     
     # 禁用uvicorn的日志输出到stdout（避免打包后的窗口问题）
     config = uvicorn.Config(
@@ -44,18 +94,68 @@ def start_backend(port: int = 8001):
     server.run()
 
 
-def start_frontend():
-    """启动前端UI"""
-    from PyQt5.QtWidgets import QApplication
-    from simple_llm_workflow.qt_front.main_ui import MainWindow
-    from simple_llm_workflow.qt_front.utils import DARK_STYLESHEET
+def wait_for_backend(
+    port: int,
+    backend_thread: threading.Thread,
+    timeout: float = 30.0,
+    interval: float = 0.05
+):
+    """
+    轮询健康检查接口 (GET /)，直到后端就绪
+
+    Raises:
+        RuntimeError: 后端线程在就绪前退出
+        TimeoutError: 超时仍未就绪
+    """
+    import urllib.error
+    import urllib.request
+
+    url = f"http://127.0.0.1:{port}/"
+    # 本地请求不走系统代理
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    deadline = time.perf_counter() + timeout
+
+    while time.perf_counter() < deadline:
+        if not backend_thread.is_alive():
+            raise RuntimeError("后端服务启动失败，请查看上方的错误信息")
+        try:
+            with opener.open(url, timeout=0.5) as resp:
+                if resp.status == 200 and json.loads(resp.read()).get("status") == "running":
+                    return
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+        time.sleep(interval)
+
+    raise TimeoutError(f"后端服务在 {timeout:.0f} 秒内未就绪: {url}")
+
+
+# =============================================================================
+# 前端
+# =============================================================================
+def start_frontend(port: int, backend_thread: threading.Thread):
+    """
+    启动前端UI（阻塞主线程）
+
+    Qt 模块导入与 QApplication 创建和后端启动并行，
+    主窗口初始化时会请求工具列表，因此在后端就绪后再创建。
+    """
+    with startup_timer.phase("导入 Qt 模块"):
+        from PyQt5.QtWidgets import QApplication
+        from simple_llm_workflow.qt_front.main_ui import MainWindow
+        from simple_llm_workflow.qt_front.utils import DARK_STYLESHEET
     
-    app = QApplication(sys.argv)
-    app.setStyleSheet(DARK_STYLESHEET)
+    with startup_timer.phase("创建 QApplication"):
+        app = QApplication(sys.argv)
+        app.setStyleSheet(DARK_STYLESHEET)
     
-    window = MainWindow()
-    window.show()
+    with startup_timer.phase("等待后端就绪"):
+        wait_for_backend(port, backend_thread)
     
+    with startup_timer.phase("创建主窗口"):
+        window = MainWindow()
+        window.show()
+    
+    startup_timer.report()
     sys.exit(app.exec_())
 
 
@@ -63,7 +163,7 @@ def setup_from_config():
     """从 tools_config.py 加载配置"""
     from simple_llm_workflow.tool_loader import find_tools_config, load_tools_from_file
     from simple_llm_workflow.server.executor_manager import executor_manager
-    from simple_llm_workflow.main import create_llm_factory, setup_test_tools
+    from simple_llm_workflow.main import create_llm_factory_from_config, setup_test_tools
     
     # 查找并加载配置文件
     config_path = find_tools_config()
@@ -76,16 +176,10 @@ def setup_from_config():
             executor_manager.register_tool(name, tool)
         
         # 设置LLM工厂
-        if config["llm_factory"]:
-            executor_manager.set_llm_factory(config["llm_factory"])
-        elif config["llm_config"]:
-            # 从配置创建LLM工厂
-            llm_factory = create_llm_factory(**config["llm_config"])
-            executor_manager.set_llm_factory(llm_factory)
-        else:
-            # 使用默认LLM配置
-            llm_factory = create_llm_factory()
-            executor_manager.set_llm_factory(llm_factory)
+        executor_manager.set_llm_factory(create_llm_factory_from_config(config))
+        
+        # 记录配置文件路径，后端启动后监听其变更并热重载
+        executor_manager.tools_config_path = config_path
     else:
         # 没有找到配置文件，使用内置测试工具
         from simple_llm_workflow.main import setup_llm_factory
@@ -103,11 +197,6 @@ def main():
         print("=" * 60)
         print()
         
-        # 加载配置
-        print("📦 正在加载配置...")
-        setup_from_config()
-        print()
-        
         # 从config获取端口
         try:
             from simple_llm_workflow import config
@@ -115,18 +204,15 @@ def main():
         except:
             port = 8001
         
-        # 在后台线程启动后端
-        print(f"🚀 正在启动后端服务 (端口 {port})...")
-        backend_thread = threading.Thread(target=start_backend, args=(port,), daemon=True)
+        # 在后台线程加载配置并启动后端
+        print(f"🚀 正在加载配置并启动后端服务 (端口 {port})...")
+        backend_thread = threading.Thread(target=start_backend, args=(port,), daemon=True, name="backend")
         backend_thread.start()
         
-        # 等待后端启动
-        time.sleep(1.5)
-        
-        # 启动前端（阻塞主线程）
+        # 启动前端（阻塞主线程，后端就绪后显示窗口）
         print("🎨 正在启动前端UI...")
         print()
-        start_frontend()
+        start_frontend(port, backend_thread)
         
     except Exception as e:
         print()
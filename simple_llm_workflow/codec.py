@@ -0,0 +1,125 @@
+"""
+前后端共享的 JSON 编解码与压缩工具
+
+- JSON: 优先使用 orjson（可选依赖），不可用时回退到标准库 json
+- 压缩: 支持 gzip（标准库）与 zstd（可选依赖 zstandard），按 Accept-Encoding 协商
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+
+# 超过该字节数的响应才进行压缩（小响应压缩收益低于开销）
+COMPRESS_MIN_SIZE = 1024
+
+# gzip 压缩等级：偏向速度，节点上下文等高度重复数据在低等级下已有很好的压缩率
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+# 按优先级排列的可用编码
+SUPPORTED_ENCODINGS: tuple[str, ...] = ("zstd", "gzip") if zstandard else ("gzip",)
+
+# 客户端发送的 Accept-Encoding 头
+ACCEPT_ENCODING = ", ".join(SUPPORTED_ENCODINGS)
+
+
+# =============================================================================
+# JSON
+# =============================================================================
+def _default(obj: Any) -> Any:
+    """处理标准 JSON 不支持的类型"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """序列化为 UTF-8 编码的 JSON 字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """反序列化 JSON"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# =============================================================================
+# 压缩
+# =============================================================================
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """
+    根据请求的 Accept-Encoding 选择压缩编码
+
+    Returns:
+        选中的编码名称，不可压缩时返回 None
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """按指定编码压缩"""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
+
+
+def decompress(data: bytes, encoding: str | None) -> bytes:
+    """按 Content-Encoding 解压，未压缩时原样返回"""
+    if not encoding or encoding == "identity":
+        return data
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd" and zstandard is not None:
+        # 流式解压，兼容未写入 content size 的帧
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"不支持的压缩编码: {encoding}")
@@ -0,0 +1,382 @@
+# 多供应商 LLM 路由
+# 持有多组供应商配置，按滚动延迟和错误率选择最快的健康端点，出错时自动切换到下一个端点
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from langchain_core.runnables import Runnable
+
+
+class RouteScope:
+    """
+    当前节点的 LLM 调用作用域，由执行器在执行节点时设置
+
+    - routes: 每次 LLM 调用的路由记录（供应商、延迟、切换）
+    - events: 其他 LLM 包装层的记录（如上下文压缩）
+    - llm_inputs: 每次 LLM 调用实际发送的输入（消息列表）
+    """
+    __slots__ = ("node_name", "thread_id", "routes", "events", "llm_inputs")
+
+    def __init__(self, node_name: str, thread_id: Optional[str] = None):
+        self.node_name = node_name
+        self.thread_id = thread_id
+        self.routes: list[dict] = []
+        self.events: list[dict] = []
+        self.llm_inputs: list = []
+
+
+_route_scope: contextvars.ContextVar[Optional[RouteScope]] = contextvars.ContextVar(
+    "llm_route_scope", default=None
+)
+
+
+@contextmanager
+def route_scope(node_name: str, thread_id: Optional[str] = None):
+    """
+    节点路由作用域，作用域内的 LLM 调用按节点固定规则路由，并把路由记录追加到 scope.routes
+
+    Example:
+        >>> with route_scope(node.node_name, node.thread_id) as scope:
+        ...     content = await handler(node)
+        >>> state.metrics["llm_routes"] = scope.routes
+    """
+    scope = RouteScope(node_name, thread_id)
+    token = _route_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _route_scope.reset(token)
+
+
+def current_route_scope() -> Optional[RouteScope]:
+    """当前节点的路由作用域，不在节点执行中时返回 None"""
+    return _route_scope.get()
+
+
+# =============================================================================
+# 端点统计
+# =============================================================================
+class EndpointStats:
+    """
+    单个端点的滚动统计
+
+    - 最近 window 次调用的延迟与成败
+    - 连续失败 failure_threshold 次后进入冷却期，冷却期内不参与正常路由
+    """
+
+    def __init__(self, window: int = 20, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._samples: deque[tuple[float, bool]] = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((latency, ok))
+            if ok:
+                self._consecutive_failures = 0
+                self._cooldown_until = 0.0
+            else:
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= self.failure_threshold:
+                    self._cooldown_until = time.monotonic() + self.cooldown
+
+    @property
+    def calls(self) -> int:
+        return len(self._samples)
+
+    @property
+    def error_rate(self) -> float:
+        samples = list(self._samples)
+        if not samples:
+            return 0.0
+        return sum(1 for _, ok in samples if not ok) / len(samples)
+
+    @property
+    def avg_latency(self) -> Optional[float]:
+        """成功调用的平均延迟，没有成功记录时返回 None"""
+        latencies = [latency for latency, ok in list(self._samples) if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self._cooldown_until
+
+    def score(self) -> float:
+        """路由得分（越小越优先）：未有成功记录的端点得分为 0，优先探测"""
+        latency = self.avg_latency
+        if latency is None:
+            return 0.0
+        return latency * (1.0 + 4.0 * self.error_rate)
+
+    def to_dict(self) -> dict:
+        latency = self.avg_latency
+        return {
+            "calls": self.calls,
+            "error_rate": round(self.error_rate, 3),
+            "avg_latency": round(latency, 3) if latency is not None else None,
+            "healthy": self.healthy(),
+        }
+
+
+class ProviderEndpoint:
+    """路由中的一个供应商端点"""
+
+    def __init__(self, name: str, factory: Callable[..., Any], stats: EndpointStats, model: Optional[str] = None):
+        self.name = name
+        self.factory = factory
+        self.stats = stats
+        self.model = model
+
+    def __repr__(self) -> str:
+        return f"ProviderEndpoint({self.name!r})"
+
+
+# =============================================================================
+# 路由器
+# =============================================================================
+class LLMRouter:
+    """
+    多供应商 LLM 路由器，本身即 LLM 工厂（executor_manager.set_llm_factory 可直接使用）
+
+    - 每次调用时按得分选择最快的健康端点，失败后依次尝试其余端点
+    - 所有端点都在冷却期时，仍按冷却结束时间顺序尝试
+    - pins: 节点名称 -> 供应商名称，固定的节点优先使用指定供应商（失败时同样切换）
+    """
+
+    def __init__(
+        self,
+        providers: list[dict[str, Any]],
+        pins: Optional[dict[str, str]] = None,
+        window: int = 20,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0
+    ):
+        """
+        Args:
+            providers: 供应商配置列表，每项包含 name（可选，默认使用 model）和
+                factory（可选的 LLM 工厂），或传给 create_llm_factory 的参数（model, api_key, base_url 等）
+            pins: 节点名称 -> 供应商名称
+            window: 统计窗口（最近调用次数）
+            failure_threshold: 连续失败多少次后进入冷却
+            cooldown: 冷却时间（秒）
+        """
+        from simple_llm_workflow.main import create_llm_factory
+
+        if not providers:
+            raise ValueError("LLM 路由至少需要一个供应商配置")
+
+        self.endpoints: list[ProviderEndpoint] = []
+        for i, provider in enumerate(providers):
+            config = dict(provider)
+            factory = config.pop("factory", None)
+            name = config.pop("name", None) or config.get("model") or f"provider_{i + 1}"
+            if any(endpoint.name == name for endpoint in self.endpoints):
+                raise ValueError(f"LLM 供应商名称重复: {name}")
+            if factory is None:
+                factory = create_llm_factory(**config)
+            self.endpoints.append(ProviderEndpoint(
+                name, factory, EndpointStats(window, failure_threshold, cooldown), config.get("model")
+            ))
+
+        self.pins = dict(pins or {})
+        unknown = set(self.pins.values()) - {endpoint.name for endpoint in self.endpoints}
+        if unknown:
+            raise ValueError(f"节点固定的供应商不存在: {sorted(unknown)}")
+
+    def __call__(self, **kwargs) -> 'RoutedChatModel':
+        """创建路由 LLM（参数在实际调用时传给所选端点的工厂）"""
+        return RoutedChatModel(self, kwargs)
+
+    def ranked(self, pinned: Optional[str] = None) -> list[ProviderEndpoint]:
+        """按尝试顺序返回端点：固定端点 > 健康端点（按得分）> 冷却中的端点"""
+        healthy = sorted((e for e in self.endpoints if e.stats.healthy()), key=lambda e: e.stats.score())
+        cooling = sorted(
+            (e for e in self.endpoints if not e.stats.healthy()), key=lambda e: e.stats._cooldown_until
+        )
+        order = healthy + cooling
+        if pinned is not None:
+            order.sort(key=lambda e: e.name != pinned)
+        return order
+
+    def pinned_for_current_node(self) -> tuple[Optional[str], Optional[list]]:
+        """当前路由作用域的 (固定供应商, 路由记录列表)"""
+        scope = current_route_scope()
+        if scope is None:
+            return None, None
+        return self.pins.get(scope.node_name), scope.routes
+
+    def stats(self) -> list[dict]:
+        """各端点的统计信息"""
+        return [{"name": e.name, "model": e.model, **e.stats.to_dict()} for e in self.endpoints]
+
+
+class RoutedChatModel(Runnable):
+    """
+    路由 LLM（LangChain Runnable）
+
+    - invoke / ainvoke 在所选端点的实例上调用，失败后切换到下一个端点重试；
+      batch / abatch 与 | 组合由 Runnable 基于 invoke / ainvoke 实现，同样经过路由
+    - stream / astream 在产生第一个分块前失败时切换端点，之后的错误直接抛出
+    - bind_tools / bind / with_structured_output / with_config 被记录下来，在各端点的实例上重放
+    - 各端点的实例按需创建并缓存；其余属性访问转发给当前首选端点的实例
+    """
+
+    def __init__(self, router: LLMRouter, kwargs: dict[str, Any], bindings: tuple = ()):
+        self._router = router
+        self._kwargs = kwargs
+        self._bindings = bindings
+        self._models: dict[str, Any] = {}  # 端点名称 -> 已创建的实例
+
+    def _model(self, endpoint: ProviderEndpoint):
+        model = self._models.get(endpoint.name)
+        if model is None:
+            model = endpoint.factory(**self._kwargs)
+            for name, args, kwargs in self._bindings:
+                model = getattr(model, name)(*args, **kwargs)
+            self._models[endpoint.name] = model
+        return model
+
+    def _bound(self, name: str, *args, **kwargs) -> 'RoutedChatModel':
+        return RoutedChatModel(self._router, self._kwargs, self._bindings + ((name, args, kwargs),))
+
+    def bind_tools(self, *args, **kwargs) -> 'RoutedChatModel':
+        return self._bound("bind_tools", *args, **kwargs)
+
+    def bind(self, **kwargs) -> 'RoutedChatModel':
+        return self._bound("bind", **kwargs)
+
+    def with_structured_output(self, *args, **kwargs) -> 'RoutedChatModel':
+        return self._bound("with_structured_output", *args, **kwargs)
+
+    def with_config(self, config=None, **kwargs) -> 'RoutedChatModel':
+        return self._bound("with_config", config, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._model(self._router.ranked()[0]), name)
+
+    def _record(self, routes: Optional[list], endpoint: ProviderEndpoint, start: float, failures: list[dict]):
+        if routes is not None:
+            routes.append({
+                "provider": endpoint.name,
+                "model": self._kwargs.get("model") or endpoint.model,
+                "latency": round(time.perf_counter() - start, 3),
+                "failovers": failures,
+            })
+
+    @staticmethod
+    def _fail(endpoint: ProviderEndpoint, start: float, error: Exception, failures: list[dict]):
+        endpoint.stats.record(time.perf_counter() - start, False)
+        failures.append({"provider": endpoint.name, "error": f"{type(error).__name__}: {error}"})
+        print(f"⚠️ LLM 供应商 {endpoint.name} 调用失败，切换下一个: {error}")
+
+    def invoke(self, input, config=None, **kwargs):
+        pinned, routes = self._router.pinned_for_current_node()
+        failures: list[dict] = []
+        last_error: Optional[Exception] = None
+        for endpoint in self._router.ranked(pinned):
+            start = time.perf_counter()
+            try:
+                result = self._model(endpoint).invoke(input, config, **kwargs)
+            except Exception as e:
+                self._fail(endpoint, start, e, failures)
+                last_error = e
+                continue
+            endpoint.stats.record(time.perf_counter() - start, True)
+            self._record(routes, endpoint, start, failures)
+            return result
+        raise last_error
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        pinned, routes = self._router.pinned_for_current_node()
+        failures: list[dict] = []
+        last_error: Optional[Exception] = None
+        for endpoint in self._router.ranked(pinned):
+            start = time.perf_counter()
+            try:
+                result = await self._model(endpoint).ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self._fail(endpoint, start, e, failures)
+                last_error = e
+                continue
+            endpoint.stats.record(time.perf_counter() - start, True)
+            self._record(routes, endpoint, start, failures)
+            return result
+        raise last_error
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        pinned, routes = self._router.pinned_for_current_node()
+        failures: list[dict] = []
+        last_error: Optional[Exception] = None
+        for endpoint in self._router.ranked(pinned):
+            start = time.perf_counter()
+            chunks = self._model(endpoint).stream(input, config, **kwargs)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                first = None
+            except Exception as e:
+                self._fail(endpoint, start, e, failures)
+                last_error = e
+                continue
+            if first is not None:
+                yield first
+            yield from chunks
+            endpoint.stats.record(time.perf_counter() - start, True)
+            self._record(routes, endpoint, start, failures)
+            return
+        raise last_error
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        pinned, routes = self._router.pinned_for_current_node()
+        failures: list[dict] = []
+        last_error: Optional[Exception] = None
+        for endpoint in self._router.ranked(pinned):
+            start = time.perf_counter()
+            chunks = self._model(endpoint).astream(input, config, **kwargs)
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                self._fail(endpoint, start, e, failures)
+                last_error = e
+                continue
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+            endpoint.stats.record(time.perf_counter() - start, True)
+            self._record(routes, endpoint, start, failures)
+            return
+        raise last_error
+
+    def __repr__(self) -> str:
+        return f"RoutedChatModel(providers={[e.name for e in self._router.endpoints]})"
+
+
+def create_router_llm_factory(
+    providers: list[dict[str, Any]],
+    pins: Optional[dict[str, str]] = None,
+    **options
+) -> LLMRouter:
+    """
+    创建多供应商路由 LLM 工厂
+
+    Example:
+        >>> factory = create_router_llm_factory(
+        ...     [
+        ...         {"name": "dashscope", "model": "qwen-plus"},
+        ...         {"name": "openai", "model": "gpt-4o", "base_url": "https://api.openai.com/v1"},
+        ...     ],
+        ...     pins={"总结": "openai"},
+        ... )
+        >>> llm = factory(temperature=0.3)
+    """
+    return LLMRouter(providers, pins=pins, **options)
@@ -1,7 +1,6 @@
 from simple_llm_workflow.server.executor_manager import executor_manager
 import os
 from typing import Optional, Type, Callable
-from langchain_openai import ChatOpenAI
 from langchain_core.language_models.chat_models import BaseChatModel
 # 1. 设置 LLM 工厂
 
@@ -12,7 +11,7 @@ from langchain_core.language_models.chat_models import BaseChatModel
 def create_llm_factory(
     model: str = "qwen-plus-2025-12-01",
     api_key: Optional[str] = None,
-    chat_model: Type[BaseChatModel] = ChatOpenAI, 
+    chat_model: Optional[Type[BaseChatModel]] = None,
     enable_search: bool = False,
     enable_thinking: bool = False,
     **base_kwargs
@@ -25,6 +24,7 @@ def create_llm_factory(
     Args:
         model: 模型名称，默认 qwen-plus-2025-12-01
         api_key: API密钥，如果为None则从环境变量读取
+        chat_model: BaseChatModel 子类，默认 ChatOpenAI（首次创建实例时才导入 langchain_openai）
         enable_search: 是否启用联网搜索
         enable_thinking: 是否启用思考模式
         **base_kwargs: 其他预配置的参数
@@ -48,7 +48,7 @@ def create_llm_factory(
         "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
     }
     
-    if not issubclass(chat_model, BaseChatModel):
+    if chat_model is not None and not issubclass(chat_model, BaseChatModel):
         raise ValueError(f"chat_model 必须是 BaseChatModel 的子类，但收到了: {chat_model}")
 
     if enable_search:
@@ -65,15 +65,34 @@ def create_llm_factory(
         """创建新的 LLM 实例"""
         config = {**base_config, "temperature": temperature}
         config.update(kwargs)
-        return chat_model(**config)
+        model_cls = chat_model
+        if model_cls is None:
+            from langchain_openai import ChatOpenAI
+            model_cls = ChatOpenAI
+        return model_cls(**config)
 
     return callback
 
+def create_llm_factory_from_config(config: dict) -> Callable[..., BaseChatModel]:
+    """
+    根据 load_tools_from_file 的结果创建 LLM 工厂
+
+    优先使用 LLM_FACTORY，其次使用 LLM_PROVIDERS（多供应商路由）、LLM_CONFIG，都没有时使用默认配置。
+    """
+    if config["llm_factory"]:
+        return config["llm_factory"]
+    if config.get("llm_providers"):
+        from simple_llm_workflow.llm_router import create_router_llm_factory
+        return create_router_llm_factory(config["llm_providers"], pins=config.get("llm_pins"))
+    if config["llm_config"]:
+        return create_llm_factory(**config["llm_config"])
+    return create_llm_factory()
+
 def setup_llm_factory():
     # api_key = "your_api_key"
     # model = "gpt-4o"
     # llm_factory = create_llm_factory(model,api_key,chat_model=ChatOpenAI)
-    llm_factory = create_llm_factory(chat_model=ChatOpenAI)
+    llm_factory = create_llm_factory()
     executor_manager.set_llm_factory(llm_factory)
 
  
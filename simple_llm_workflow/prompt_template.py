@@ -0,0 +1,181 @@
+# 节点 prompt 模板编译与 LLM 输入记录
+# prompt 中的 {placeholder} 在编译时记录槽位，填充时只拼接片段；
+# 节点实际发送给 LLM 的消息在调用时记录，不再事后重建
+import json
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from langchain_core.runnables import Runnable
+
+from simple_llm_workflow.llm_router import current_route_scope
+
+
+# 与占位符面板的检测规则一致：{字母或下划线开头的标识符}
+PLACEHOLDER_RE = re.compile(r"\{([a-zA-Z_][a-zA-Z0-9_]*)\}")
+
+
+class CompiledPrompt:
+    """
+    编译后的 prompt 模板
+
+    segments 与 slots 交替排列：segments[0] + value(slots[0]) + segments[1] + ...
+    没有占位符的 prompt 只有一个片段，render 直接返回原文。
+    """
+    __slots__ = ("source", "segments", "slots")
+
+    def __init__(self, source: str):
+        self.source = source
+        segments: list[str] = []
+        slots: list[str] = []
+        pos = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            segments.append(source[pos:match.start()])
+            slots.append(match.group(1))
+            pos = match.end()
+        segments.append(source[pos:])
+        self.segments = tuple(segments)
+        self.slots = tuple(slots)
+
+    @property
+    def placeholders(self) -> frozenset[str]:
+        return frozenset(self.slots)
+
+    def render(self, values: Optional[dict[str, str]] = None) -> str:
+        """填充占位符，未提供值的占位符保持原样"""
+        if not self.slots or not values:
+            return self.source
+        parts = [self.segments[0]]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(name)
+            parts.append(value if value is not None else f"{{{name}}}")
+            parts.append(segment)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def compile_prompt(source: str) -> CompiledPrompt:
+    """编译 prompt，相同文本只编译一次（同一计划的多个执行器、参数对比副本共享）"""
+    return CompiledPrompt(source)
+
+
+def normalize_placeholder_values(values: Optional[dict[str, str]]) -> dict[str, str]:
+    """占位符面板的键为 '{name}' 形式，统一为 'name'"""
+    result = {}
+    for key, value in (values or {}).items():
+        name = key[1:-1] if key.startswith("{") and key.endswith("}") else key
+        result[name] = value
+    return result
+
+
+def render_plan(plan: Any, values: Optional[dict[str, str]]) -> Any:
+    """
+    用占位符值填充计划的 task 与各节点的 task_prompt，返回新的计划（原计划不变）
+
+    没有提供值或计划中没有占位符时返回原计划。
+    """
+    values = normalize_placeholder_values(values)
+    if not values:
+        return plan
+    changed = {}
+    task = compile_prompt(plan.task) if plan.task else None
+    if task is not None and task.slots:
+        changed["task"] = task.render(values)
+    nodes = []
+    nodes_changed = False
+    for node in plan.nodes:
+        template = compile_prompt(node.task_prompt) if node.task_prompt else None
+        if template is not None and template.slots:
+            node = node.model_copy(update={"task_prompt": template.render(values)})
+            nodes_changed = True
+        nodes.append(node)
+    if nodes_changed:
+        changed["nodes"] = nodes
+    return plan.model_copy(update=changed) if changed else plan
+
+
+# =============================================================================
+# LLM 输入记录
+# =============================================================================
+def render_messages(messages: Any) -> str:
+    """把 LLM 输入（消息列表或字符串）渲染为展示用的文本"""
+    if isinstance(messages, str):
+        return messages
+    lines = []
+    for msg in messages:
+        content = getattr(msg, "content", msg)
+        text = content if isinstance(content, str) else repr(content)
+        # 只有工具调用的 AIMessage 内容为空，把调用本身渲染出来
+        calls = getattr(msg, "tool_calls", None)
+        if calls:
+            rendered = "; ".join(
+                f"{call.get('name')}({json.dumps(call.get('args', {}), ensure_ascii=False, default=str)})"
+                for call in calls
+            )
+            text = f"{text}\n[tool_calls] {rendered}" if text else f"[tool_calls] {rendered}"
+        lines.append(f"{getattr(msg, 'type', 'text')}: {text}")
+    return "\n".join(lines)
+
+
+class CapturingChatModel(Runnable):
+    """
+    记录 LLM 输入的代理（LangChain Runnable）
+
+    invoke / ainvoke / stream / astream 时把输入追加到当前节点作用域的 llm_inputs，
+    batch 与 | 组合由 Runnable 基于 invoke / ainvoke 实现，同样会记录。
+    位于上下文预算之后，记录的是压缩后实际发送的消息。
+    """
+
+    def __init__(self, model: Any):
+        self._model = model
+
+    def bind_tools(self, *args, **kwargs) -> 'CapturingChatModel':
+        return CapturingChatModel(self._model.bind_tools(*args, **kwargs))
+
+    def bind(self, **kwargs) -> 'CapturingChatModel':
+        return CapturingChatModel(self._model.bind(**kwargs))
+
+    def with_structured_output(self, *args, **kwargs) -> 'CapturingChatModel':
+        return CapturingChatModel(self._model.with_structured_output(*args, **kwargs))
+
+    def with_config(self, config=None, **kwargs) -> 'CapturingChatModel':
+        return CapturingChatModel(self._model.with_config(config, **kwargs))
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+    @staticmethod
+    def _capture(input: Any):
+        scope = current_route_scope()
+        if scope is not None:
+            scope.llm_inputs.append(input)
+
+    def invoke(self, input, config=None, **kwargs):
+        self._capture(input)
+        return self._model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self._capture(input)
+        return await self._model.ainvoke(input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        self._capture(input)
+        yield from self._model.stream(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        self._capture(input)
+        async for chunk in self._model.astream(input, config, **kwargs):
+            yield chunk
+
+    def __repr__(self) -> str:
+        return f"CapturingChatModel({self._model!r})"
+
+
+def wrap_llm_factory(factory: Callable[..., Any]) -> Callable[..., Any]:
+    """包装 LLM 工厂，创建的 LLM 在调用时记录输入"""
+    def capturing_factory(*args, **kwargs):
+        return CapturingChatModel(factory(*args, **kwargs))
+
+    return capturing_factory
@@ -1,23 +1,40 @@
 import requests
 import json
 import asyncio
+import concurrent.futures
+from collections import OrderedDict
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
 
 # 默认端口配置
 from simple_llm_workflow.config import BACKEND_PORT
 
-from typing import Optional
+from typing import Mapping, Optional
 import aiohttp
+from simple_llm_workflow import codec
 from simple_llm_workflow.schemas import (
     InitExecutorRequest, InitExecutorResponse,
     StepExecutorRequest, StepExecutorResponse,
     ExecutorStatusResponse, ExecutionResultResponse,
     HealthCheckResponse, ToolListResponse,
     TerminateExecutorResponse, ListExecutorsResponse,
-    NodeContextResponse
+    NodeContextResponse, NodeMessagesPageResponse,
+    RunAllPatternsRequest, RunAllPatternsResponse,
+    SweepNodeRequest, SweepNodeResponse,
+    SemanticCacheConfig, ContextBudgetConfig,
+    PlanEstimateRequest, PlanEstimateResponse
 )
 
 
+def semantic_cache_config(plans: list[dict], pattern: Optional[str] = None) -> Optional[SemanticCacheConfig]:
+    """根据节点的 semantic_cache 标记生成语义缓存配置，没有节点启用时返回 None"""
+    nodes = []
+    for plan in plans:
+        for node in plan.get("nodes", []):
+            if node.get("semantic_cache") and node.get("node_name") not in nodes:
+                nodes.append(node.get("node_name"))
+    return SemanticCacheConfig(nodes=nodes, pattern=pattern) if nodes else None
+
+
 class APIError(Exception):
     """API 错误"""
     def __init__(self, status_code: int, message: str):
@@ -35,11 +52,17 @@ class ApiClient(QObject):
     def __init__(self, base_url: str = f"http://localhost:{BACKEND_PORT}"):
         self.base_url = base_url.rstrip("/")
         self._session: Optional[aiohttp.ClientSession] = None
+        self._tools_etag: Optional[str] = None  # 工具列表的 ETag
+        self._tools_cache: Optional[ToolListResponse] = None
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """获取或创建 aiohttp session"""
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            # 自行按 Content-Encoding 解压（aiohttp 不一定支持 zstd）
+            self._session = aiohttp.ClientSession(
+                auto_decompress=False,
+                headers={"Accept-Encoding": codec.ACCEPT_ENCODING}
+            )
         return self._session
     
     async def close(self):
@@ -55,6 +78,19 @@ class ApiClient(QObject):
         params: dict = None
     ) -> dict:
         """发送 HTTP 请求"""
+        _, data, _ = await self._request_full(method, endpoint, json_data, params)
+        return data
+    
+    async def _request_full(
+        self,
+        method: str,
+        endpoint: str,
+        json_data: dict = None,
+        params: dict = None,
+        headers: dict = None,
+        timeout: Optional[float] = None
+    ) -> tuple[int, dict, Mapping[str, str]]:
+        """发送 HTTP 请求，返回 (状态码, 数据, 响应头)，304 时数据为空字典；响应头不区分大小写"""
         session = await self._get_session()
         url = f"{self.base_url}{endpoint}"
         
@@ -63,15 +99,27 @@ class ApiClient(QObject):
                 method, 
                 url, 
                 json=json_data,
-                params=params
+                params=params,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout) if timeout else None
             ) as response:
-                data = await response.json()
+                if response.status == 304:
+                    return response.status, {}, response.headers.copy()
+                
+                body = codec.decompress(
+                    await response.read(),
+                    response.headers.get("Content-Encoding")
+                )
+                try:
+                    data = codec.loads(body) if body else {}
+                except ValueError:
+                    data = {"detail": body.decode("utf-8", errors="replace")}
                 
                 if response.status >= 400:
                     error_detail = data.get("detail", str(data))
                     raise APIError(response.status, error_detail)
                 
-                return data
+                return response.status, data, response.headers.copy()
                 
         except aiohttp.ClientError as e:
             raise APIError(0, f"Connection error: {str(e)}")
@@ -90,9 +138,16 @@ class ApiClient(QObject):
     # =========================================================================
     
     async def list_tools(self) -> ToolListResponse:
-        """获取已注册的工具列表"""
-        data = await self._request("GET", "/api/tools")
-        return ToolListResponse(**data)
+        """获取已注册的工具列表（按 ETag 缓存，工具未变化时复用上次结果）"""
+        headers = None
+        if self._tools_etag and self._tools_cache is not None:
+            headers = {"If-None-Match": self._tools_etag}
+        status, data, response_headers = await self._request_full("GET", "/api/tools", headers=headers)
+        if status == 304:
+            return self._tools_cache
+        self._tools_cache = ToolListResponse(**data)
+        self._tools_etag = response_headers.get("ETag")
+        return self._tools_cache
     
     # =========================================================================
     # 执行器生命周期
@@ -102,6 +157,9 @@ class ApiClient(QObject):
         self,
         plan: dict,
         default_tool_limit: int = 1,
+        semantic_cache: Optional[SemanticCacheConfig] = None,
+        context_budget: Optional[ContextBudgetConfig] = None,
+        placeholders: Optional[dict[str, str]] = None,
     ) -> InitExecutorResponse:
         """
         初始化执行器
@@ -109,6 +167,9 @@ class ApiClient(QObject):
         Args:
             plan: 执行计划 (ExecutionPlan 的字典形式)
             default_tool_limit: 默认工具调用次数限制
+            semantic_cache: 语义缓存配置，None 表示不启用
+            context_budget: 线程上下文预算，None 表示不压缩
+            placeholders: 占位符值，由后端在初始化时填充到计划中
             
         Returns:
             InitExecutorResponse: 包含 executor_id, status, node_count, message
@@ -116,6 +177,9 @@ class ApiClient(QObject):
         req = InitExecutorRequest(
             plan=plan,
             default_tool_limit=default_tool_limit,
+            semantic_cache=semantic_cache,
+            context_budget=context_budget,
+            placeholders=placeholders,
         )
         data = await self._request("POST", "/api/executor/init", json_data=req.model_dump(by_alias=True))
         return InitExecutorResponse(**data)
@@ -138,6 +202,41 @@ class ApiClient(QObject):
         data = await self._request("POST", endpoint)
         return ExecutionResultResponse(**data)
     
+    async def run_all_patterns(
+        self,
+        plans: dict[str, dict],
+        default_tool_limit: int = 1,
+        max_concurrency: int = 4,
+        timeout: float = 3600,
+        semantic_cache: Optional[SemanticCacheConfig] = None,
+        placeholders: Optional[dict[str, str]] = None
+    ) -> RunAllPatternsResponse:
+        """
+        并发运行多个 pattern（等待全部完成）
+        
+        Args:
+            plans: pattern 名称 -> 执行计划字典
+            default_tool_limit: 默认工具调用次数限制
+            max_concurrency: 同时运行的 pattern 数上限
+            timeout: 请求超时时间（秒），运行全部 pattern 可能耗时较长
+            semantic_cache: 语义缓存配置，None 表示不启用
+            placeholders: 占位符值，应用于所有 pattern
+            
+        Returns:
+            RunAllPatternsResponse: 每个 pattern 的状态、输出和 tokens 使用量
+        """
+        req = RunAllPatternsRequest(
+            plans=plans,
+            default_tool_limit=default_tool_limit,
+            max_concurrency=max_concurrency,
+            semantic_cache=semantic_cache,
+            placeholders=placeholders
+        )
+        _, data, _ = await self._request_full(
+            "POST", "/api/plans/run-all", json_data=req.model_dump(), timeout=timeout
+        )
+        return RunAllPatternsResponse(**data)
+    
     async def step_executor(self, executor_id: str, node_id: int = None) -> StepExecutorResponse:
         """
         单步执行
@@ -198,23 +297,63 @@ class ApiClient(QObject):
     # 节点上下文
     # =========================================================================
     
-    async def get_node_context(self, executor_id: str, node_id: int) -> NodeContextResponse:
+    async def get_node_context(
+        self,
+        executor_id: str,
+        node_id: int,
+        include_messages: bool = True
+    ) -> NodeContextResponse:
         """
         获取节点上下文
         
         Args:
             executor_id: 执行器 ID
             node_id: 节点 ID
+            include_messages: 是否包含执行前后的线程消息（False 时只返回数量，消息分页获取）
             
         Returns:
             NodeContextResponse: 节点上下文信息
         """
         data = await self._request(
             "GET", 
-            f"/api/executor/{executor_id}/nodes/{node_id}/context"
+            f"/api/executor/{executor_id}/nodes/{node_id}/context",
+            params=None if include_messages else {"include_messages": "false"}
         )
         return NodeContextResponse(**data)
     
+    async def get_node_messages(
+        self,
+        executor_id: str,
+        node_id: int,
+        which: str = "before",
+        offset: int = 0,
+        limit: int = 50,
+        search: Optional[str] = None
+    ) -> NodeMessagesPageResponse:
+        """
+        分页获取节点执行前/后的线程消息
+        
+        Args:
+            executor_id: 执行器 ID
+            node_id: 节点 ID
+            which: "before" 或 "after"
+            offset: 起始下标
+            limit: 数量（0 表示只查询总数或搜索结果）
+            search: 可选，返回所有包含该文本的消息下标
+            
+        Returns:
+            NodeMessagesPageResponse: 消息页
+        """
+        params = {"which": which, "offset": offset, "limit": limit}
+        if search:
+            params["search"] = search
+        data = await self._request(
+            "GET",
+            f"/api/executor/{executor_id}/nodes/{node_id}/context/messages",
+            params=params
+        )
+        return NodeMessagesPageResponse(**data)
+    
     async def rerun_node(self, executor_id: str, node_id: int) -> StepExecutorResponse:
         """
         重新执行指定节点
@@ -234,6 +373,64 @@ class ApiClient(QObject):
         )
         return StepExecutorResponse(**data)
     
+    async def sweep_node(
+        self,
+        executor_id: str,
+        node_id: int,
+        models: list[str] = None,
+        temperatures: list[float] = None,
+        top_ps: list[float] = None,
+        max_concurrency: int = 4,
+        timeout: float = 1800
+    ) -> SweepNodeResponse:
+        """
+        参数对比：使用参数网格并发重新执行节点（不影响执行器当前状态）
+        
+        Args:
+            executor_id: 执行器 ID
+            node_id: 节点 ID（必须已执行过）
+            models / temperatures / top_ps: 各维度的取值，组合为笛卡尔积
+            max_concurrency: 同时运行的数量上限
+            timeout: 请求超时时间（秒）
+            
+        Returns:
+            SweepNodeResponse: 每组参数的输出、延迟和 tokens 使用量
+        """
+        req = SweepNodeRequest(
+            models=models or None,
+            temperatures=temperatures or None,
+            top_ps=top_ps or None,
+            max_concurrency=max_concurrency
+        )
+        _, data, _ = await self._request_full(
+            "POST",
+            f"/api/executor/{executor_id}/nodes/{node_id}/sweep",
+            json_data=req.model_dump(exclude_none=True),
+            timeout=timeout
+        )
+        return SweepNodeResponse(**data)
+    
+    async def estimate_plan(
+        self,
+        plan: dict,
+        default_tool_limit: int = 1,
+        **options
+    ) -> PlanEstimateResponse:
+        """
+        执行前估算计划的 token 使用量（不调用 LLM）
+        
+        Args:
+            plan: 执行计划 (ExecutionPlan 的字典形式)
+            default_tool_limit: 默认工具调用次数限制
+            **options: PlanEstimateRequest 的其他字段，如 context_window, input_price_per_1k
+            
+        Returns:
+            PlanEstimateResponse: 每个节点/线程的 token 预测和警告
+        """
+        req = PlanEstimateRequest(plan=plan, default_tool_limit=default_tool_limit, **options)
+        data = await self._request("POST", "/api/plans/estimate", json_data=req.model_dump())
+        return PlanEstimateResponse(**data)
+    
     async def get_executor_messages(
         self, 
         executor_id: str, 
@@ -311,22 +508,35 @@ try:
         """
         异步任务工作线程
         
-        在独立线程中运行 asyncio 事件循环，用于 PyQt 应用
+        在独立线程中运行 asyncio 事件循环，用于 PyQt 应用。
+        
+        除了 run_async 的独立任务外，同一逻辑通道（如“当前节点上下文”“执行器状态”）的请求可以合并：
+        - run_latest: 最新优先，取消通道上未完成的请求，只投递最后一次请求的结果
+        - run_single_flight: 单飞，通道上已有请求在进行时丢弃新请求
+        通道请求带有递增序号，结果在 GUI 线程中与通道当前序号比较，过期结果直接丢弃。
         """
         
         # 信号定义
         taskCompleted = pyqtSignal(str, object)  # (task_id, result)
         taskFailed = pyqtSignal(str, str)  # (task_id, error_message)
+        # 通道请求结束 (channel, seq, task_id, 是否成功, 结果或错误信息)，由 GUI 线程过滤过期结果
+        _channelDone = pyqtSignal(str, int, str, bool, object)
         
         def __init__(self, parent=None):
             super().__init__(parent)
-            self.loop: Optional[asyncio.AbstractEventLoop] = None
+            # 事件循环在构造时创建：线程启动前提交的协程会排队，循环开始运行后执行
+            self.loop: Optional[asyncio.AbstractEventLoop] = asyncio.new_event_loop()
             self._running = False
-            self._pending_tasks: dict[str, asyncio.Future] = {}
+            self._pending_tasks: dict[str, concurrent.futures.Future] = {}
+            # 通道状态只在 GUI 线程中读写
+            self._channel_seq: dict[str, int] = {}
+            self._channel_futures: dict[str, concurrent.futures.Future] = {}
+            self._channelDone.connect(self._on_channel_done)
         
         def run(self):
             """线程主函数"""
-            self.loop = asyncio.new_event_loop()
+            if self.loop is None or self.loop.is_closed():
+                self.loop = asyncio.new_event_loop()
             asyncio.set_event_loop(self.loop)
             self._running = True
             
@@ -341,7 +551,13 @@ try:
             if self.loop and self._running:
                 self.loop.call_soon_threadsafe(self.loop.stop)
         
-        def run_async(self, coro, task_id: str = None) -> asyncio.Future:
+        def _submit(self, coro) -> concurrent.futures.Future:
+            if not self.loop or self.loop.is_closed():
+                coro.close()
+                raise RuntimeError("Event loop is not running")
+            return asyncio.run_coroutine_threadsafe(coro, self.loop)
+        
+        def run_async(self, coro, task_id: str = None) -> concurrent.futures.Future:
             """
             在事件循环中运行协程
             
@@ -352,10 +568,7 @@ try:
             Returns:
                 Future 对象
             """
-            if not self.loop or not self._running:
-                raise RuntimeError("Event loop is not running")
-            
-            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+            future = self._submit(coro)
             
             if task_id:
                 self._pending_tasks[task_id] = future
@@ -364,14 +577,84 @@ try:
                     try:
                         result = f.result()
                         self.taskCompleted.emit(task_id, result)
+                    except concurrent.futures.CancelledError:
+                        pass
                     except Exception as e:
                         self.taskFailed.emit(task_id, str(e))
                     finally:
-                        self._pending_tasks.pop(task_id, None)
+                        # 相同 task_id 可能已被新任务占用
+                        if self._pending_tasks.get(task_id) is f:
+                            self._pending_tasks.pop(task_id, None)
                 
                 future.add_done_callback(on_done)
             
             return future
+        
+        def cancel_tasks(self, prefix: str) -> int:
+            """取消 task_id 以 prefix 开头的未完成任务（不会发出结果信号），返回取消的数量"""
+            cancelled = 0
+            for task_id, future in list(self._pending_tasks.items()):
+                if task_id.startswith(prefix) and future.cancel():
+                    cancelled += 1
+            return cancelled
+        
+        # ---------- 请求通道 ----------
+        
+        def run_latest(self, channel: str, coro, task_id: str) -> concurrent.futures.Future:
+            """
+            最新优先：取消通道上未完成的请求（在事件循环中取消对应的 Task），
+            之前请求已返回但尚未投递的结果也会被丢弃
+            """
+            self.cancel_channel(channel)
+            return self._run_channel(channel, coro, task_id)
+        
+        def run_single_flight(self, channel: str, coro, task_id: str) -> concurrent.futures.Future:
+            """单飞：通道上已有请求在进行时不再发起新请求，返回进行中的 Future"""
+            in_flight = self._channel_futures.get(channel)
+            if in_flight is not None and not in_flight.done():
+                coro.close()
+                return in_flight
+            return self._run_channel(channel, coro, task_id)
+        
+        def cancel_channel(self, channel: str):
+            """取消通道上未完成的请求，并使其尚未投递的结果失效"""
+            self._channel_seq[channel] = self._channel_seq.get(channel, 0) + 1
+            future = self._channel_futures.pop(channel, None)
+            if future is not None:
+                future.cancel()
+        
+        def _run_channel(self, channel: str, coro, task_id: str) -> concurrent.futures.Future:
+            seq = self._channel_seq.get(channel, 0) + 1
+            self._channel_seq[channel] = seq
+            future = self._submit(coro)
+            self._channel_futures[channel] = future
+            
+            def on_done(f):
+                # 在事件循环线程中执行，结果交给 GUI 线程按序号过滤
+                if f.cancelled():
+                    return
+                try:
+                    self._channelDone.emit(channel, seq, task_id, True, f.result())
+                except Exception as e:
+                    self._channelDone.emit(channel, seq, task_id, False, str(e))
+            
+            future.add_done_callback(on_done)
+            return future
+        
+        def is_pending(self, task_id: str) -> bool:
+            """run_async 提交的任务是否仍未完成"""
+            return task_id in self._pending_tasks
+        
+        def _on_channel_done(self, channel: str, seq: int, task_id: str, ok: bool, payload):
+            if seq != self._channel_seq.get(channel):
+                return  # 已被更新的请求取代
+            future = self._channel_futures.get(channel)
+            if future is not None and future.done():
+                self._channel_futures.pop(channel, None)
+            if ok:
+                self.taskCompleted.emit(task_id, payload)
+            else:
+                self.taskFailed.emit(task_id, payload)
     
     
     class ExecutorController(QObject):
@@ -391,8 +674,25 @@ try:
         statusUpdated = pyqtSignal(dict)
         contextLoaded = pyqtSignal(dict)
         contextFailed = pyqtSignal(str)
+        messagesPageLoaded = pyqtSignal(dict)  # 上下文消息分页 / 搜索结果
+        messagesPageFailed = pyqtSignal(str)
         rerunCompleted = pyqtSignal(dict)  # 节点重新执行完成
         rerunFailed = pyqtSignal(str)      # 节点重新执行失败
+        runAllCompleted = pyqtSignal(dict) # 全部 pattern 运行完成
+        runAllFailed = pyqtSignal(str)     # 全部 pattern 运行请求失败
+        sweepCompleted = pyqtSignal(dict)  # 参数对比完成
+        sweepFailed = pyqtSignal(str)      # 参数对比失败
+        estimateCompleted = pyqtSignal(dict)  # token 估算完成
+        estimateFailed = pyqtSignal(str)      # token 估算失败
+        toolsLoaded = pyqtSignal(list)        # 工具列表（ToolInfo 字典）
+        toolsFailed = pyqtSignal(str)         # 工具列表加载失败
+        
+        # 请求通道（见 AsyncWorker.run_latest / run_single_flight）
+        CONTEXT_CHANNEL = "context"  # 最新优先：快速切换节点时只显示最后选中节点的上下文
+        STATUS_CHANNEL = "status"  # 单飞：轮询时上一次请求未返回则跳过
+        MESSAGES_SEARCH_CHANNEL = "messages_search"  # 最新优先：上下文内查找
+        
+        CONTEXT_CACHE_SIZE = 128  # 缓存的节点上下文数（不含消息，消息仍分页获取）
         
         def __init__(self, base_url: str = f"http://localhost:{BACKEND_PORT}", parent=None):
             super().__init__(parent)
@@ -400,6 +700,12 @@ try:
             self.worker = AsyncWorker()
             self.current_executor_id: Optional[str] = None
             
+            # 节点上下文缓存 (executor_id, node_id, version) -> 上下文 dict
+            # 同一版本的上下文不会变化；节点重新执行或状态轮询发现版本变化时失效
+            self._context_cache: OrderedDict[tuple[str, int, int], dict] = OrderedDict()
+            self._node_versions: dict[int, int] = {}  # 当前执行器已知的节点上下文版本
+            self._context_generation = 0  # 失效时递增，之前发出的请求结果不再写入缓存
+            
             # 连接工作线程信号
             self.worker.taskCompleted.connect(self._on_task_completed)
             self.worker.taskFailed.connect(self._on_task_failed)
@@ -416,6 +722,9 @@ try:
         def reset_session(self):
             """重置会话 (用于处理 404 等由于后端重启导致的 ID 失效)"""
             self.current_executor_id = None
+            for channel in (self.CONTEXT_CHANNEL, self.STATUS_CHANNEL, self.MESSAGES_SEARCH_CHANNEL):
+                self.worker.cancel_channel(channel)
+            self._clear_context_cache()
         
         def _on_task_completed(self, task_id: str, result):
             """处理任务完成"""
@@ -427,17 +736,37 @@ try:
             
             if task_id == "init":
                 self.current_executor_id = result_dict.get("executor_id")
+                self._clear_context_cache()
                 self.initCompleted.emit(result_dict)
             elif task_id == "step":
+                node_context = result_dict.get("node_context")
+                self._remember_context(node_context)
                 self.stepCompleted.emit(result_dict)
+                if node_context:
+                    self._prefetch_adjacent(node_context.get("node_id"))
             elif task_id == "run":
                 self.runCompleted.emit(result_dict)
             elif task_id == "status":
+                self._sync_node_versions(result_dict.get("node_states", []))
                 self.statusUpdated.emit(result_dict)
             elif task_id.startswith("context_"):
-                self.contextLoaded.emit(result_dict)
+                self._remember_context(result_dict, generation=int(task_id.rsplit("_", 1)[1]))
+                self._deliver_context(result_dict)
+            elif task_id.startswith("prefetch_"):
+                self._remember_context(result_dict, generation=int(task_id.rsplit("_", 1)[1]))
+            elif task_id.startswith("messages_"):
+                self.messagesPageLoaded.emit(result_dict)
             elif task_id.startswith("rerun_"):
+                self._remember_context(result_dict.get("node_context"))
                 self.rerunCompleted.emit(result_dict)
+            elif task_id == "run_all":
+                self.runAllCompleted.emit(result_dict)
+            elif task_id.startswith("sweep_"):
+                self.sweepCompleted.emit(result_dict)
+            elif task_id == "estimate":
+                self.estimateCompleted.emit(result_dict)
+            elif task_id == "tools":
+                self.toolsLoaded.emit(result_dict.get("tools", []))
         
         def _on_task_failed(self, task_id: str, error: str):
             """处理任务失败"""
@@ -449,12 +778,35 @@ try:
                 self.runFailed.emit(error)
             elif task_id.startswith("context_"):
                 self.contextFailed.emit(error)
+            elif task_id.startswith("prefetch_"):
+                pass  # 预取失败（如节点尚未执行）不影响界面
+            elif task_id.startswith("messages_"):
+                self.messagesPageFailed.emit(error)
             elif task_id.startswith("rerun_"):
                 self.rerunFailed.emit(error)
+            elif task_id == "run_all":
+                self.runAllFailed.emit(error)
+            elif task_id.startswith("sweep_"):
+                self.sweepFailed.emit(error)
+            elif task_id == "estimate":
+                self.estimateFailed.emit(error)
+            elif task_id == "tools":
+                self.toolsFailed.emit(error)
         
-        def init_executor(self, plan: dict):
-            """初始化执行器"""
-            coro = self.api_client.init_executor(plan)
+        def init_executor(
+            self,
+            plan: dict,
+            context_budget: Optional[dict] = None,
+            pattern: Optional[str] = None,
+            placeholders: Optional[dict[str, str]] = None
+        ):
+            """初始化执行器（pattern 用于区分语义缓存，占位符由后端填充）"""
+            coro = self.api_client.init_executor(
+                plan,
+                semantic_cache=semantic_cache_config([plan], pattern),
+                context_budget=ContextBudgetConfig(**context_budget) if context_budget else None,
+                placeholders=placeholders or None
+            )
             self.worker.run_async(coro, "init")
         
         def step_executor(self):
@@ -478,15 +830,54 @@ try:
             if not self.current_executor_id:
                 return
             coro = self.api_client.get_executor_status(self.current_executor_id)
-            self.worker.run_async(coro, "status")
+            self.worker.run_single_flight(self.STATUS_CHANNEL, coro, "status")
         
         def get_node_context(self, node_id: int):
-            """获取节点上下文"""
+            """
+            获取节点上下文
+            
+            已缓存当前版本时直接发出 contextLoaded；否则取消之前未返回的上下文请求，只投递最后一次请求的结果
+            """
             if not self.current_executor_id:
                 self.contextFailed.emit("No executor initialized")
                 return
-            coro = self.api_client.get_node_context(self.current_executor_id, node_id)
-            self.worker.run_async(coro, f"context_{node_id}")
+            cached = self._cached_context(node_id)
+            if cached is not None:
+                self.worker.cancel_channel(self.CONTEXT_CHANNEL)
+                self._deliver_context(cached)
+                return
+            # 线程消息由上下文面板按可见范围分页获取
+            coro = self.api_client.get_node_context(self.current_executor_id, node_id, include_messages=False)
+            self.worker.run_latest(self.CONTEXT_CHANNEL, coro, f"context_{node_id}_{self._context_generation}")
+        
+        def prefetch_node_contexts(self, node_ids: list[int]):
+            """在后台预取节点上下文，只写入缓存，不发出 contextLoaded"""
+            if not self.current_executor_id:
+                return
+            for node_id in node_ids:
+                task_id = f"prefetch_{node_id}_{self._context_generation}"
+                if self._cached_context(node_id) is not None or self.worker.is_pending(task_id):
+                    continue
+                coro = self.api_client.get_node_context(self.current_executor_id, node_id, include_messages=False)
+                self.worker.run_async(coro, task_id)
+        
+        def cancel_node_context(self):
+            """取消未返回的上下文请求（如选中了未执行的节点）"""
+            self.worker.cancel_channel(self.CONTEXT_CHANNEL)
+        
+        def get_node_messages(self, node_id: int, which: str, offset: int, limit: int, search: Optional[str] = None):
+            """分页获取节点上下文消息，search 不为空时同时返回匹配的消息下标"""
+            if not self.current_executor_id:
+                self.messagesPageFailed.emit("No executor initialized")
+                return
+            coro = self.api_client.get_node_messages(
+                self.current_executor_id, node_id, which, offset, limit, search
+            )
+            task_id = f"messages_{node_id}_{which}_{offset}_{search or ''}"
+            if search:
+                self.worker.run_latest(self.MESSAGES_SEARCH_CHANNEL, coro, task_id)
+            else:
+                self.worker.run_async(coro, task_id)
         
         def terminate(self):
             """终止当前执行器"""
@@ -494,15 +885,144 @@ try:
                 coro = self.api_client.terminate_executor(self.current_executor_id)
                 self.worker.run_async(coro, "terminate")
                 self.current_executor_id = None
+                self._clear_context_cache()
         
         def rerun_node(self, node_id: int):
             """重新执行指定节点"""
             if not self.current_executor_id:
                 self.rerunFailed.emit("No executor initialized")
                 return
+            # 重新执行会删除该节点及之后节点的上下文
+            self._invalidate_contexts_from(node_id)
             coro = self.api_client.rerun_node(self.current_executor_id, node_id)
             self.worker.run_async(coro, f"rerun_{node_id}")
 
+        def run_all_patterns(
+            self,
+            plans: dict[str, dict],
+            max_concurrency: int = 4,
+            placeholders: Optional[dict[str, str]] = None
+        ):
+            """并发运行多个 pattern（与当前执行器相互独立）"""
+            coro = self.api_client.run_all_patterns(
+                plans, max_concurrency=max_concurrency,
+                semantic_cache=semantic_cache_config(list(plans.values())),
+                placeholders=placeholders or None
+            )
+            self.worker.run_async(coro, "run_all")
+
+        def sweep_node(self, node_id: int, grid: dict):
+            """参数对比：grid 包含 models / temperatures / top_ps 列表"""
+            if not self.current_executor_id:
+                self.sweepFailed.emit("No executor initialized")
+                return
+            coro = self.api_client.sweep_node(self.current_executor_id, node_id, **grid)
+            self.worker.run_async(coro, f"sweep_{node_id}")
+
+        def estimate_plan(self, plan: dict, **options):
+            """执行前估算 token 使用量（不需要初始化执行器）"""
+            coro = self.api_client.estimate_plan(plan, **options)
+            self.worker.run_async(coro, "estimate")
+        
+        def list_tools(self):
+            """加载工具列表（ApiClient 按 ETag 缓存，工具未变化时复用上次结果）"""
+            self.worker.run_async(self.api_client.list_tools(), "tools")
+        
+        # ---------- 节点上下文缓存 ----------
+        
+        def _deliver_context(self, context: dict):
+            # 面板即将重新加载消息列表，之前节点的消息页请求已无用
+            self.worker.cancel_tasks("messages_")
+            self.worker.cancel_channel(self.MESSAGES_SEARCH_CHANNEL)
+            self.contextLoaded.emit(context)
+        
+        def _cached_context(self, node_id: int) -> Optional[dict]:
+            version = self._node_versions.get(node_id)
+            if not version:
+                return None
+            key = (self.current_executor_id, node_id, version)
+            context = self._context_cache.get(key)
+            if context is not None:
+                self._context_cache.move_to_end(key)
+            return context
+        
+        def _remember_context(self, context: Optional[dict], generation: Optional[int] = None):
+            """
+            缓存节点上下文
+            
+            Args:
+                context: 上下文 dict（来自上下文接口，或单步 / 重新执行的响应）
+                generation: 请求发出时的缓存代数，与当前不符说明期间上下文已失效，不缓存
+            """
+            if not context or not self.current_executor_id:
+                return
+            if generation is not None and generation != self._context_generation:
+                return
+            node_id = context.get("node_id")
+            version = context.get("version", 0)
+            known = self._node_versions.get(node_id, 0)
+            if node_id is None or not version or version < known:
+                return
+            if "thread_messages_before_count" not in context:
+                # 单步 / 重新执行返回完整消息，缓存时只保留数量，消息仍由面板分页获取
+                before = context.get("thread_messages_before") or []
+                after = context.get("thread_messages_after") or []
+                context = {
+                    **context,
+                    "thread_messages_before": [],
+                    "thread_messages_after": [],
+                    "thread_messages_before_count": len(before),
+                    "thread_messages_after_count": len(after),
+                }
+            if version > known:
+                self._drop_cached(node_id)
+                self._node_versions[node_id] = version
+            key = (self.current_executor_id, node_id, version)
+            self._context_cache[key] = context
+            self._context_cache.move_to_end(key)
+            while len(self._context_cache) > self.CONTEXT_CACHE_SIZE:
+                self._context_cache.popitem(last=False)
+        
+        def _drop_cached(self, node_id: int):
+            for key in [k for k in self._context_cache if k[1] == node_id]:
+                del self._context_cache[key]
+        
+        def _sync_node_versions(self, node_states: list[dict]):
+            """状态轮询中节点的 context_version 变化时丢弃旧版本的缓存"""
+            for state in node_states:
+                node_id = state.get("node_id")
+                version = state.get("context_version")
+                if node_id is None or version is None:
+                    continue
+                known = self._node_versions.get(node_id, 0)
+                if version == 0 and known:
+                    # 上下文已被删除（节点被重置）
+                    self._drop_cached(node_id)
+                    del self._node_versions[node_id]
+                elif version > known:
+                    self._drop_cached(node_id)
+                    self._node_versions[node_id] = version
+        
+        def _invalidate_contexts_from(self, node_id: int):
+            self._context_generation += 1
+            for nid in [n for n in self._node_versions if n >= node_id]:
+                self._drop_cached(nid)
+                del self._node_versions[nid]
+        
+        def _clear_context_cache(self):
+            self._context_generation += 1
+            self._context_cache.clear()
+            self._node_versions.clear()
+        
+        def _prefetch_adjacent(self, node_id: Optional[int]):
+            """单步完成后预取相邻节点：前一个节点，以及已执行过的后一个节点"""
+            if node_id is None:
+                return
+            neighbors = [nid for nid in (node_id - 1, node_id + 1) if nid >= 1]
+            self.prefetch_node_contexts([
+                nid for nid in neighbors if nid < node_id or self._node_versions.get(nid)
+            ])
+
 except ImportError:
     # PyQt5 不可用时，这些类将不会被定义
     pass
@@ -1,8 +1,26 @@
-from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QTextBrowser
+import html
+from typing import Optional
+
+from PyQt5.QtWidgets import (QGroupBox, QVBoxLayout, QHBoxLayout, QTextBrowser, QWidget, QLabel,
+                             QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor
 from simple_llm_workflow.qt_front.utils import CollapsibleSection
+from simple_llm_workflow.qt_front.message_view import MessageContextView
 from simple_llm_workflow.schemas import NodeProperties
+
+# LLM 输入/输出超过该长度时默认折叠，点击链接展开
+TEXT_COLLAPSE_CHARS = 4000
+
+
 class NodeContextPanel(QGroupBox):
     """用于显示节点线程上下文信息的面板"""
+    
+    # 参数对比请求 {"models": [...], "temperatures": [...], "top_ps": [...]}
+    sweepRequested = pyqtSignal(dict)
+    # 上下文消息分页请求 (node_id, which, offset, limit, search)
+    messagesRequested = pyqtSignal(int, str, int, int, str)
+    
     def __init__(self):
         super().__init__("节点上下文")
         self.main_layout = QVBoxLayout()
@@ -11,16 +29,29 @@ class NodeContextPanel(QGroupBox):
         
         # 上下文消息部分
         self.context_section = CollapsibleSection("上下文信息")
-        self.context_browser = QTextBrowser()
-        self.context_browser.setMinimumHeight(300)
-        self.context_browser.setMaximumHeight(1500)
-        self.context_browser.setPlaceholderText("暂无上下文数据")
-        self.context_section.set_content(self.context_browser)
+        context_widget = QWidget()
+        context_layout = QVBoxLayout(context_widget)
+        context_layout.setContentsMargins(0, 0, 0, 0)
+        self.context_header = QLabel("暂无上下文数据")
+        self.context_header.setTextFormat(Qt.RichText)
+        context_layout.addWidget(self.context_header)
+        self.message_view = MessageContextView()
+        self.message_view.setMinimumHeight(300)
+        self.message_view.setMaximumHeight(1500)
+        self.message_view.messagesRequested.connect(self._on_messages_requested)
+        self.message_view.searchRequested.connect(self._on_search_requested)
+        context_layout.addWidget(self.message_view)
+        self.context_section.set_content(context_widget)
         self.main_layout.addWidget(self.context_section)
+        self._context_node_id: Optional[int] = None
+        self._context_data: dict = {}
+        self._expanded_texts: set[str] = set()
         
         # LLM 输入提示词部分
         self.prompt_section = CollapsibleSection("LLM 输入提示")
         self.prompt_browser = QTextBrowser()
+        self.prompt_browser.setOpenLinks(False)
+        self.prompt_browser.anchorClicked.connect(self._on_expand_link)
         self.prompt_browser.setMinimumHeight(600)
         self.prompt_browser.setMaximumHeight(1500)
         self.prompt_browser.setPlaceholderText("暂无提示词数据")
@@ -30,12 +61,19 @@ class NodeContextPanel(QGroupBox):
         # 节点输出部分
         self.output_section = CollapsibleSection("节点输出")
         self.output_browser = QTextBrowser()
+        self.output_browser.setOpenLinks(False)
+        self.output_browser.anchorClicked.connect(self._on_expand_link)
         self.output_browser.setMinimumHeight(600)
         self.output_browser.setMaximumHeight(1500)
         self.output_browser.setPlaceholderText("暂无输出数据")
         self.output_section.set_content(self.output_browser)
         self.main_layout.addWidget(self.output_section)
         
+        # 参数对比部分
+        self.sweep_section = CollapsibleSection("参数对比")
+        self.sweep_section.set_content(self._create_sweep_widget())
+        self.main_layout.addWidget(self.sweep_section)
+        
         # 添加拉伸量以将各部分推向顶部
         self.main_layout.addStretch()
         
@@ -54,10 +92,11 @@ class NodeContextPanel(QGroupBox):
         <b>节点:</b> {node_name}<br>
         <b>线程 ID:</b> {thread_id}<br>
         <b>状态:</b> <i>尚未执行</i><br>
-        <br>
         <i>执行期间上下文消息将显示在此处</i>
         """
-        self.context_browser.setHtml(context_html)
+        self.context_header.setText(context_html)
+        self._context_node_id = None
+        self.message_view.clear()
         
         # 提示词信息
         prompt_html = f"""
@@ -73,7 +112,10 @@ class NodeContextPanel(QGroupBox):
     
     def clear_context(self):
         """清除所有上下文信息"""
-        self.context_browser.clear()
+        self.context_header.setText("暂无上下文数据")
+        self._context_node_id = None
+        self._context_data = {}
+        self.message_view.clear()
         self.prompt_browser.clear()
         self.output_browser.clear()
     
@@ -83,42 +125,46 @@ class NodeContextPanel(QGroupBox):
         
         参数:
             context_data: 包含 node_id, node_name, thread_id,
-                         thread_messages_before, thread_messages_after,
+                         thread_messages_before, thread_messages_after（或 *_count 分页数量）,
                          llm_input, llm_output, tool_calls, data_out_content 的字典
         """
         node_name = context_data.get("node_name", "未知")
         node_id = context_data.get("node_id", "?")
         thread_id = context_data.get("thread_id", "main")
         
-        # 格式化上下文消息
-        messages_before = context_data.get("thread_messages_before", [])
-        messages_after = context_data.get("thread_messages_after", [])
+        if node_id != self._context_node_id:
+            self._expanded_texts.clear()
+        self._context_node_id = node_id if isinstance(node_id, int) else None
+        self._context_data = context_data
+        
+        # 上下文消息：响应中带有消息时直接显示，否则按数量分页获取
+        messages_before = context_data.get("thread_messages_before") or []
+        messages_after = context_data.get("thread_messages_after") or []
+        counts = {
+            "before": context_data.get("thread_messages_before_count", 0),
+            "after": context_data.get("thread_messages_after_count", 0),
+        }
         
         context_html = f"""
-        <b>节点:</b> {node_name} (ID: {node_id})<br>
-        <b>线程 ID:</b> {thread_id}<br>
-        <b>状态:</b> <span style="color: #4CAF50;">✓ 已执行</span><br><br>
-        <b>执行前消息:</b>
-        <div style="background-color: #2d2d2d; padding: 8px; margin: 4px 0; border-radius: 4px;">
+        <b>节点:</b> {html.escape(str(node_name))} (ID: {node_id})<br>
+        <b>线程 ID:</b> {html.escape(str(thread_id))}<br>
+        <b>状态:</b> <span style="color: #4CAF50;">✓ 已执行</span>
         """
-        
-        if messages_before:
-            for msg in messages_before:
-                role = msg.get("role", "unknown")
-                content = msg.get("content", "")[:200]  # Truncate for preview
-                role_color = "#4CAF50" if role == "assistant" else "#2196F3"
-                context_html += f'<span style="color: {role_color};">[{role}]</span> {content}<br>'
+        self.context_header.setText(context_html)
+        if messages_before or messages_after or not any(counts.values()):
+            self.message_view.load(counts, {"before": messages_before, "after": messages_after})
         else:
-            context_html += "<i>无消息</i>"
-        
-        context_html += "</div>"
-        self.context_browser.setHtml(context_html)
+            self.message_view.load(counts)
         
+        self._render_texts(context_data)
+    
+    def _render_texts(self, context_data: dict):
+        """渲染 LLM 输入提示词和节点输出，长文本默认折叠"""
         # LLM 输入提示词
         llm_input = context_data.get("llm_input", "")
         prompt_html = f"""
         <div style="background-color: #2d2d2d; padding: 8px; border-radius: 4px; white-space: pre-wrap;">
-        {llm_input if llm_input else '<i>无 LLM 输入</i>'}
+        {self._collapsible_text("llm_input", llm_input) if llm_input else '<i>无 LLM 输入</i>'}
         </div>
         """
         self.prompt_browser.setHtml(prompt_html)
@@ -131,7 +177,7 @@ class NodeContextPanel(QGroupBox):
         output_html = f"""
         <b>LLM 输出:</b>
         <div style="background-color: #2d2d2d; padding: 8px; margin: 4px 0; border-radius: 4px; white-space: pre-wrap;">
-        {llm_output if llm_output else '<i>无 LLM 输出</i>'}
+        {self._collapsible_text("llm_output", llm_output) if llm_output else '<i>无 LLM 输出</i>'}
         </div>
         """
         
@@ -158,3 +204,161 @@ class NodeContextPanel(QGroupBox):
             """
         
         self.output_browser.setHtml(output_html)
+    
+    def _collapsible_text(self, key: str, text: str) -> str:
+        """转义文本；超过 TEXT_COLLAPSE_CHARS 且未展开时只显示开头并附加展开链接"""
+        if len(text) <= TEXT_COLLAPSE_CHARS or key in self._expanded_texts:
+            return html.escape(text)
+        return (
+            f"{html.escape(text[:TEXT_COLLAPSE_CHARS])}\n"
+            f'<a href="expand:{key}">… 共 {len(text)} 字符，点击展开</a>'
+        )
+    
+    def _on_expand_link(self, url):
+        if url.scheme() != "expand":
+            return
+        self._expanded_texts.add(url.path())
+        self._render_texts(self._context_data)
+    
+    # ==================== 上下文消息分页 ====================
+    
+    def _on_messages_requested(self, which: str, offset: int, limit: int):
+        if self._context_node_id is not None:
+            self.messagesRequested.emit(self._context_node_id, which, offset, limit, "")
+    
+    def _on_search_requested(self, which: str, query: str):
+        if self._context_node_id is not None:
+            self.messagesRequested.emit(self._context_node_id, which, 0, 0, query)
+    
+    def load_messages_page(self, page: dict):
+        """显示后端返回的消息页（NodeMessagesPageResponse 的字典形式）"""
+        if page.get("node_id") == self._context_node_id:
+            self.message_view.set_page(page)
+    
+    def messages_page_failed(self):
+        self.message_view.page_failed()
+    
+    # ==================== 参数对比 ====================
+    
+    def _create_sweep_widget(self) -> QWidget:
+        """创建参数对比区域：参数输入 + 结果表格 + 选中结果的完整输出"""
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(6)
+        
+        self.sweep_inputs = {}
+        for key, label, placeholder in (
+            ("models", "模型:", "逗号分隔，如 qwen-plus, qwen-max（留空不覆盖）"),
+            ("temperatures", "温度:", "逗号分隔，如 0.2, 0.7, 1.0"),
+            ("top_ps", "top_p:", "逗号分隔，如 0.8, 0.95"),
+        ):
+            row = QHBoxLayout()
+            row_label = QLabel(label)
+            row_label.setFixedWidth(50)
+            line_edit = QLineEdit()
+            line_edit.setPlaceholderText(placeholder)
+            row.addWidget(row_label)
+            row.addWidget(line_edit)
+            layout.addLayout(row)
+            self.sweep_inputs[key] = line_edit
+        
+        self.sweep_btn = QPushButton("⚖️ 对比运行当前节点")
+        self.sweep_btn.setToolTip("从该节点执行前的上下文开始，按参数组合并发重新执行（不影响当前执行状态）")
+        self.sweep_btn.clicked.connect(self._on_sweep_clicked)
+        layout.addWidget(self.sweep_btn)
+        
+        self.sweep_status_label = QLabel("")
+        self.sweep_status_label.setStyleSheet("color: #aaa;")
+        layout.addWidget(self.sweep_status_label)
+        
+        self.sweep_table = QTableWidget(0, 5)
+        self.sweep_table.setHorizontalHeaderLabels(["参数", "状态", "延迟 (s)", "tokens", "输出"])
+        self.sweep_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.sweep_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.sweep_table.setSelectionMode(QTableWidget.SingleSelection)
+        self.sweep_table.verticalHeader().setVisible(False)
+        self.sweep_table.setMinimumHeight(180)
+        header = self.sweep_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(4, QHeaderView.Stretch)
+        self.sweep_table.currentCellChanged.connect(self._on_sweep_row_changed)
+        layout.addWidget(self.sweep_table)
+        
+        self.sweep_output_browser = QTextBrowser()
+        self.sweep_output_browser.setMinimumHeight(200)
+        self.sweep_output_browser.setPlaceholderText("选中一行查看完整输出")
+        layout.addWidget(self.sweep_output_browser)
+        
+        self._sweep_results = []
+        return widget
+    
+    def _parse_sweep_values(self, key: str, cast):
+        text = self.sweep_inputs[key].text()
+        return [cast(v.strip()) for v in text.replace("，", ",").split(",") if v.strip()]
+    
+    def _on_sweep_clicked(self):
+        try:
+            grid = {
+                "models": self._parse_sweep_values("models", str),
+                "temperatures": self._parse_sweep_values("temperatures", float),
+                "top_ps": self._parse_sweep_values("top_ps", float),
+            }
+        except ValueError:
+            self.sweep_status_label.setText("温度和 top_p 必须是数字")
+            return
+        if not any(grid.values()):
+            self.sweep_status_label.setText("请至少填写一项参数")
+            return
+        self.sweepRequested.emit(grid)
+    
+    def set_sweep_running(self, running: bool, message: str = ""):
+        """更新参数对比的运行状态"""
+        self.sweep_btn.setEnabled(not running)
+        self.sweep_status_label.setText(message)
+    
+    def load_sweep_results(self, result: dict):
+        """
+        显示参数对比结果
+        
+        参数:
+            result: SweepNodeResponse 的字典形式
+        """
+        self._sweep_results = result.get("results", [])
+        self.set_sweep_running(
+            False,
+            f"节点 {result.get('node_name', '')} (ID: {result.get('node_id', '?')})："
+            f"{len(self._sweep_results)} 组参数，总耗时 {result.get('elapsed', 0):.1f}s"
+        )
+        
+        self.sweep_table.setRowCount(len(self._sweep_results))
+        for row, item in enumerate(self._sweep_results):
+            failed = item.get("status") != "completed"
+            config = ", ".join(f"{k}={v}" for k, v in item.get("config", {}).items())
+            output = item.get("error") if failed else (item.get("output") or "")
+            values = [
+                config,
+                "❌" if failed else "✓",
+                f"{item.get('latency', 0):.2f}",
+                str((item.get("tokens_usage") or {}).get("total_tokens", 0)),
+                (output or "").replace("\n", " ")[:120],
+            ]
+            for col, value in enumerate(values):
+                cell = QTableWidgetItem(value)
+                if col == 1:
+                    cell.setForeground(QColor("#F44336" if failed else "#4CAF50"))
+                if col in (2, 3):
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.sweep_table.setItem(row, col, cell)
+        
+        if self._sweep_results:
+            self.sweep_table.selectRow(0)
+    
+    def _on_sweep_row_changed(self, row, _col, _prev_row, _prev_col):
+        if row < 0 or row >= len(self._sweep_results):
+            return
+        item = self._sweep_results[row]
+        if item.get("status") == "completed":
+            self.sweep_output_browser.setPlainText(item.get("output") or "")
+        else:
+            self.sweep_output_browser.setPlainText(f"错误: {item.get('error') or ''}")
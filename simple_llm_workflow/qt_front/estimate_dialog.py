@@ -0,0 +1,109 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QTextBrowser, QSplitter, QDialogButtonBox)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+
+
+STATUS_COLORS = {
+    "ok": "#4CAF50",
+    "warning": "#FFC107",
+    "overflow": "#F44336",
+}
+
+
+class PlanEstimateDialog(QDialog):
+    """显示执行前 token 估算结果的对话框"""
+
+    NODE_COLUMNS = ["ID", "节点", "线程", "提示词", "继承上下文", "工具描述", "工具调用",
+                    "输入合计", "单次最大输入", "输出", "窗口占比"]
+    THREAD_COLUMNS = ["线程", "节点数", "输入合计", "输出合计", "单次最大输入", "结束时上下文"]
+
+    def __init__(self, result: dict, parent=None):
+        """
+        参数:
+            result: PlanEstimateResponse 的字典形式
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Token 估算")
+        self.resize(1000, 620)
+
+        layout = QVBoxLayout(self)
+
+        # 汇总信息
+        summary_text = (
+            f"预计输入 {result.get('total_input_tokens', 0):,} tokens　"
+            f"输出 {result.get('total_output_tokens', 0):,} tokens　"
+            f"上下文窗口 {result.get('context_window', 0):,}"
+        )
+        if result.get("estimated_cost"):
+            summary_text += f"　预计费用 {result['estimated_cost']:.4f}"
+        summary = QLabel(summary_text)
+        summary.setStyleSheet("font-weight: bold; padding: 4px;")
+        layout.addWidget(summary)
+
+        splitter = QSplitter(Qt.Vertical)
+        layout.addWidget(splitter)
+
+        # 节点表格
+        nodes = result.get("nodes", [])
+        self.node_table = self._create_table(self.NODE_COLUMNS, [
+            [
+                node.get("node_id"), node.get("node_name", ""), node.get("thread_id", ""),
+                node.get("prompt_tokens", 0), node.get("inherited_tokens", 0),
+                node.get("tool_schema_tokens", 0), node.get("tool_calls", 0),
+                node.get("input_tokens", 0), node.get("peak_input_tokens", 0),
+                node.get("output_tokens", 0), f"{node.get('context_ratio', 0):.0%}",
+            ]
+            for node in nodes
+        ])
+        for row, node in enumerate(nodes):
+            color = QColor(STATUS_COLORS.get(node.get("status"), "#4CAF50"))
+            self.node_table.item(row, len(self.NODE_COLUMNS) - 1).setForeground(color)
+        splitter.addWidget(self.node_table)
+
+        # 线程表格
+        threads = result.get("threads", [])
+        self.thread_table = self._create_table(self.THREAD_COLUMNS, [
+            [
+                thread.get("thread_id", ""), thread.get("nodes", 0), thread.get("input_tokens", 0),
+                thread.get("output_tokens", 0), thread.get("peak_input_tokens", 0),
+                thread.get("final_tokens", 0),
+            ]
+            for thread in threads
+        ])
+        splitter.addWidget(self.thread_table)
+
+        # 警告
+        self.warnings_browser = QTextBrowser()
+        warnings = result.get("warnings", [])
+        self.warnings_browser.setPlainText(
+            "\n".join(f"⚠️ {w}" for w in warnings) if warnings else "✓ 没有节点可能超出上下文窗口"
+        )
+        splitter.addWidget(self.warnings_browser)
+        splitter.setSizes([320, 150, 100])
+
+        hint = QLabel("估算基于字符数近似和预设的回复/工具结果长度，仅供参考。")
+        hint.setStyleSheet("color: #aaa;")
+        layout.addWidget(hint)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    @staticmethod
+    def _create_table(columns: list[str], rows: list[list]) -> QTableWidget:
+        table = QTableWidget(len(rows), len(columns))
+        table.setHorizontalHeaderLabels(columns)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.setSelectionBehavior(QTableWidget.SelectRows)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        for row, values in enumerate(rows):
+            for col, value in enumerate(values):
+                if isinstance(value, int):
+                    cell = QTableWidgetItem(f"{value:,}")
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                else:
+                    cell = QTableWidgetItem(str(value))
+                table.setItem(row, col, cell)
+        return table
@@ -12,12 +12,13 @@ import os
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGroupBox, QProgressBar,
-     QMessageBox
+     QMessageBox, QSpinBox, QComboBox
 )
 from PyQt5.QtCore import pyqtSignal
 
 
 from simple_llm_workflow.qt_front.api_client import ExecutorController
+from simple_llm_workflow.qt_front.estimate_dialog import PlanEstimateDialog
 
 
 class ExecutionControlPanel(QWidget):
@@ -45,6 +46,8 @@ class ExecutionControlPanel(QWidget):
         self.current_executor_id = None
         self.is_executing = False
         self._plan_data = None  # 保存当前执行计划
+        self._pattern: str | None = None  # 当前计划所属的 pattern
+        self._placeholders: dict[str, str] = {}  # 占位符值，初始化时发送给后端
         self._selected_node_id = None  # 当前选中的节点 ID
         
         self._init_ui()
@@ -103,8 +106,30 @@ class ExecutionControlPanel(QWidget):
         self.rerun_btn.clicked.connect(self.rerun_node)
         row3.addWidget(self.rerun_btn)
         
+        self.estimate_btn = QPushButton("📊 估算 Tokens")
+        self.estimate_btn.setToolTip("运行前静态估算每个节点的输入/输出 tokens，并检查是否可能超出上下文窗口")
+        self.estimate_btn.clicked.connect(self.estimate_plan)
+        row3.addWidget(self.estimate_btn)
+        
         control_layout.addLayout(row3)
         
+        # 第四行：线程上下文预算（初始化时生效）
+        row4 = QHBoxLayout()
+        row4.addWidget(QLabel("上下文预算:"))
+        self.budget_spin = QSpinBox()
+        self.budget_spin.setRange(0, 1000000)
+        self.budget_spin.setSingleStep(1000)
+        self.budget_spin.setSpecialValueText("不限制")
+        self.budget_spin.setSuffix(" tokens")
+        self.budget_spin.setToolTip("每个线程发送给 LLM 的最大 tokens，超出时在调用前压缩历史消息（初始化时生效）")
+        row4.addWidget(self.budget_spin)
+        self.budget_strategy_combo = QComboBox()
+        self.budget_strategy_combo.addItem("截断最旧", "truncate")
+        self.budget_strategy_combo.addItem("仅保留最近", "keep_recent")
+        self.budget_strategy_combo.addItem("LLM 摘要", "summarize")
+        row4.addWidget(self.budget_strategy_combo)
+        control_layout.addLayout(row4)
+        
         main_layout.addWidget(control_group)
         
         # === 状态显示区域 ===
@@ -165,33 +190,33 @@ class ExecutionControlPanel(QWidget):
         self.controller.statusUpdated.connect(self._on_status_updated)
         self.controller.rerunCompleted.connect(self._on_rerun_completed)
         self.controller.rerunFailed.connect(self._on_rerun_failed)
+        self.controller.estimateCompleted.connect(self._on_estimate_completed)
+        self.controller.estimateFailed.connect(self._on_estimate_failed)
+        self.controller.toolsLoaded.connect(self._on_tools_loaded)
+        self.controller.toolsFailed.connect(self._on_tools_failed)
     
     def load_tools(self):
         """
         从后端加载可用工具列表
         
-        加载成功后会发出 toolsLoaded 信号
+        由 ApiClient.list_tools 按 ETag 缓存，工具未变化时直接使用上次的列表。
+        加载完成后会发出 toolsLoaded 信号（失败时为空列表）
         """
-        try:
-            import requests
-            from simple_llm_workflow.config import BACKEND_PORT
-            
-            response = requests.get(f"http://localhost:{BACKEND_PORT}/api/tools", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                tools = data.get("tools", [])
-                print(f"Loaded {len(tools)} tools from backend")
-                self.toolsLoaded.emit(tools)
-            else:
-                print(f"Failed to load tools: HTTP {response.status_code}")
-                self.toolsLoaded.emit([])
-        except Exception as e:
-            print(f"Error loading tools: {e}")
-            self.toolsLoaded.emit([])
-    
-    def set_plan(self, plan_data: dict):
-        """设置要执行的计划"""
+        self.controller.list_tools()
+    
+    def _on_tools_loaded(self, tools: list):
+        print(f"Loaded {len(tools)} tools from backend")
+        self.toolsLoaded.emit(tools)
+    
+    def _on_tools_failed(self, error: str):
+        print(f"Error loading tools: {error}")
+        self.toolsLoaded.emit([])
+    
+    def set_plan(self, plan_data: dict, pattern: str | None = None, placeholders: dict[str, str] | None = None):
+        """设置要执行的计划（计划保持模板形式，占位符值由后端填充）"""
         self._plan_data = plan_data
+        self._pattern = pattern
+        self._placeholders = dict(placeholders or {})
     
     def get_plan_from_nodes(self, nodes_data: list) -> dict:
         """从节点数据构建执行计划"""
@@ -216,7 +241,12 @@ class ExecutionControlPanel(QWidget):
         self.status_label.setStyleSheet("color: #FFC107; font-weight: bold;")
         
         # 调用控制器初始化
-        self.controller.init_executor(self._plan_data)
+        self.controller.init_executor(
+            self._plan_data,
+            context_budget=self.get_context_budget(),
+            pattern=self._pattern,
+            placeholders=self._placeholders
+        )
     
     def step_execute(self):
         """单步执行"""
@@ -269,6 +299,34 @@ class ExecutionControlPanel(QWidget):
         
         self.controller.rerun_node(self._selected_node_id)
     
+    def get_context_budget(self) -> dict | None:
+        """当前的上下文预算设置，不限制时返回 None"""
+        if self.budget_spin.value() <= 0:
+            return None
+        return {
+            "max_tokens": max(self.budget_spin.value(), 256),
+            "strategy": self.budget_strategy_combo.currentData(),
+        }
+    
+    def estimate_plan(self):
+        """估算当前计划的 token 使用量"""
+        self.saveRequested.emit()
+        
+        if not self._plan_data:
+            QMessageBox.warning(self, "警告", "未设置执行计划。请先设计流程。")
+            return
+        
+        self.estimate_btn.setEnabled(False)
+        self.controller.estimate_plan(self._plan_data)
+    
+    def _on_estimate_completed(self, result: dict):
+        self.estimate_btn.setEnabled(True)
+        PlanEstimateDialog(result, self).exec_()
+    
+    def _on_estimate_failed(self, error: str):
+        self.estimate_btn.setEnabled(True)
+        QMessageBox.warning(self, "估算失败", error)
+    
     def set_selected_node(self, node_id: int):
         """设置当前选中的节点 ID"""
         self._selected_node_id = node_id
@@ -1,7 +1,11 @@
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QGraphicsLineItem, QGraphicsPathItem, QPushButton, QGraphicsDropShadowEffect, QMenu
-from PyQt5.QtCore import Qt, QRectF, QPointF, pyqtSignal
-from PyQt5.QtGui import QPen, QColor, QWheelEvent, QPainter, QPainterPath, QFont
+from PyQt5.QtCore import Qt, QRectF, QPointF, QLineF, QTimer, pyqtSignal
+from PyQt5.QtGui import QPen, QColor, QWheelEvent, QPainter, QPainterPath, QFont, QFontMetrics
+import bisect
+from collections import OrderedDict
 import json
+import time
+from collections import deque
 from simple_llm_workflow.qt_front.utils import NODE_COLORS, THREAD_COLORS
 from simple_llm_workflow.schemas import (
     NodeProperties, 
@@ -12,10 +16,39 @@ from simple_llm_workflow.schemas import (
 )
 from simple_llm_workflow.thread_manager import ThreadManager
 from typing import Union, Dict, Optional, List
+# 字体缓存：paint 中不再每次创建 QFont
+_FONT_CACHE: dict[tuple, QFont] = {}
+
+
+def _cached_font(size: int, weight: int = QFont.Normal) -> QFont:
+    key = (size, weight)
+    font = _FONT_CACHE.get(key)
+    if font is None:
+        font = _FONT_CACHE[key] = QFont("Segoe UI", size, weight)
+    return font
+
+
+def _elided(font: QFont, text: str, width: float) -> str:
+    """超出宽度的文本以省略号结尾"""
+    return QFontMetrics(font).elidedText(text, Qt.ElideRight, int(width))
+
+
 class NodeItem(QGraphicsItem):
     """
     自定义节点项，具有圆角、页眉和阴影。
+
+    绘制按缩放级别分层（LOD），静态内容使用设备坐标缓存，
+    数据或状态变化时通过 update() / sync_from_data() 使缓存失效。
     """
+    # 细节层次阈值（视图缩放后的细节级别）
+    LOD_SIMPLE = 0.35  # 低于此值只绘制色块和状态
+    LOD_TEXT = 0.6     # 低于此值不绘制小字和按钮
+    
+    # 按钮布局
+    BUTTON_SIZE = 14
+    BUTTON_Y = 61  # 类型文本 (页眉下方 46) 之后
+    THREAD_BUTTON_SIZE = 20
+    
     def __init__(self, node_data: NodeProperties, w=180, h=80, thread_color=None):
         super().__init__()
         # 直接从 node_data 中读取坐标
@@ -49,6 +82,9 @@ class NodeItem(QGraphicsItem):
             
         self.setFlags(flags)
         
+        # 静态内容按设备坐标缓存，平移时不再重新执行 paint
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        
         # 执行状态追踪
         self.execution_status = "pending"  # pending/running/completed/failed
         self.STATUS_COLORS = {
@@ -61,6 +97,7 @@ class NodeItem(QGraphicsItem):
         # 缓存颜色
         self.header_color = QColor()
         self._update_colors()
+        self._update_layout()
 
     def _update_colors(self):
         # 页眉颜色优先级: 线程颜色 > 节点类型颜色
@@ -100,9 +137,57 @@ class NodeItem(QGraphicsItem):
         """获取输入连接点 (左侧)"""
         return self.mapToScene(QPointF(0, self.height / 2))
 
+    def _update_layout(self):
+        """根据节点 ID 和线程位置计算交换按钮区域（与绘制的细节级别无关，点击检测使用）"""
+        node_id = self.node_data.node_id
+        has_left = isinstance(node_id, int) and node_id > 1
+        button_y = self.BUTTON_Y
+        button_size = self.BUTTON_SIZE
+        
+        # 左箭头按钮 (仅当 ID > 1 时显示)
+        self.left_swap_rect = QRectF(10, button_y, button_size, button_size) if has_left else QRectF(0, 0, 0, 0)
+        # ID 文本之后是右箭头按钮 (始终显示，点击时检查有效性)
+        self.id_x_offset = 10 + (button_size + 4 if has_left else 0)
+        self.right_swap_rect = QRectF(self.id_x_offset + 52, button_y, button_size, button_size)
+        
+        # 线程交换按钮: 向上按钮位于节点上方 (仅在 thread_view_index > 0 时显示)，向下按钮位于节点下方
+        size = self.THREAD_BUTTON_SIZE
+        button_x = self.width / 2 - size / 2  # 水平居中
+        if self.node_data.thread_view_index > 0:
+            self.up_thread_rect = QRectF(button_x, -size - 4, size, size)
+        else:
+            self.up_thread_rect = QRectF(0, 0, 0, 0)
+        self.down_thread_rect = QRectF(button_x, self.height + 4, size, size)
+    
+    def sync_from_data(self):
+        """node_data 的 ID、线程或坐标变化后同步位置、边界和缓存的绘制内容"""
+        self.prepareGeometryChange()
+        self._update_layout()
+        self.setPos(self.node_data.x, self.node_data.y)
+        self.update()
+    
+    def bind(self, node_data: NodeProperties, thread_color=None, status: str = "pending"):
+        """复用图元显示另一个节点（虚拟化模式）"""
+        self.node_data = node_data
+        self.thread_color = thread_color
+        self.execution_status = status
+        self.hover_swap_button = None
+        self.sync_from_data()
+
     def paint(self, painter, option, widget):
-        # 更新颜色，以防数据发生变化
+        # 更新颜色和按钮区域，以防数据发生变化
         self._update_colors()
+        self._update_layout()
+        
+        # 细节层次：缩小时只绘制简化的色块
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < self.LOD_SIMPLE:
+            painter.setPen(QPen(QColor("#4a90e2"), 3) if self.isSelected() else Qt.NoPen)
+            painter.setBrush(self.body_color)
+            painter.drawRect(QRectF(0, 0, self.width, self.height))
+            painter.fillRect(QRectF(0, 0, self.width, 30), self.header_color)
+            self._paint_status(painter)
+            return
         
         path = QPainterPath()
         path.addRoundedRect(0, 0, self.width, self.height, 8, 8)
@@ -133,18 +218,23 @@ class NodeItem(QGraphicsItem):
         
         painter.fillPath(header_path, self.header_color)
         
-        # 文本 (名称)
+        # 文本 (名称)，过长时省略
         painter.setPen(self.text_color)
-        font = QFont("Segoe UI", 10, QFont.Bold)
+        font = _cached_font(10, QFont.Bold)
         painter.setFont(font)
         # 位置根据斜体进行微调
-        painter.drawText(QRectF(10, 0, self.width - 20, 30), 
-                         Qt.AlignLeft | Qt.AlignVCenter, 
-                         self.node_data.node_name or "Node")
+        name_rect = QRectF(10, 0, self.width - 20, 30)
+        painter.drawText(name_rect, Qt.AlignLeft | Qt.AlignVCenter,
+                         _elided(font, self.node_data.node_name or "Node", name_rect.width()))
+        
+        if lod < self.LOD_TEXT:
+            # 中等缩放：不绘制小字和按钮
+            self._paint_status(painter)
+            return
         
         # 类型标签 (主体)
         painter.setPen(self.subtext_color)
-        font_small = QFont("Segoe UI", 8)
+        font_small = _cached_font(8)
         painter.setFont(font_small)
         type_text = f"Type: {self.node_data.node_type or 'unknown'}"
         
@@ -156,14 +246,11 @@ class NodeItem(QGraphicsItem):
         # 绘制 ID 及交换按钮
         node_id = self.node_data.node_id
         thread_id = self.node_data.thread_id or 'main'
-        
-        # 计算按钮位置
-        button_size = 14
-        button_y = text_y_start + 15
+        button_size = self.BUTTON_SIZE
+        button_y = self.BUTTON_Y
         
         # 左箭头按钮 (仅当 ID > 1 时显示)
-        if isinstance(node_id, int) and node_id > 1:
-            self.left_swap_rect = QRectF(10, button_y, button_size, button_size)
+        if not self.left_swap_rect.isEmpty():
             # 绘制按钮背景
             if self.hover_swap_button == 'left':
                 painter.setBrush(QColor("#4a90e2"))
@@ -182,20 +269,15 @@ class NodeItem(QGraphicsItem):
                            int(arrow_center_x), int(arrow_center_y - 3))
             painter.drawLine(int(arrow_center_x - 2), int(arrow_center_y),
                            int(arrow_center_x), int(arrow_center_y + 3))
-        else:
-            self.left_swap_rect = QRectF(0, 0, 0, 0)
         
         # ID 文本
-        id_x_offset = 10 + (button_size + 4 if isinstance(node_id, int) and node_id > 1 else 0)
         id_text = f"ID: {node_id}"
         painter.setPen(self.subtext_color)
         painter.setFont(font_small)
-        id_text_rect = QRectF(id_x_offset, button_y, 50, button_size)
+        id_text_rect = QRectF(self.id_x_offset, button_y, 50, button_size)
         painter.drawText(id_text_rect, Qt.AlignLeft | Qt.AlignVCenter, id_text)
         
         # 右箭头按钮 (始终显示，点击时检查有效性)
-        right_button_x = id_x_offset + 52
-        self.right_swap_rect = QRectF(right_button_x, button_y, button_size, button_size)
         # 绘制按钮背景
         if self.hover_swap_button == 'right':
             painter.setBrush(QColor("#4a90e2"))
@@ -216,27 +298,19 @@ class NodeItem(QGraphicsItem):
                        int(arrow_center_x), int(arrow_center_y + 3))
         
         # 线程 ID 文本 (按钮之后)
-        thread_x_offset = right_button_x + button_size + 4
+        thread_x_offset = self.right_swap_rect.right() + 4
         # 计算线程按钮区域，以防重叠
-        thread_button_size = 20  # 从 14 增大以获得更好的可见性
         thread_button_x = self.width - 56  # 为更大的按钮调整位置
         # 限制线程 ID 文本，使其不与按钮重叠
-        thread_text_width = thread_button_x - thread_x_offset - 4  # 在按钮前留出 4px 间隙
+        thread_text_width = max(thread_button_x - thread_x_offset - 4, 50)  # 在按钮前留出 4px 间隙
         painter.setPen(self.subtext_color)
-        painter.drawText(QRectF(thread_x_offset, button_y, max(thread_text_width, 50), button_size),
-                         Qt.AlignLeft | Qt.AlignVCenter, f"| {thread_id}")
+        painter.drawText(QRectF(thread_x_offset, button_y, thread_text_width, button_size),
+                         Qt.AlignLeft | Qt.AlignVCenter,
+                         _elided(font_small, f"| {thread_id}", thread_text_width))
         
         # 绘制线程交换按钮
-        # 向上按钮: 位于节点上方 (负 Y)
-        # 向下按钮: 位于节点下方下方
-        
         # 向上按钮 (仅在 thread_view_index > 0 时显示，表示不是最顶层的线程)
-        thread_view_index = self.node_data.thread_view_index
-        if thread_view_index > 0:
-            # 将向上按钮放置在节点上方 (在节点边界之外)
-            up_button_y = -thread_button_size - 4  # 节点上方 4px 间隙
-            up_button_x = self.width / 2 - thread_button_size / 2  # 水平居中
-            self.up_thread_rect = QRectF(up_button_x, up_button_y, thread_button_size, thread_button_size)
+        if not self.up_thread_rect.isEmpty():
             # 使用更明显的颜色绘制按钮背景
             if self.hover_swap_button == 'up':
                 painter.setBrush(QColor("#5a9fd4"))
@@ -257,15 +331,8 @@ class NodeItem(QGraphicsItem):
                            int(arrow_center_x - 5), int(arrow_center_y + 1))
             painter.drawLine(int(arrow_center_x), int(arrow_center_y - 4),
                            int(arrow_center_x + 5), int(arrow_center_y + 1))
-        else:
-            self.up_thread_rect = QRectF(0, 0, 0, 0)
         
         # 向下按钮 (始终显示，点击时检查有效性)
-        # 将向下按钮放置在节点底部中央 (在节点边界之外)
-        down_button_y = self.height + 4  # 底部 4px 间隙
-        down_button_x = self.width / 2 - thread_button_size / 2  # 水平居中
-        self.down_thread_rect = QRectF(down_button_x, down_button_y, thread_button_size, thread_button_size)
-        
         # 使用更明显的颜色绘制按钮背景
         if self.hover_swap_button == 'down':
             painter.setBrush(QColor("#5a9fd4"))
@@ -292,7 +359,10 @@ class NodeItem(QGraphicsItem):
         painter.setPen(QPen(QColor("#2E7D32"), 1))
         painter.drawEllipse(self.output_anchor_rect)
         
-        # 绘制执行状态指示器 (右上角)
+        self._paint_status(painter)
+
+    def _paint_status(self, painter):
+        """绘制执行状态指示器 (右上角)"""
         if self.execution_status != "pending":
             status_color = self.STATUS_COLORS.get(self.execution_status, QColor("#666666"))
             status_size = 12
@@ -392,18 +462,16 @@ class ConnectionLine(QGraphicsPathItem):
         pen.setCapStyle(Qt.RoundCap)
         self.setPen(pen)
     
-    def _update_path(self):
-        path = QPainterPath()
-        
+    def _endpoint_positions(self) -> tuple[QPointF, QPointF]:
         if isinstance(self.start_item, NodeItem):
             start_pos = self.start_item.get_output_anchor_center()
         else:
             start_pos = self.start_item.get_output_point()
-            
-        if isinstance(self.end_item, NodeItem):
-            end_pos = self.end_item.get_input_point()
-        else:
-            end_pos = self.end_item.get_input_point()
+        return start_pos, self.end_item.get_input_point()
+    
+    def _update_path(self):
+        path = QPainterPath()
+        start_pos, end_pos = self._endpoints = self._endpoint_positions()
         
         # 使用贝塞尔曲线实现平滑连接
         path.moveTo(start_pos)
@@ -414,8 +482,204 @@ class ConnectionLine(QGraphicsPathItem):
         
         self.setPath(path)
     
-    def update_position(self):
+    def update_position(self) -> bool:
+        """端点移动后重建路径，位置未变化时跳过；返回是否重建"""
+        if self._endpoint_positions() == self._endpoints:
+            return False
         self._update_path()
+        return True
+
+
+class ConnectionIndex:
+    """
+    连接线计算用的节点索引（基于节点数据，与是否已创建图元无关）
+
+    按线程保存按 node_id 排序的节点列表，
+    “线程 X 中 ID 小于 N 的最后一个节点”和线程内的相邻节点通过二分查找得到。
+    结构编辑后可用 update_threads 只重建涉及的线程。
+    """
+    def __init__(self, nodes):
+        self.threads: dict[str, list[NodeProperties]] = {}
+        self.thread_node_ids: dict[str, list[int]] = {}
+        self.data_out_parents: dict[str, set[str]] = {}  # 线程 -> 其 data_out 合并到的其他线程
+        self._add_threads(nodes)
+        self._index_data_in()
+    
+    def _add_threads(self, nodes):
+        added = set()
+        for node in sorted(nodes, key=lambda n: n.node_id):
+            tid = node.thread_id or "main"
+            self.threads.setdefault(tid, []).append(node)
+            added.add(tid)
+        for tid in added:
+            thread_nodes = self.threads[tid]
+            self.thread_node_ids[tid] = [n.node_id for n in thread_nodes]
+            self.data_out_parents[tid] = {
+                n.data_out_thread or "main" for n in thread_nodes if n.data_out
+            } - {tid}
+    
+    def _index_data_in(self):
+        # 源节点 ID -> 以其为 data_in 起点的线程首节点
+        self.data_in_targets: dict[int, list[NodeProperties]] = {}
+        for tid, thread_nodes in self.threads.items():
+            if tid == "main":
+                continue  # main 线程不需要输入连线
+            source = self.data_in_source(thread_nodes[0])
+            if source is not None:
+                self.data_in_targets.setdefault(source.node_id, []).append(thread_nodes[0])
+    
+    def update_threads(self, thread_ids: set[str], nodes):
+        """重建指定线程（nodes 为这些线程当前的全部节点），其余线程的列表保持不变"""
+        for tid in thread_ids:
+            self.threads.pop(tid, None)
+            self.thread_node_ids.pop(tid, None)
+            self.data_out_parents.pop(tid, None)
+        self._add_threads(nodes)
+        self._index_data_in()
+    
+    def dependent_threads(self, thread_ids: set[str]) -> set[str]:
+        """
+        连接线受这些线程影响的线程：线程自身、data_in 来自它们的线程、data_out 合并到它们的线程
+        （连接线按起点所在线程归属：同线程连线和合并节点属于起点线程，data_in 连线属于目标线程）
+        """
+        result = set(thread_ids)
+        for tid, thread_nodes in self.threads.items():
+            if tid in result:
+                continue
+            if (tid != "main" and (thread_nodes[0].data_in_thread or "main") in thread_ids) or (
+                self.data_out_parents.get(tid, set()) & thread_ids
+            ):
+                result.add(tid)
+        return result
+    
+    def last_before(self, thread_id: str, node_id: int) -> Optional[NodeProperties]:
+        """线程中 ID 小于 node_id 的最后一个节点"""
+        ids = self.thread_node_ids.get(thread_id)
+        if not ids:
+            return None
+        pos = bisect.bisect_left(ids, node_id)
+        return self.threads[thread_id][pos - 1] if pos > 0 else None
+    
+    def next_in_thread(self, node: NodeProperties) -> Optional[NodeProperties]:
+        """同线程中的下一个节点"""
+        tid = node.thread_id or "main"
+        ids = self.thread_node_ids.get(tid)
+        if not ids:
+            return None
+        pos = bisect.bisect_right(ids, node.node_id)
+        return self.threads[tid][pos] if pos < len(ids) else None
+    
+    def is_thread_head(self, node: NodeProperties) -> bool:
+        ids = self.thread_node_ids.get(node.thread_id or "main")
+        return bool(ids) and ids[0] == node.node_id
+    
+    def data_in_source(self, first_node: NodeProperties) -> Optional[NodeProperties]:
+        """
+        线程首节点的 data_in 源节点：data_in_thread 中 ID 最接近且小于该节点的节点
+        如果 data_in_slice = [A, B] 且 B <= A，则不绘制 data_in 虚线
+        """
+        data_in_slice = first_node.data_in_slice
+        if data_in_slice and len(data_in_slice) >= 2:
+            A, B = data_in_slice[0], data_in_slice[1]
+            if A is not None and B is not None and B <= A:
+                return None
+        return self.last_before(first_node.data_in_thread or "main", first_node.node_id)
+    
+    def thread_neighbors(self, node: NodeProperties) -> list[NodeProperties]:
+        """同线程的前后相邻节点（虚拟化时一并创建，使连接线延伸到视口之外）"""
+        result = []
+        before = self.last_before(node.thread_id or "main", node.node_id)
+        if before is not None:
+            result.append(before)
+        after = self.next_in_thread(node)
+        if after is not None:
+            result.append(after)
+        return result
+
+
+class NodeSpatialIndex:
+    """
+    节点坐标的网格空间索引
+
+    单元格大小与节点间距一致，查询矩形区域时只遍历覆盖到的单元格。
+    """
+    def __init__(self, nodes, cell_w: float = NODE_GAP_X, cell_h: float = THREAD_GAP_Y):
+        self.cell_w = cell_w
+        self.cell_h = cell_h
+        self.cells: dict[tuple[int, int], list[NodeProperties]] = {}
+        for node in nodes:
+            self.cells.setdefault(self._cell(node.x, node.y), []).append(node)
+    
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return int(x // self.cell_w), int(y // self.cell_h)
+    
+    def query(self, rect: QRectF) -> list[NodeProperties]:
+        """与矩形相交的节点（按节点左上角所在单元格近似，调用方应留出边距）"""
+        x0, y0 = self._cell(rect.left(), rect.top())
+        x1, y1 = self._cell(rect.right(), rect.bottom())
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            # 区域覆盖的单元格多于非空单元格时，直接遍历非空单元格
+            return [n for (cx, cy), nodes in self.cells.items()
+                    if x0 <= cx <= x1 and y0 <= cy <= y1 for n in nodes]
+        result = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                result.extend(self.cells.get((cx, cy), ()))
+        return result
+
+
+class VirtualPlanState:
+    """
+    虚拟化模式的状态
+
+    保存全部节点数据及其空间索引、连接索引，只有视口附近的节点创建图元，
+    移出视口的图元进入 pool 供复用。
+    """
+    def __init__(self, nodes):
+        self.nodes: list[NodeProperties] = list(nodes)
+        self.pool: list[NodeItem] = []
+        self.rebuild()
+    
+    def rebuild(self):
+        """节点的线程或位置变化后重建索引"""
+        self.by_id = {n.node_id: n for n in self.nodes}
+        self.spatial = NodeSpatialIndex(self.nodes)
+        self.connections = ConnectionIndex(self.nodes)
+    
+    def bounds(self) -> QRectF:
+        if not self.nodes:
+            return QRectF()
+        xs = [n.x for n in self.nodes]
+        ys = [n.y for n in self.nodes]
+        return QRectF(min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+
+
+class CachedScene:
+    """
+    切换 pattern 时保存的场景及视图状态
+
+    plan 和 node_count 用于判断缓存是否仍与 pattern 的数据一致。
+    """
+    __slots__ = ("scene", "plan", "node_count", "nodes_by_id", "virtual", "virtual_status",
+                 "next_node_id", "thread_color_map", "threadId_map_viewId", "transform", "center")
+
+    def __init__(self, view: 'NodeGraphView', plan):
+        self.scene = view.scene
+        self.plan = plan
+        self.node_count = len(plan.nodes)
+        self.nodes_by_id = view._nodes_by_id
+        self.virtual = view._virtual
+        self.virtual_status = view._virtual_status
+        self.next_node_id = view.next_node_id
+        self.thread_color_map = view.thread_color_map
+        self.threadId_map_viewId = view.threadId_map_viewId
+        self.transform = view.transform()
+        self.center = view.mapToScene(view.viewport().rect().center())
+    
+    def release(self):
+        """从缓存中淘汰时释放场景中的图元"""
+        self.scene.clear()
+        self.scene.deleteLater()
 
 
 class MergeNodeItem(QGraphicsItem):
@@ -470,32 +734,45 @@ class NodeGraphScene(QGraphicsScene):
         self.setSceneRect(-2500, -2500, 5000, 5000)
         self.grid_size = 20
         self.grid_color = QColor("#2d2d2d")
-        self.connection_lines = []
-        self.merge_nodes = []
+        # 连接线与合并节点，按连接的键索引，便于增量增删
+        self.connection_lines: dict[tuple, 'ConnectionLine'] = {}
+        self.merge_nodes: dict[tuple, tuple['MergeNodeItem', 'ConnectionLine']] = {}
+        # 普通模式下的连接索引，随场景保存（切换 pattern 复用场景时一并复用），结构编辑时增量更新
+        self.connection_index: Optional[ConnectionIndex] = None
 
     def drawBackground(self, painter, rect):
         # 填充背景
         painter.fillRect(rect, QColor("#1e1e1e"))
         
         # 绘制网格
-        left = int(rect.left()) - (int(rect.left()) % self.grid_size)
-        top = int(rect.top()) - (int(rect.top()) % self.grid_size)
+        # 缩小到网格线过密时，按 2 的倍数放大网格间距
+        step = self.grid_size
+        scale = painter.worldTransform().m11()
+        while step * scale < 8:
+            step *= 2
+        left = int(rect.left()) - (int(rect.left()) % step)
+        top = int(rect.top()) - (int(rect.top()) % step)
         
         lines = []
         # 垂直线
-        for x in range(left, int(rect.right()), self.grid_size):
-            lines.append(QGraphicsLineItem(x, rect.top(), x, rect.bottom()).line())
+        for x in range(left, int(rect.right()), step):
+            lines.append(QLineF(x, rect.top(), x, rect.bottom()))
         # 水平线
-        for y in range(top, int(rect.bottom()), self.grid_size):
-            lines.append(QGraphicsLineItem(rect.left(), y, rect.right(), y).line())
+        for y in range(top, int(rect.bottom()), step):
+            lines.append(QLineF(rect.left(), y, rect.right(), y))
             
         painter.setPen(QPen(self.grid_color, 1))
         painter.drawLines(lines)
 
 class NodeGraphView(QGraphicsView):
+    VIRTUALIZE_THRESHOLD = 800  # 节点数超过该值时使用虚拟化模式
+    VIRTUAL_MARGIN = 0.5        # 视口四周额外创建图元的范围（视口尺寸的比例）
+    SCENE_CACHE_SIZE = 4        # 缓存的非当前 pattern 场景数（LRU）
+    
     nodeSelected = pyqtSignal(NodeProperties)  # 选中节点时发送节点数据
     patternListChanged = pyqtSignal(list)  # 加载文件后发送 pattern 名称列表
     currentPatternChanged = pyqtSignal(str, object)  # 切换 pattern 时发送 (pattern_name, plan)
+    planModified = pyqtSignal(str)  # pattern 内容被修改时发送 pattern_name（用于自动保存）
 
     def __init__(self):
         super().__init__()
@@ -508,9 +785,28 @@ class NodeGraphView(QGraphicsView):
         self.setScene(self.scene)
         self.setDragMode(QGraphicsView.ScrollHandDrag)
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # 网格背景缓存，平移时只绘制新露出的区域
+        self.setCacheMode(QGraphicsView.CacheBackground)
+        
+        # 性能浮层 (F3 切换)：帧率与每帧绘制耗时
+        self.show_perf_overlay = False
+        self._frame_times: deque[float] = deque(maxlen=120)
+        self._paint_times: deque[float] = deque(maxlen=60)
         
         self.next_node_id = 1
         
+        # node_id -> 场景中的节点图元，由添加、删除、交换和加载维护，避免扫描 scene.items()
+        self._nodes_by_id: dict[int, NodeItem] = {}
+        
+        # 虚拟化模式：超过阈值的计划只为视口附近的节点创建图元
+        self._virtual: Optional[VirtualPlanState] = None
+        self._virtual_status: dict[int, str] = {}  # 未创建图元的节点的执行状态
+        self._virtual_timer = QTimer(self)
+        self._virtual_timer.setSingleShot(True)
+        self._virtual_timer.setInterval(0)
+        self._virtual_timer.timeout.connect(self._update_virtual_items)
+        self.horizontalScrollBar().valueChanged.connect(self._schedule_virtual_update)
+        self.verticalScrollBar().valueChanged.connect(self._schedule_virtual_update)
         
         # 线程颜色管理
         self.thread_color_map = {}  # thread_id -> QColor
@@ -525,7 +821,10 @@ class NodeGraphView(QGraphicsView):
         
         # === 多 Pattern 数据存储 ===
         self.all_plans: Dict[str, GuiExecutionPlan] = {}  # pattern_name -> GuiExecutionPlan
+        self.dirty_patterns: set[str] = set()  # 上次保存后修改过的 pattern
         self.current_pattern: str = ""  # 当前显示的 pattern 名称
+        # pattern_name -> 最近切换离开的 pattern 的场景，切回时直接复用（LRU）
+        self._scene_cache: OrderedDict[str, CachedScene] = OrderedDict()
         
         # === 连接 ThreadManager 信号 ===
         tm = ThreadManager.instance()
@@ -596,134 +895,141 @@ class NodeGraphView(QGraphicsView):
             self.thread_color_map[thread_id] = QColor(color_hex)
         return self.thread_color_map[thread_id]
     
-    def update_connections(self):
-        """基于当前节点重新构建所有连接线"""
-        # 清除现有连接
-        # 注意：需要检查对象是否仍然有效，因为 scene.clear() 可能已删除底层 C++ 对象
-        import sip
-        for line in self.scene.connection_lines:
-            try:
-                if not sip.isdeleted(line):
-                    self.scene.removeItem(line)
-            except RuntimeError:
-                pass  # 对象已被删除，忽略
-        self.scene.connection_lines.clear()
-        
-        for merge in self.scene.merge_nodes:
-            try:
-                if not sip.isdeleted(merge):
-                    self.scene.removeItem(merge)
-            except RuntimeError:
-                pass  # 对象已被删除，忽略
-        self.scene.merge_nodes.clear()
-        
-        # 策略：全量刷新。先清空场景中所有旧线和合并节点，再根据最新数据模型重建。
-        # 这样做能确保 UI 状态与数据模型绝对同步，且大幅简化了处理节点移动、删除、跨线程连接时的判断逻辑。
-        
-        # 获取所有按 ID 排序的节点
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        nodes.sort(key=lambda n: n.node_data.node_id)
-        
-        # 建立 ID 到节点的查找表
-        node_by_id = {n.node_data.node_id: n for n in nodes}
-        
-        # 将节点按 thread_id 分组
-        threads = {}
-        for node in nodes:
-            tid = node.node_data.thread_id or "main"
-            if tid not in threads:
-                threads[tid] = []
-            threads[tid].append(node)
-        
-        # 绘制同线程连接 (实线)
-        for tid, thread_nodes in threads.items():
-            thread_nodes.sort(key=lambda n: n.node_data.node_id)
-            color = self.get_thread_color(tid)
-            
-            for i in range(len(thread_nodes) - 1):
-                start_node = thread_nodes[i]
-                end_node = thread_nodes[i + 1]
-                line = ConnectionLine(start_node, end_node, "thread", color)
-                self.scene.addItem(line)
-                self.scene.connection_lines.append(line)
-        
-        # 绘制 data_in 连接 (虚线)
-        # 规则：对于每个非 main 线程，找到该线程的第一个节点（最小 ID），
-        # 然后从其 data_in_thread 中找到 ID 最接近且小于该节点的源节点，绘制连线
-        # 额外规则：如果 data_in_slice = [A, B] 且 B <= A，则跳过绘制虚线
-        # print(f"[DEBUG] threads: {list(threads.keys())}")
-        for tid, thread_nodes in threads.items():
-            if tid == "main":
-                continue  # main 线程不需要输入连线
-            
-            # 找到该线程的第一个节点（最小 ID）
-            first_node = min(thread_nodes, key=lambda n: n.node_data.node_id)
-            
-            # 检查 data_in_slice：如果 [A, B] 且 A 和 B 都不为 None 且 B <= A，则跳过绘制虚线
-            data_in_slice = first_node.node_data.data_in_slice
-            if data_in_slice and len(data_in_slice) >= 2:
-                A, B = data_in_slice[0], data_in_slice[1]
-                if A is not None and B is not None and B <= A:
-                    continue  # B <= A 时不绘制 data_in 虚线
-            
-            target_id = first_node.node_data.node_id
-            
-            # 获取源线程 ID
-            data_in_thread = first_node.node_data.data_in_thread or "main"
-            # print(f"[DEBUG] Thread '{tid}': first_node_id={target_id}, data_in_thread='{data_in_thread}'")
+    def update_connections(self, touched: Optional[set[str]] = None):
+        """
+        根据当前节点增量更新连接线
+
+        先按节点索引计算期望的连接集合，再与场景中已有的连接比较：
+        只删除不再需要的连接、添加新的连接，保留的连接在端点移动时重建路径。
+        虚拟化模式下只为两端都已创建图元的连接创建连接线。
+
+        Args:
+            touched: 普通模式下结构编辑涉及的线程（节点增删、编号或位置变化的线程）。
+                只重建这些线程的索引，并只重新计算连接受其影响的线程的连接线；
+                None 表示重建索引并重新计算全部连接（加载、重命名等）。
+        """
+        index, affected = self._connection_index(touched)
+        items = self._nodes_by_id
+        scene = self.scene
+        if affected is None:
+            owners = items.items()
+        else:
+            owners = [
+                (node.node_id, items[node.node_id])
+                for tid in affected for node in index.threads.get(tid, ())
+                if node.node_id in items
+            ]
+        
+        # ===== 期望的连接 =====
+        # 键包含所属线程、节点 ID 与图元本身：图元被复用或节点交换后旧连接不会被误保留
+        wanted: dict[tuple, tuple] = {}  # 键 -> (起点, 终点, 类型, 颜色)
+        wanted_merges: dict[tuple, tuple] = {}  # 键 -> (x, y)
+        for node_id, item in owners:
+            node = item.node_data
+            tid = node.thread_id or "main"
             
-            if data_in_thread not in threads:
-                # print(f"[DEBUG]   -> SKIP: source thread '{data_in_thread}' not in threads")
-                continue  # 源线程不存在，跳过
+            # 同线程连接 (实线)
+            following = index.next_in_thread(node)
+            end_item = items.get(following.node_id) if following is not None else None
+            if end_item is not None:
+                color = self.get_thread_color(tid)
+                wanted[("thread", tid, node_id, item, following.node_id, end_item, color.name())] = (
+                    item, end_item, "thread", color
+                )
             
-            source_nodes = threads[data_in_thread]
-            # 在源线程中找 ID < target_id 的最后一个节点
-            valid_sources = [n for n in source_nodes if n.node_data.node_id < target_id]
-            # print(f"[DEBUG]   -> valid_sources count: {len(valid_sources)}")
-            if valid_sources:
-                # 连线起点：源线程中 ID 最接近且小于目标节点的节点
-                source_node = max(valid_sources, key=lambda n: n.node_data.node_id)
-                # print(f"[DEBUG]   -> Drawing line: Node {source_node.node_data.node_id} -> Node {target_id}")
-                line = ConnectionLine(source_node, first_node, "data_in", 
-                                     self.get_thread_color(tid))
-                self.scene.addItem(line)
-                self.scene.connection_lines.append(line)
-            # else:
-            #     print(f"[DEBUG]   -> SKIP: no valid source nodes found")
-        
-        # 绘制 data_out 连接 (虚线) 及合并节点
-        for node in nodes:
-            if node.node_data.data_out:
-                parent_tid = node.node_data.data_out_thread or "main"
-                child_tid = node.node_data.thread_id or "main"
-                
-                if parent_tid and parent_tid != child_tid and parent_tid in threads:
-                    # 将合并节点放置在合适的 X 位置 (该节点之后)
-                    merge_x = node.x() + self.node_gap_x / 2
-                    # 父线程上的 Y 位置 (主线程 Y=0)
-                    parent_y = 0
-                    if threads[parent_tid]:
-                        parent_y = threads[parent_tid][0].y()
-                    
-                    merge_node = MergeNodeItem(
-                        merge_x, parent_y + 20,
-                        parent_tid, child_tid,
-                        self.get_thread_color(child_tid)
+            # data_in 连接 (虚线)：线程首节点 <- data_in_thread 中 ID 最接近且小于它的节点
+            if tid != "main" and index.is_thread_head(node):
+                source = index.data_in_source(node)
+                source_item = items.get(source.node_id) if source is not None else None
+                if source_item is not None:
+                    color = self.get_thread_color(tid)
+                    wanted[("data_in", tid, source.node_id, source_item, node_id, item, color.name())] = (
+                        source_item, item, "data_in", color
                     )
-                    self.scene.addItem(merge_node)
-                    self.scene.merge_nodes.append(merge_node)
-                    
-                    # 从节点绘制线到合并节点
-                    line = ConnectionLine(node, merge_node, "data_out",
-                                         self.get_thread_color(child_tid))
-                    self.scene.addItem(line)
-                    self.scene.connection_lines.append(line)
+            
+            # data_out 连接 (虚线) 及合并节点
+            if node.data_out:
+                parent_tid = node.data_out_thread or "main"
+                if parent_tid != tid and parent_tid in index.threads:
+                    # 合并节点放在该节点之后、父线程所在的 Y 位置
+                    merge_x = item.x() + self.node_gap_x / 2
+                    parent_y = index.threads[parent_tid][0].y
+                    key = (node_id, item, parent_tid, tid, self.get_thread_color(tid).name())
+                    wanted_merges[key] = (merge_x, parent_y + 20)
+        
+        # ===== 与现有连接比较（只比较受影响线程的连接） =====
+        lines = scene.connection_lines
+        line_keys = list(lines) if affected is None else [k for k in lines if k[1] in affected]
+        for key in line_keys:
+            if key in wanted:
+                lines[key].update_position()
+            else:
+                self._remove_scene_item(lines.pop(key))
+        for key, (start_item, end_item, connection_type, color) in wanted.items():
+            if key not in lines:
+                line = ConnectionLine(start_item, end_item, connection_type, color)
+                scene.addItem(line)
+                lines[key] = line
+        
+        merges = scene.merge_nodes
+        merge_keys = list(merges) if affected is None else [k for k in merges if k[3] in affected]
+        for key in merge_keys:
+            if key not in wanted_merges:
+                merge_node, line = merges.pop(key)
+                self._remove_scene_item(line)
+                self._remove_scene_item(merge_node)
+        for key, (x, y) in wanted_merges.items():
+            existing = merges.get(key)
+            if existing is not None:
+                merge_node, line = existing
+                if merge_node.pos() != QPointF(x, y):
+                    merge_node.setPos(x, y)
+                line.update_position()
+                continue
+            _, item, parent_tid, child_tid, _ = key
+            color = self.get_thread_color(child_tid)
+            merge_node = MergeNodeItem(x, y, parent_tid, child_tid, color)
+            scene.addItem(merge_node)
+            # 从节点绘制线到合并节点
+            line = ConnectionLine(item, merge_node, "data_out", color)
+            scene.addItem(line)
+            merges[key] = (merge_node, line)
+
+    def _connection_index(self, touched: Optional[set[str]] = None) -> tuple[ConnectionIndex, Optional[set[str]]]:
+        """
+        返回 (连接索引, 需要重新计算连接的线程)，后者为 None 表示全部线程
+
+        虚拟化模式使用加载时建立的索引（结构编辑后重建）；普通模式使用场景保存的索引，
+        给出 touched 时只重建这些线程，否则整体重建。
+        """
+        if self._virtual is not None:
+            return self._virtual.connections, None
+        index = self.scene.connection_index
+        if touched is None or index is None:
+            index = ConnectionIndex(item.node_data for item in self._nodes_by_id.values())
+            self.scene.connection_index = index
+            return index, None
+        index.update_threads(touched, (
+            item.node_data for item in self._nodes_by_id.values() if (item.node_data.thread_id or "main") in touched
+        ))
+        return index, index.dependent_threads(touched)
+
+    def _remove_scene_item(self, item):
+        """从场景移除图元（底层 C++ 对象可能已随 scene.clear() 删除）"""
+        import sip
+        try:
+            if not sip.isdeleted(item):
+                self.scene.removeItem(item)
+        except RuntimeError:
+            pass  # 对象已被删除，忽略
 
     def get_all_nodes_data(self) -> list[NodeProperties]:
+        if self._virtual is not None:
+            # 虚拟化模式下节点数据即为全部节点，坐标由数据计算
+            return list(self._virtual.nodes)
         nodes = []
         # 如果需要，按 x 位置排序以维持某种逻辑顺序
-        items = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        items.sort(key=lambda item: item.x())
+        items = sorted(self._nodes_by_id.values(), key=lambda item: item.x())
         
         for item in items:
             # 更新 schema 兼容的坐标
@@ -734,6 +1040,13 @@ class NodeGraphView(QGraphicsView):
 
     def clear_nodes(self):
         self.scene.clear()
+        # scene.clear() 已删除所有图元，只需清空索引
+        self.scene.connection_lines.clear()
+        self.scene.merge_nodes.clear()
+        self.scene.connection_index = None
+        self._nodes_by_id.clear()
+        self._virtual = None
+        self._virtual_status.clear()
     
     def update_node_branch(self, node_data):
         """
@@ -752,33 +1065,40 @@ class NodeGraphView(QGraphicsView):
             thread_id = node_data.thread_id
             thread_view_index = node_data.thread_view_index
         
+        if self._virtual is not None and node_id in self._virtual.by_id:
+            # 虚拟化模式：节点可能没有图元，直接更新数据
+            data = self._virtual.by_id[node_id]
+            data.thread_id = thread_id
+            data.thread_view_index = thread_view_index
+        
         # 查找匹配的节点项
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        for node in nodes:
-            if node.node_data.node_id == node_id:
-                # 1. 更新节点数据
-                node.node_data.thread_id = thread_id
-                node.node_data.thread_view_index = thread_view_index
-                
-                # 2. 更新线程颜色
-                new_color = self.get_thread_color(thread_id)
-                node.thread_color = new_color
-                
-                # 3. 更新节点位置（Y坐标根据 thread_view_index 变化）
-                # node_data 的 x, y 会在 thread_view_index 被设置时自动计算
-                node.setPos(node.node_data.x, node.node_data.y)
-                
-                # 4. 强制重绘
-                node.update()
-                
-                print(f"Graph: Updated node {node_id} to thread '{thread_id}' (view_index: {thread_view_index}, pos: {node.node_data.x}, {node.node_data.y})")
-                break
+        node = self._nodes_by_id.get(node_id)
+        touched = {thread_id or "main"}
+        if node is not None:
+            touched.add(node.node_data.thread_id or "main")
+            # 1. 更新节点数据
+            node.node_data.thread_id = thread_id
+            node.node_data.thread_view_index = thread_view_index
+            
+            # 2. 更新线程颜色
+            new_color = self.get_thread_color(thread_id)
+            node.thread_color = new_color
+            
+            # 3. 更新节点位置（Y坐标根据 thread_view_index 变化）
+            # node_data 的 x, y 会在 thread_view_index 被设置时自动计算
+            node.sync_from_data()
+            
+            print(f"Graph: Updated node {node_id} to thread '{thread_id}' (view_index: {thread_view_index}, pos: {node.node_data.x}, {node.node_data.y})")
         
         # 同步本地缓存
         self.threadId_map_viewId = ThreadManager.instance().get_thread_to_view_index_map()
         
-        # 更新所有连接，因为线程关系可能已改变
-        self.update_connections()
+        # 更新新旧线程的连接，因为线程关系可能已改变
+        if self._virtual is not None:
+            self._refresh_virtual()
+        else:
+            self.update_connections(touched)
+        self.mark_dirty()
     
     def update_node_color(self, node_data):
         """当节点的 thread_id 改变时更新特定节点的颜色（兼容旧接口）"""
@@ -793,11 +1113,27 @@ class NodeGraphView(QGraphicsView):
             node_id: 要更新的节点 ID
             status: 'pending', 'running', 'completed', 'failed' 之一
         """
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        for node in nodes:
-            if node.node_data.node_id == node_id:
+        if self._virtual is not None:
+            self._virtual_status[node_id] = status
+        node = self._nodes_by_id.get(node_id)
+        if node is not None:
+            node.set_execution_status(status)
+    
+    def update_node_statuses(self, statuses: dict[int, str]):
+        """
+        批量更新节点执行状态
+
+        只重绘状态实际变化的节点，Qt 会把这些重绘合并为一次场景更新。
+        
+        参数:
+            statuses: node_id -> 状态
+        """
+        if self._virtual is not None:
+            self._virtual_status.update(statuses)
+        for node_id, status in statuses.items():
+            node = self._nodes_by_id.get(node_id)
+            if node is not None and node.execution_status != status:
                 node.set_execution_status(status)
-                break
 
     def add_node(self, node_data: NodeProperties):
         # 坐标由 schemas.py 中的 __setattr__ 自动计算
@@ -821,16 +1157,188 @@ class NodeGraphView(QGraphicsView):
         # node_data.x = calculated_x
         # node_data.y = calculated_y
         
+        # 维护 next_node_id
+        if node_id >= self.next_node_id:
+            self.next_node_id = node_id + 1
+        
+        if self._virtual is not None:
+            # 虚拟化模式：只加入数据，图元按视口创建
+            self._virtual.nodes.append(node_data)
+            self._refresh_virtual_structure()
+            self.mark_dirty()
+            return
+        
         # 获取线程颜色
         thread_color = self.get_thread_color(node_data.thread_id)
         
         # 创建节点项，坐标从 node_data 中读取（由 __setattr__ 自动计算）
         item = NodeItem(node_data, thread_color=thread_color)
         self.scene.addItem(item)
+        self._nodes_by_id[node_id] = item
+        self.mark_dirty()
+    
+    # ==================== 性能浮层 ====================
+    
+    def paintEvent(self, event):
+        if not self.show_perf_overlay:
+            super().paintEvent(event)
+            return
+        start = time.perf_counter()
+        super().paintEvent(event)
+        end = time.perf_counter()
+        self._paint_times.append((end - start) * 1000)
+        self._frame_times.append(end)
+        self._draw_perf_overlay()
+    
+    def _draw_perf_overlay(self):
+        """在视口左下角绘制帧率、绘制耗时与缩放信息"""
+        recent = [t for t in self._frame_times if self._frame_times[-1] - t <= 1.0]
+        fps = len(recent) - 1 if len(recent) > 1 else 0
+        paint_ms = sum(self._paint_times) / len(self._paint_times) if self._paint_times else 0.0
+        text = (f"FPS {fps}  paint {paint_ms:.1f} ms (max {max(self._paint_times, default=0):.1f})  "
+                f"nodes {len(self._nodes_by_id)}  zoom {self.transform().m11():.2f}")
+        
+        painter = QPainter(self.viewport())
+        painter.setFont(_cached_font(9))
+        rect = QRectF(8, self.viewport().height() - 28, painter.fontMetrics().horizontalAdvance(text) + 16, 22)
+        painter.fillRect(rect, QColor(0, 0, 0, 170))
+        painter.setPen(QColor("#8BC34A"))
+        painter.drawText(rect, Qt.AlignCenter, text)
+        painter.end()
+    
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_F3:
+            self.show_perf_overlay = not self.show_perf_overlay
+            self._frame_times.clear()
+            self._paint_times.clear()
+            self.viewport().update()
+            return
+        super().keyPressEvent(event)
+    
+    # ==================== 虚拟化模式 ====================
+    
+    def _fit_scene_rect(self, bounds: QRectF):
+        """场景范围至少覆盖默认区域和全部节点"""
+        rect = QRectF(-2500, -2500, 5000, 5000)
+        if not bounds.isNull():
+            rect = rect.united(bounds.adjusted(-2500, -2500, 2500, 2500))
+        self.scene.setSceneRect(rect)
+    
+    def _schedule_virtual_update(self, *_):
+        if self._virtual is not None:
+            self._virtual_timer.start()
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._schedule_virtual_update()
+    
+    def _update_virtual_items(self):
+        """
+        按视口更新已创建的节点图元
+
+        视口（加边距）内的节点，以及与它们相连的线程相邻节点、data_in 两端节点需要图元；
+        其余图元隐藏后放回 pool，新出现的节点优先复用 pool 中的图元。
+        """
+        state = self._virtual
+        if state is None:
+            return
+        visible = self.mapToScene(self.viewport().rect()).boundingRect()
+        mx = visible.width() * self.VIRTUAL_MARGIN
+        my = visible.height() * self.VIRTUAL_MARGIN
+        # 节点坐标为左上角，左/上方额外留出一个节点间距
+        area = visible.adjusted(-mx - self.node_gap_x, -my - self.thread_gap_y, mx, my)
+        
+        index = state.connections
+        wanted = {n.node_id: n for n in state.spatial.query(area)}
+        for node in list(wanted.values()):
+            for other in index.thread_neighbors(node):
+                wanted.setdefault(other.node_id, other)
+            if (node.thread_id or "main") != "main" and index.is_thread_head(node):
+                source = index.data_in_source(node)
+                if source is not None:
+                    wanted.setdefault(source.node_id, source)
+            for target in index.data_in_targets.get(node.node_id, ()):
+                wanted.setdefault(target.node_id, target)
+        
+        # 回收不再需要的图元
+        for node_id in [k for k, item in self._nodes_by_id.items() if wanted.get(k) is not item.node_data]:
+            item = self._nodes_by_id.pop(node_id)
+            item.setSelected(False)
+            item.hide()
+            state.pool.append(item)
+        
+        # 为新出现的节点创建或复用图元
+        for node_id, node in wanted.items():
+            if node_id in self._nodes_by_id:
+                continue
+            color = self.get_thread_color(node.thread_id)
+            status = self._virtual_status.get(node_id, "pending")
+            if state.pool:
+                item = state.pool.pop()
+                item.bind(node, color, status)
+                item.show()
+            else:
+                item = NodeItem(node, thread_color=color)
+                item.execution_status = status
+                self.scene.addItem(item)
+            self._nodes_by_id[node_id] = item
         
-        # 维护 next_node_id
-        if node_id >= self.next_node_id:
-            self.next_node_id = node_id + 1
+        self.update_connections()
+    
+    def _refresh_virtual_structure(self):
+        """
+        虚拟化模式下增删、交换节点后刷新
+
+        结构编辑直接修改 VirtualPlanState.nodes 中的数据；这里回收全部图元，
+        按新的编号排序并重建索引，再为视口附近的节点重新绑定图元。
+        """
+        state = self._virtual
+        for item in self._nodes_by_id.values():
+            item.setSelected(False)
+            item.hide()
+            state.pool.append(item)
+        self._nodes_by_id.clear()
+        state.nodes.sort(key=lambda n: n.node_id)
+        self._fit_scene_rect(state.bounds())
+        self._refresh_virtual()
+    
+    def _remove_virtual_nodes(self, deleted_ids: list[int]):
+        """虚拟化模式：删除节点数据，后续节点的 ID 前移（执行状态随节点移动）"""
+        state = self._virtual
+        deleted_ids = sorted(deleted_ids)
+        removed = set(deleted_ids)
+        state.nodes = [n for n in state.nodes if n.node_id not in removed]
+        statuses = {}
+        for node in state.nodes:
+            old_id = node.node_id
+            shift = bisect.bisect_left(deleted_ids, old_id)
+            if shift:
+                node.node_id = old_id - shift  # 这会自动触发 x 坐标计算
+            if old_id in self._virtual_status:
+                statuses[node.node_id] = self._virtual_status[old_id]
+        self._virtual_status.clear()
+        self._virtual_status.update(statuses)
+    
+    def _all_node_data(self) -> list[NodeProperties]:
+        """全部节点数据（虚拟化模式下包括未创建图元的节点）"""
+        if self._virtual is not None:
+            return self._virtual.nodes
+        return [item.node_data for item in self._nodes_by_id.values()]
+    
+    def _refresh_virtual(self):
+        """虚拟化模式下节点的线程、位置或 data_in 变化后重建索引并更新图元"""
+        if self._virtual is not None:
+            self._virtual.rebuild()
+            self._update_virtual_items()
+    
+    def refresh_node(self, node_id: int):
+        """节点数据（名称、类型等）被编辑后重绘该节点（使绘制缓存失效）"""
+        node = self._nodes_by_id.get(node_id)
+        if node is not None:
+            node.sync_from_data()
+        if self._virtual is not None:
+            # data_in 可能已改变，索引需要重建
+            self._refresh_virtual()
     
     def wheelEvent(self, event: QWheelEvent):
         # 缩放
@@ -841,6 +1349,7 @@ class NodeGraphView(QGraphicsView):
         else:
             zoomFactor = zoomOutFactor
         self.scale(zoomFactor, zoomFactor)
+        self._schedule_virtual_update()
 
     def mousePressEvent(self, event):
         item = self.itemAt(event.pos())
@@ -918,7 +1427,11 @@ class NodeGraphView(QGraphicsView):
                     target.node_data.data_in_thread = source_thread
                     target.node_data.data_in_slice = (0, 1)  # 默认: 第一条消息 [0:1]
                     print(f"Created connection: {source_thread} -> Node {target_id}")
-                    self.update_connections()
+                    self.mark_dirty()
+                    if self._virtual is not None:
+                        self._refresh_virtual()
+                    else:
+                        self.update_connections({target.node_data.thread_id or "main"})
                 else:
                     print(f"Invalid connection: source ID ({source_id}) must be < target ID ({target_id})")
             
@@ -972,7 +1485,7 @@ class NodeGraphView(QGraphicsView):
             "thread_view_index": tidx
         })
         self.add_node(new_data)
-        self.update_connections()
+        self.update_connections({parent_thread or "main"})
 
     def add_branch_from(self, parent_item):
         parent_thread = parent_item.node_data.thread_id
@@ -1000,24 +1513,38 @@ class NodeGraphView(QGraphicsView):
         })
 
         self.add_node(new_data)
-        self.update_connections()
+        self.update_connections({new_thread_id})
 
     def delete_node(self, item):
         deleted_id = item.node_data.node_id
         deleted_thread_id = item.node_data.thread_id
-        self.scene.removeItem(item)
         
         # 从 ThreadManager 注销节点（如果线程变空会自动删除）
         ThreadManager.instance().unregister_node(deleted_id, deleted_thread_id)
         
-        # 重新对 ID > deleted_id 的所有节点进行编号
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        for node in nodes:
-            node_id = node.node_data.node_id
-            if node_id > deleted_id:
-                new_id = node_id - 1
-                node.node_data.node_id = new_id  # 这会自动触发 x 坐标计算
-                node.setPos(node.node_data.x, node.node_data.y)  # 使用自动计算的坐标
+        if self._virtual is not None:
+            # 虚拟化模式：在节点数据上删除并重新编号
+            self._remove_virtual_nodes([deleted_id])
+            self.next_node_id = max(1, self.next_node_id - 1)
+            self.threadId_map_viewId = ThreadManager.instance().get_thread_to_view_index_map()
+            self._refresh_virtual_structure()
+            self.mark_dirty()
+            return
+        
+        self.scene.removeItem(item)
+        self._nodes_by_id.pop(deleted_id, None)
+        
+        # 重新对 ID > deleted_id 的所有节点进行编号（按 ID 递增移动索引项）
+        touched = {deleted_thread_id or "main"}
+        for node_id in range(deleted_id + 1, self.next_node_id):
+            node = self._nodes_by_id.pop(node_id, None)
+            if node is None:
+                continue
+            new_id = node_id - 1
+            node.node_data.node_id = new_id  # 这会自动触发 x 坐标计算
+            node.sync_from_data()  # 使用自动计算的坐标并重绘
+            self._nodes_by_id[new_id] = node
+            touched.add(node.node_data.thread_id or "main")
         
         # 递减 next_node_id 计数器
         self.next_node_id = max(1, self.next_node_id - 1)
@@ -1025,7 +1552,8 @@ class NodeGraphView(QGraphicsView):
         # 同步本地缓存（ThreadManager 可能已删除空线程）
         self.threadId_map_viewId = ThreadManager.instance().get_thread_to_view_index_map()
         
-        self.update_connections()
+        self.update_connections(touched)
+        self.mark_dirty()
     
     def delete_thread(self, item):
         """
@@ -1053,13 +1581,16 @@ class NodeGraphView(QGraphicsView):
             print(f"Thread {del_thread_id} not found in threadId_map_viewId")
             return
         
-        # 2. 收集所有属于该线程的节点
+        # 2. 收集所有属于该线程的节点（虚拟化模式下包括未创建图元的节点）
         nodes_to_remove = []
         deleted_ids = []  # 收集所有被删除节点的 ID
-        for i in self.scene.items():
-            if isinstance(i, NodeItem) and i.node_data.thread_id == del_thread_id:
-                nodes_to_remove.append(i)
-                deleted_ids.append(i.node_data.node_id)
+        if self._virtual is not None:
+            deleted_ids = [n.node_id for n in self._virtual.nodes if n.thread_id == del_thread_id]
+        else:
+            for i in self._nodes_by_id.values():
+                if i.node_data.thread_id == del_thread_id:
+                    nodes_to_remove.append(i)
+                    deleted_ids.append(i.node_data.node_id)
         
         # 3. 从 ThreadManager 中注销所有节点（这会自动触发线程删除和信号发射）
         thread_manager = ThreadManager.instance()
@@ -1069,39 +1600,60 @@ class NodeGraphView(QGraphicsView):
         # 4. 从 ThreadManager 同步最新的 threadId_map_viewId
         self.threadId_map_viewId = thread_manager.get_thread_to_view_index_map()
         
+        if self._virtual is not None:
+            # 虚拟化模式：在节点数据上删除、重新编号并更新线程索引
+            self._remove_virtual_nodes(deleted_ids)
+            for node in self._virtual.nodes:
+                new_idx = self.threadId_map_viewId.get(node.thread_id)
+                if new_idx is not None and node.thread_view_index != new_idx:
+                    node.thread_view_index = new_idx  # 这会自动触发 y 坐标计算
+            self.next_node_id = max(1, self.next_node_id - len(deleted_ids))
+            self._refresh_virtual_structure()
+            self.mark_dirty()
+            print(f"Deleted thread: {del_thread_id} (viewId: {del_viewId})")
+            return
+        
         # 5. 从场景中删除节点
         for node in nodes_to_remove:
             self.scene.removeItem(node)
+            self._nodes_by_id.pop(node.node_data.node_id, None)
         
         # 对删除的 ID 排序，用于高效计算偏移量
         deleted_ids.sort()
         
         # 6. 更新剩余节点的 node_id 和 thread_view_index
-        remaining_nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
+        remaining_nodes = list(self._nodes_by_id.values())
+        touched = {del_thread_id}  # 节点编号或位置变化的线程
         for node in remaining_nodes:
             # 使用二分查找计算有多少被删除的 ID 小于当前节点的 ID
-            import bisect
             count_smaller = bisect.bisect_left(deleted_ids, node.node_data.node_id)
             
             # 更新 node_id（如果有需要）
+            node_thread_id = node.node_data.thread_id
             if count_smaller > 0:
                 node.node_data.node_id -= count_smaller  # 这会自动触发 x 坐标计算
+                touched.add(node_thread_id or "main")
             
             # 更新 thread_view_index
-            node_thread_id = node.node_data.thread_id
             if node_thread_id in self.threadId_map_viewId:
                 new_idx = self.threadId_map_viewId[node_thread_id]
+                if node.node_data.thread_view_index != new_idx:
+                    touched.add(node_thread_id or "main")
                 node.node_data.thread_view_index = new_idx  # 这会自动触发 y 坐标计算
             
             # 使用自动计算的坐标更新位置
-            node.setPos(node.node_data.x, node.node_data.y)
+            node.sync_from_data()
+        
+        # 编号已变化，按新的 node_id 重建索引
+        self._nodes_by_id = {node.node_data.node_id: node for node in remaining_nodes}
         
         # 更新 next_node_id 计数器
         self.next_node_id = max(1, self.next_node_id - len(deleted_ids))
         
         # 更新连接线
-        self.update_connections()
+        self.update_connections(touched)
         
+        self.mark_dirty()
         print(f"Deleted thread: {del_thread_id} (viewId: {del_viewId})")
 
     def swap_nodes(self, item, direction):
@@ -1130,15 +1682,27 @@ class NodeGraphView(QGraphicsView):
             print(f"Cannot swap: target ID {target_id} is invalid (must be >= 1)")
             return
         
-        # 获取所有节点
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
+        if self._virtual is not None:
+            # 虚拟化模式：目标节点可能没有图元，直接交换数据的 ID
+            target_data = self._virtual.by_id.get(target_id)
+            if target_data is None:
+                print(f"Cannot swap: no node found with ID {target_id}")
+                return
+            item.node_data.node_id = target_id
+            target_data.node_id = current_id
+            status = self._virtual_status
+            current_status, target_status = status.pop(current_id, None), status.pop(target_id, None)
+            if current_status is not None:
+                status[target_id] = current_status
+            if target_status is not None:
+                status[current_id] = target_status
+            self._refresh_virtual_structure()
+            self.mark_dirty()
+            print(f"Swapped nodes: {current_id} ↔ {target_id}")
+            return
         
         # 查找目标节点
-        target_node = None
-        for node in nodes:
-            if node.node_data.node_id == target_id:
-                target_node = node
-                break
+        target_node = self._nodes_by_id.get(target_id)
         
         if not target_node:
             print(f"Cannot swap: no node found with ID {target_id}")
@@ -1154,18 +1718,17 @@ class NodeGraphView(QGraphicsView):
         # 交换 ID (这会自动触发 x 坐标计算)
         item.node_data.node_id = target_id
         target_node.node_data.node_id = current_id
+        self._nodes_by_id[target_id] = item
+        self._nodes_by_id[current_id] = target_node
 
-        # 根据自动计算的坐标更新位置
-        item.setPos(item.node_data.x, item.node_data.y)
-        target_node.setPos(target_node.node_data.x, target_node.node_data.y)
+        # 根据自动计算的坐标更新位置并重绘
+        item.sync_from_data()
+        target_node.sync_from_data()
         
-        # 强制重绘
-        item.update()
-        target_node.update()
-        
-        # 更新所有连接
-        self.update_connections()
+        # 更新两个节点所在线程的连接
+        self.update_connections({item.node_data.thread_id or "main", target_node.node_data.thread_id or "main"})
         
+        self.mark_dirty()
         print(f"Swapped nodes: {current_id} ↔ {target_id}")
 
     def swap_threads(self, item, direction):
@@ -1219,20 +1782,30 @@ class NodeGraphView(QGraphicsView):
         self.threadId_map_viewId[target_thread_id] = current_thread_index
         
         # 2. 修改所有节点的 thread_view_index
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
+        if self._virtual is not None:
+            # 虚拟化模式：修改全部节点数据（包括未创建图元的节点）
+            for node in self._virtual.nodes:
+                if node.thread_id == current_thread_id:
+                    node.thread_view_index = target_thread_index
+                elif node.thread_id == target_thread_id:
+                    node.thread_view_index = current_thread_index
+            self._refresh_virtual_structure()
+            self.mark_dirty()
+            print(f"Swapped threads: {current_thread_id} (index {current_thread_index}) ↔ {target_thread_id} (index {target_thread_index})")
+            return
+        nodes = list(self._nodes_by_id.values())
         for node in nodes:
             if node.node_data.thread_id == current_thread_id:
                 node.node_data.thread_view_index = target_thread_index
-                node.setPos(node.node_data.x, node.node_data.y)
-                node.update()
+                node.sync_from_data()
             elif node.node_data.thread_id == target_thread_id:
                 node.node_data.thread_view_index = current_thread_index
-                node.setPos(node.node_data.x, node.node_data.y)
-                node.update()
+                node.sync_from_data()
         
-        # 更新所有连接线
-        self.update_connections()
+        # 更新两个线程的连接线
+        self.update_connections({current_thread_id, target_thread_id})
         
+        self.mark_dirty()
         print(f"Swapped threads: {current_thread_id} (index {current_thread_index}) ↔ {target_thread_id} (index {target_thread_index})")
 
     def add_main_node(self):
@@ -1253,6 +1826,8 @@ class NodeGraphView(QGraphicsView):
             "thread_view_index": view_idx,
         })
         self.add_node(node_data)
+        if self._virtual is None:
+            self.update_connections({"main"})
     # ==================== 多 Pattern 数据管理 ====================
     
     def load_plans_data(self, plans_data: Dict[str, GuiExecutionPlan]) -> List[str]:
@@ -1266,12 +1841,27 @@ class NodeGraphView(QGraphicsView):
             pattern 名称列表（用于填充 ComboBox）
         """
         self.all_plans = plans_data
+        self.invalidate_scene_cache()
         patterns = list(self.all_plans.keys())
         
-        # 自动加载第一个 pattern
-        if patterns:
-            self._load_plan_to_scene(self.all_plans[patterns[0]])
-            self.current_pattern = patterns[0]
+        # 自动加载第一个校验通过的 pattern（延迟校验的 pattern 可能无效）
+        for name in patterns:
+            try:
+                plan = self.all_plans[name]
+            except ValueError as e:
+                print(f"Warning: {e}")
+                continue
+            self._load_plan_to_scene(plan)
+            self.current_pattern = name
+            break
+        else:
+            self.clear_nodes()
+            self.current_pattern = ""
+            if patterns:
+                print("Warning: 没有可显示的有效 pattern")
+        
+        # 刚加载的内容与文件一致（加载过程中线程同步触发的修改不算）
+        self.dirty_patterns.clear()
         
         # 发送信号通知 pattern 列表已更新
         self.patternListChanged.emit(patterns)
@@ -1295,13 +1885,21 @@ class NodeGraphView(QGraphicsView):
         if pattern_name == self.current_pattern:
             return True  # 已经是当前 pattern，无需操作
         
+        # 延迟加载的 pattern 在首次切换时校验
+        try:
+            plan = self.all_plans[pattern_name]
+        except ValueError as e:
+            print(f"Warning: {e}")
+            return False
+        
         # 1. 保存当前 pattern 的最新数据
         self._save_current_to_plans()
         
-        # 2. 切换到新 pattern
+        # 2. 切换到新 pattern（最近显示过且数据未变时复用缓存的场景）
+        self._stash_current_scene()
         self.current_pattern = pattern_name
-        plan = self.all_plans[pattern_name]
-        self._load_plan_to_scene(plan)
+        if not self._restore_cached_scene(pattern_name, plan):
+            self._load_plan_to_scene(plan)
         
         # 3. 发送信号
         self.currentPatternChanged.emit(pattern_name, plan)
@@ -1333,24 +1931,90 @@ class NodeGraphView(QGraphicsView):
         # 同步到 ThreadManager
         ThreadManager.instance().sync_from_plan(plan)
         
-        # 创建节点
-        for node in plan.nodes:
-            thread_color = self.get_thread_color(node.thread_id)
-            item = NodeItem(node, thread_color=thread_color)
-            self.scene.addItem(item)
-        
         # 更新 next_node_id 为 max + 1
         if plan.nodes:
             self.next_node_id = max(n.node_id for n in plan.nodes) + 1
         else:
             self.next_node_id = 1
         
+        if len(plan.nodes) > self.VIRTUALIZE_THRESHOLD:
+            # 大计划：只建立索引，图元在视口移动时按需创建
+            self._virtual = VirtualPlanState(plan.nodes)
+            self._fit_scene_rect(self._virtual.bounds())
+            self.center_to_bottom_left()
+            self._update_virtual_items()
+            print(f"Graph: {len(plan.nodes)} nodes loaded in virtualized mode")
+            return
+        
+        # 创建节点
+        for node in plan.nodes:
+            thread_color = self.get_thread_color(node.thread_id)
+            item = NodeItem(node, thread_color=thread_color)
+            self.scene.addItem(item)
+            self._nodes_by_id[node.node_id] = item
+        self._fit_scene_rect(self.scene.itemsBoundingRect())
+        
         # 更新连接线
         self.update_connections()
         
         # 居中视图到第一个节点
         self.center_to_bottom_left()
     
+    # ==================== 场景缓存 ====================
+    
+    def _stash_current_scene(self):
+        """把当前场景放入缓存，视图换用新的空场景"""
+        plan = self.all_plans.get(self.current_pattern) if self.current_pattern in self.all_plans else None
+        if plan is None:
+            self.clear_nodes()
+            return
+        
+        self._virtual_timer.stop()
+        self._scene_cache[self.current_pattern] = CachedScene(self, plan)
+        self._scene_cache.move_to_end(self.current_pattern)
+        while len(self._scene_cache) > self.SCENE_CACHE_SIZE:
+            _, evicted = self._scene_cache.popitem(last=False)
+            evicted.release()
+        
+        self.scene = NodeGraphScene()
+        self.setScene(self.scene)
+        self._nodes_by_id = {}
+        self._virtual = None
+        self._virtual_status = {}
+        self.thread_color_map = {}
+    
+    def _restore_cached_scene(self, pattern_name: str, plan) -> bool:
+        """切回缓存的场景；缓存不存在或 pattern 数据已变化时返回 False"""
+        entry = self._scene_cache.pop(pattern_name, None)
+        if entry is None:
+            return False
+        if entry.plan is not plan or entry.node_count != len(plan.nodes):
+            entry.release()
+            return False
+        
+        ThreadManager.instance().sync_from_plan(plan)
+        self.scene = entry.scene
+        self.setScene(entry.scene)
+        self._nodes_by_id = entry.nodes_by_id
+        self._virtual = entry.virtual
+        self._virtual_status = entry.virtual_status
+        self.next_node_id = entry.next_node_id
+        self.thread_color_map = entry.thread_color_map
+        self.threadId_map_viewId = entry.threadId_map_viewId
+        self.setTransform(entry.transform)
+        self.centerOn(entry.center)
+        self.resetCachedContent()
+        self._schedule_virtual_update()
+        return True
+    
+    def invalidate_scene_cache(self, pattern_name: Optional[str] = None):
+        """pattern 数据在视图之外被替换时丢弃缓存的场景（默认全部）"""
+        names = [pattern_name] if pattern_name is not None else list(self._scene_cache)
+        for name in names:
+            entry = self._scene_cache.pop(name, None)
+            if entry is not None:
+                entry.release()
+    
     def get_current_plan(self) -> Optional[GuiExecutionPlan]:
         """
         获取当前 pattern 的 plan（包含最新修改）
@@ -1371,6 +2035,21 @@ class NodeGraphView(QGraphicsView):
         self._save_current_to_plans()
         return self.all_plans
     
+    def mark_dirty(self, pattern_name: Optional[str] = None):
+        """标记 pattern（默认当前 pattern）已修改"""
+        pattern_name = pattern_name or self.current_pattern
+        if pattern_name:
+            self.dirty_patterns.add(pattern_name)
+            self.planModified.emit(pattern_name)
+    
+    def take_dirty_patterns(self) -> set[str]:
+        """取出并清空脏标记；当前 pattern 已修改时先把场景数据写回 all_plans"""
+        if self.current_pattern in self.dirty_patterns:
+            self._save_current_to_plans()
+        dirty = self.dirty_patterns
+        self.dirty_patterns = set()
+        return dirty
+    
     def get_save_data(self) -> Dict[str, dict]:
         """
         获取用于保存的数据
@@ -1384,7 +2063,13 @@ class NodeGraphView(QGraphicsView):
         # 构建保存格式：将所有 plans 合并到一个 JSON 中
         # 格式: {"pattern1": {...}, "pattern2": {...}}
         all_data = {}
-        for pattern_name, plan in self.all_plans.items():
+        for pattern_name in self.all_plans:
+            try:
+                plan = self.all_plans[pattern_name]
+            except ValueError:
+                # 校验失败的 pattern 原样写回文件中的内容
+                all_data[pattern_name] = self.all_plans.source(pattern_name)
+                continue
             all_data[pattern_name] = plan.model_dump(exclude_none=True)
         
         return all_data
@@ -1397,7 +2082,10 @@ class NodeGraphView(QGraphicsView):
             task: 新的 task 内容
         """
         if self.current_pattern and self.current_pattern in self.all_plans:
-            self.all_plans[self.current_pattern].task = task
+            plan = self.all_plans[self.current_pattern]
+            if plan.task != task:
+                plan.task = task
+                self.mark_dirty()
     
     def get_current_task(self) -> str:
         """
@@ -1452,6 +2140,7 @@ class NodeGraphView(QGraphicsView):
         self.all_plans[pattern_name] = new_plan
         
         # 切换到新 pattern
+        self._stash_current_scene()
         self.current_pattern = pattern_name
         self._load_plan_to_scene(new_plan)
         
@@ -1462,6 +2151,7 @@ class NodeGraphView(QGraphicsView):
         # 发送当前 pattern 变化信号
         self.currentPatternChanged.emit(pattern_name, new_plan)
         
+        self.mark_dirty(pattern_name)
         print(f"Created new pattern: {pattern_name}")
         return True
     
@@ -1490,17 +2180,25 @@ class NodeGraphView(QGraphicsView):
             print("Error: New pattern name cannot be empty")
             return False
         
-        # 执行重命名
-        plan = self.all_plans.pop(old_name)
+        # 执行重命名（校验失败的 pattern 无法重命名）
+        try:
+            plan = self.all_plans.pop(old_name)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return False
         self.all_plans[new_name] = plan
         
         # 如果重命名的是当前 pattern，更新 current_pattern
         if self.current_pattern == old_name:
             self.current_pattern = new_name
+        if old_name in self._scene_cache:
+            self._scene_cache[new_name] = self._scene_cache.pop(old_name)
         
         # 发送信号通知 pattern 列表已更新
         patterns = list(self.all_plans.keys())
         self.patternListChanged.emit(patterns)
+        self.dirty_patterns.discard(old_name)
+        self.mark_dirty(new_name)
         
         print(f"Renamed pattern: '{old_name}' -> '{new_name}'")
         return True
@@ -1522,17 +2220,21 @@ class NodeGraphView(QGraphicsView):
             self.thread_color_map[new_name] = color
         
         # 更新所有节点的相关字段
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        for node in nodes:
-            if node.node_data.thread_id == old_name:
-                node.node_data.thread_id = new_name
-            if node.node_data.data_in_thread == old_name:
-                node.node_data.data_in_thread = new_name
-            if node.node_data.data_out_thread == old_name:
-                node.node_data.data_out_thread = new_name
+        for data in self._all_node_data():
+            if data.thread_id == old_name:
+                data.thread_id = new_name
+            if data.data_in_thread == old_name:
+                data.data_in_thread = new_name
+            if data.data_out_thread == old_name:
+                data.data_out_thread = new_name
+        for node in self._nodes_by_id.values():
             node.update()  # 触发重绘
         
-        self.update_connections()
+        if self._virtual is not None:
+            self._refresh_virtual()
+        else:
+            self.update_connections()
+        self.mark_dirty()
         print(f"Graph: Updated nodes for thread rename: '{old_name}' -> '{new_name}'")
     
     def _on_thread_deleted(self, thread_id: str):
@@ -1554,14 +2256,19 @@ class NodeGraphView(QGraphicsView):
         self.threadId_map_viewId = tm.get_thread_to_view_index_map()
         
         # 更新所有节点的 Y 位置
-        nodes = [i for i in self.scene.items() if isinstance(i, NodeItem)]
-        for node in nodes:
-            new_idx = tm.get_thread_view_index(node.node_data.thread_id)
-            if new_idx is not None and node.node_data.thread_view_index != new_idx:
-                node.node_data.thread_view_index = new_idx  # 这会自动触发 y 坐标计算
-                node.setPos(node.node_data.x, node.node_data.y)
-        
-        self.update_connections()
+        for data in self._all_node_data():
+            new_idx = tm.get_thread_view_index(data.thread_id)
+            if new_idx is not None and data.thread_view_index != new_idx:
+                data.thread_view_index = new_idx  # 这会自动触发 y 坐标计算
+                node = self._nodes_by_id.get(data.node_id)
+                if node is not None:
+                    node.sync_from_data()
+        
+        if self._virtual is not None:
+            self._refresh_virtual()
+        else:
+            self.update_connections()
+        self.mark_dirty()
         print(f"Graph: Updated node positions after view indices changed")
 
 
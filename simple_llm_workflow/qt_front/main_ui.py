@@ -1,7 +1,7 @@
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QHBoxLayout, 
                              QAction, QFileDialog, QSplitter, QLabel, QLineEdit, QComboBox, 
-                             QMessageBox, QPushButton, QInputDialog, QScrollArea)
+                             QMessageBox, QPushButton, QInputDialog, QScrollArea, QProgressDialog)
 from PyQt5.QtCore import Qt
 
 # 本地导入
@@ -10,6 +10,8 @@ from simple_llm_workflow.qt_front.context_panel import NodeContextPanel
 from simple_llm_workflow.qt_front.graph import NodeGraphView
 from simple_llm_workflow.qt_front.node_properties import NodePropertyEditor
 from simple_llm_workflow.qt_front.placeholder_panel import PlaceholderPanel
+from simple_llm_workflow.qt_front.plan_loader import BUSY as PLAN_LOAD_BUSY, PlanLoadWorker
+from simple_llm_workflow.qt_front.plan_saver import PlanSaver
 
 # 应用配置
 from simple_llm_workflow.config import BACKEND_PORT
@@ -18,6 +20,7 @@ from simple_llm_workflow.config import BACKEND_PORT
 from simple_llm_workflow.schemas import ALL_NODE_TYPES, NodeProperties, GuiExecutionPlan
 
 from simple_llm_workflow.qt_front.execution_panel import ExecutionControlPanel
+from simple_llm_workflow.qt_front.run_all_dialog import RunAllResultsDialog
 
 
 class MainWindow(QMainWindow):
@@ -48,6 +51,14 @@ class MainWindow(QMainWindow):
         save_as_action.triggered.connect(self.save_plan_as)
         toolbar.addAction(save_as_action)
         
+        toolbar.addSeparator()
+        
+        # 并发运行当前文件中的所有 pattern
+        self.run_all_action = QAction("全部运行", self)
+        self.run_all_action.setToolTip("为每个 pattern 创建执行器并发运行，完成后显示汇总结果")
+        self.run_all_action.triggered.connect(self.run_all_patterns)
+        toolbar.addAction(self.run_all_action)
+        
         # 主分割器 (水平逻辑)
         main_h_splitter = QSplitter(Qt.Horizontal)
         main_layout.addWidget(main_h_splitter)
@@ -172,10 +183,28 @@ class MainWindow(QMainWindow):
         # 占位符面板信号
         self.placeholder_panel.replaceRequested.connect(self._on_replace_placeholders)
         self.execution_panel.controller.contextFailed.connect(self._on_context_failed)
+        self.context_panel.messagesRequested.connect(self._on_messages_requested)
+        self.execution_panel.controller.messagesPageLoaded.connect(self.context_panel.load_messages_page)
+        self.execution_panel.controller.messagesPageFailed.connect(self._on_messages_page_failed)
+        
+        # 参数对比信号
+        self.context_panel.sweepRequested.connect(self._on_sweep_requested)
+        self.execution_panel.controller.sweepCompleted.connect(self.context_panel.load_sweep_results)
+        self.execution_panel.controller.sweepFailed.connect(self._on_sweep_failed)
+        
+        # 全部运行信号
+        self.execution_panel.controller.runAllCompleted.connect(self._on_run_all_completed)
+        self.execution_panel.controller.runAllFailed.connect(self._on_run_all_failed)
 
         # 初始状态
         self._switching_pattern = False  # 防止循环触发
         self.current_file_path = None  # 当前加载的文件路径（由 main 管理）
+        self._plan_loader = None  # 计划文件加载线程（加载完成后继续后台校验）
+        
+        # 增量保存：修改后防抖自动保存到 current_file_path
+        self.plan_saver = PlanSaver(self.graph_view, parent=self)
+        self.plan_saver.saved.connect(self._on_plan_saved)
+        self.plan_saver.saveFailed.connect(self._on_plan_save_failed)
         
         # 自动创建默认的 "custom" pattern
         self.graph_view.create_new_pattern("custom")
@@ -201,7 +230,11 @@ class MainWindow(QMainWindow):
             "task": current_task,
             "nodes": nodes_dicts
         }
-        self.execution_panel.set_plan(plan_data)
+        self.execution_panel.set_plan(
+            plan_data,
+            pattern=self.graph_view.current_pattern or None,
+            placeholders=self.placeholder_panel.get_replacements()
+        )
 
     def _on_step_executed(self, node_context: dict):
         """单步执行完成回调"""
@@ -215,10 +248,9 @@ class MainWindow(QMainWindow):
 
     def _on_node_states_updated(self, node_states: list):
         """批量更新节点状态"""
-        for state in node_states:
-            node_id = state.get("node_id")
-            status = state.get("status", "pending")
-            self.graph_view.update_node_status(node_id, status)
+        self.graph_view.update_node_statuses({
+            state.get("node_id"): state.get("status", "pending") for state in node_states
+        })
 
     def _on_execution_error(self, error: str):
         QMessageBox.warning(self, "Execution Error", error)
@@ -230,6 +262,13 @@ class MainWindow(QMainWindow):
         # 简单处理：仅打印或忽略，用户点其他节点会重试
         print(f"Failed to load context: {error}")
 
+    def _on_messages_requested(self, node_id: int, which: str, offset: int, limit: int, search: str):
+        self.execution_panel.controller.get_node_messages(node_id, which, offset, limit, search or None)
+
+    def _on_messages_page_failed(self, error: str):
+        print(f"Failed to load context messages: {error}")
+        self.context_panel.messages_page_failed()
+
     def on_node_selected(self, node_data):
         # 1. 转换数据为 NodeProperties 对象 (如果是字典则转换)
         if isinstance(node_data, NodeProperties):
@@ -293,6 +332,8 @@ class MainWindow(QMainWindow):
             
             if nid is not None:
                 self.execution_panel.controller.get_node_context(nid)
+            else:
+                self.execution_panel.controller.cancel_node_context()
         
         # 5. 通知执行面板当前选中的节点 ID（用于重新执行功能）
         nid = getattr(node_props, "node_id", None)
@@ -301,8 +342,15 @@ class MainWindow(QMainWindow):
         self.execution_panel.set_selected_node(nid)
 
     def on_node_data_changed(self):
-        # 如果数据更改影响了连接（如 thread_id），则更新图形视图中的连接
-        self.graph_view.update_connections()
+        # 节点名称等显示内容可能已变化，重绘该节点
+        node_data = self.prop_editor.current_node_data
+        if node_data is not None:
+            self.graph_view.refresh_node(node_data.node_id)
+        self.graph_view.mark_dirty()
+        # 数据更改可能影响该节点所在线程的连接（如 data_in / data_out），只更新该线程
+        self.graph_view.update_connections(
+            {node_data.thread_id or "main"} if node_data is not None else None
+        )
         # 更新执行计划
         self._update_execution_plan()
         
@@ -347,7 +395,8 @@ class MainWindow(QMainWindow):
         
         # 检查是否是选择了一个已存在的 pattern
         if pattern_name in self.graph_view.all_plans:
-            self.graph_view.switch_pattern(pattern_name)
+            if not self.graph_view.switch_pattern(pattern_name):
+                QMessageBox.warning(self, "Error", f"无法切换到 pattern '{pattern_name}'，详见控制台输出")
     
     def on_pattern_name_edited(self):
         """当用户编辑完 pattern 名称后（按下回车或失去焦点）"""
@@ -419,27 +468,151 @@ class MainWindow(QMainWindow):
             self.setWindowTitle("Simple LLM Workflow")
 
     def load_plans(self):
-        """加载 JSON 计划文件"""
-        from llm_linear_executor.os_plan import load_plans_from_templates
-        
+        """加载 JSON 计划文件（在后台线程中读取和解析，可取消）"""
         path, _ = QFileDialog.getOpenFileName(self, "Load Plan JSON", "", "JSON Files (*.json)")
-        if path:
+        if not path:
+            return
+        
+        # 取消仍在进行的加载或后台校验
+        self._stop_plan_loader()
+        
+        worker = PlanLoadWorker(path, self)
+        dialog = QProgressDialog(f"正在加载 {path}...", "取消", 0, 100, self)
+        dialog.setWindowTitle("Load Plan JSON")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(300)  # 小文件不显示对话框
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.setValue(0)
+        
+        def on_progress(value: int, stage: str):
+            dialog.setLabelText(f"{stage}: {path}")
+            if value == PLAN_LOAD_BUSY:
+                dialog.setRange(0, 0)  # 进度未知：显示忙碌动画
+                return
+            dialog.setRange(0, 100)
+            dialog.setValue(value)
+        
+        def on_canceled():
+            worker.requestInterruption()
+            print(f"Loading cancelled: {path}")
+        
+        worker.progress.connect(on_progress)
+        dialog.canceled.connect(on_canceled)
+        worker.loaded.connect(lambda plans: self._on_plans_loaded(worker, path, plans))
+        worker.failed.connect(lambda error: self._on_plans_load_failed(path, error))
+        worker.patternInvalid.connect(
+            lambda name, error: print(f"⚠️ Pattern '{name}' is invalid: {error}")
+        )
+        # 解析完成即关闭对话框，后台校验不阻塞界面（hide 不会触发 canceled）
+        worker.loaded.connect(dialog.hide)
+        worker.failed.connect(dialog.hide)
+        worker.finished.connect(dialog.hide)
+        worker.finished.connect(dialog.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+        self._plan_loader = worker
+        worker.start()
+    
+    def _stop_plan_loader(self, wait: bool = False):
+        worker = self._plan_loader
+        self._plan_loader = None
+        if worker is not None:
             try:
-                # 在 main_ui 中执行文件读取
-                plans_data = load_plans_from_templates(path, schema=GuiExecutionPlan)
-                
-                # 将数据传递给 graph_view 进行处理
-                patterns = self.graph_view.load_plans_data(plans_data)
-                self._update_placeholder_panel(plans_data[patterns[0]])
-                # 记录当前文件路径
-                self.current_file_path = path
-                self._update_file_status()
-                
-                print(f"Loaded {len(patterns)} patterns: {patterns}")
-            except Exception as e:
-                print(f"Error loading plans: {e}")
-                import traceback
-                traceback.print_exc()
+                worker.requestInterruption()
+                if wait:
+                    worker.wait()
+            except RuntimeError:
+                pass  # 线程结束后对象已被删除
+    
+    def closeEvent(self, event):
+        # 线程运行中销毁会导致崩溃，先等待加载线程退出
+        self._stop_plan_loader(wait=True)
+        # 写入等待自动保存的修改
+        self.plan_saver.shutdown()
+        super().closeEvent(event)
+    
+    def _on_plans_loaded(self, worker, path: str, plans_data):
+        """加载线程完成解析：显示 pattern 列表和第一个 pattern（其余 pattern 按需校验）"""
+        if worker is not self._plan_loader or worker.isInterruptionRequested():
+            return  # 已被取消或被新的加载取代
+        try:
+            # 将数据传递给 graph_view 进行处理
+            patterns = self.graph_view.load_plans_data(plans_data)
+            plan = self.graph_view.all_plans.get(self.graph_view.current_pattern)
+            if plan is not None:
+                self._update_placeholder_panel(plan)
+            # 记录当前文件路径
+            self.current_file_path = path
+            self.plan_saver.reset(path)
+            self._update_file_status()
+            
+            print(f"Loaded {len(patterns)} patterns: {patterns}")
+        except Exception as e:
+            print(f"Error loading plans: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def _on_plans_load_failed(self, path: str, error: str):
+        print(f"Error loading plans: {error}")
+        QMessageBox.warning(self, "Error", f"加载失败: {path}\n{error}")
+    
+    # ==================== 参数对比 ====================
+    
+    def _on_sweep_requested(self, grid: dict):
+        """对当前选中的节点进行参数对比"""
+        controller = self.execution_panel.controller
+        node_id = self.execution_panel._selected_node_id
+        if not controller.current_executor_id or node_id is None:
+            self.context_panel.set_sweep_running(False, "请先初始化执行器并选中一个已执行的节点")
+            return
+        self.context_panel.set_sweep_running(True, f"正在对比运行节点 {node_id}...")
+        controller.sweep_node(node_id, grid)
+    
+    def _on_sweep_failed(self, error: str):
+        self.context_panel.set_sweep_running(False, f"参数对比失败: {error}")
+    
+    # ==================== 全部运行 ====================
+    
+    def run_all_patterns(self):
+        """为每个 pattern 创建执行器并发运行"""
+        plans = self.graph_view.get_all_plans()
+        if not plans:
+            QMessageBox.warning(self, "Warning", "没有可运行的 pattern")
+            return
+        
+        plans_data = {}
+        invalid = []
+        for name in plans:
+            try:
+                plan = plans[name]
+            except ValueError as e:
+                # 延迟校验失败的 pattern 不参与运行
+                print(f"⚠️ 跳过无效的 pattern: {e}")
+                invalid.append(name)
+                continue
+            plans_data[name] = {"task": plan.task, "nodes": [n.model_dump() for n in plan.nodes]}
+        if invalid:
+            QMessageBox.warning(self, "Warning", f"以下 pattern 校验失败，将跳过: {', '.join(invalid)}")
+        if not plans_data:
+            return
+        
+        self.run_all_action.setEnabled(False)
+        self.statusBar().showMessage(f"正在并发运行 {len(plans_data)} 个 pattern...")
+        self.execution_panel.controller.run_all_patterns(
+            plans_data, placeholders=self.placeholder_panel.get_replacements()
+        )
+    
+    def _on_run_all_completed(self, result: dict):
+        self.run_all_action.setEnabled(True)
+        self.statusBar().showMessage(
+            f"全部运行完成: {result.get('completed', 0)} 完成, {result.get('failed', 0)} 失败", 5000
+        )
+        RunAllResultsDialog(result, self).exec_()
+    
+    def _on_run_all_failed(self, error: str):
+        self.run_all_action.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Execution Error", f"全部运行失败: {error}")
     
     def _update_placeholder_panel(self, plan):
         """更新占位符面板显示"""
@@ -457,48 +630,16 @@ class MainWindow(QMainWindow):
                 self.placeholder_panel.load_placeholders({})
     
     def _on_replace_placeholders(self):
-        """点击替换按钮后重新加载文件并替换占位符"""
-        from llm_linear_executor.os_plan import load_plans_from_templates
-        
-        if not self.current_file_path:
-            QMessageBox.warning(self, "Warning", "请先加载一个 JSON 文件")
-            return
-        
-        # 获取替换映射
+        """应用占位符值：计划保持模板形式，初始化执行器和全部运行时由后端填充占位符"""
         replacements = self.placeholder_panel.get_replacements()
         
         if not replacements:
             QMessageBox.information(self, "Info", "没有填写任何占位符值")
             return
         
-        try:
-            # 重新加载文件，传入 replacements
-            plans_data = load_plans_from_templates(
-                self.current_file_path, 
-                schema=GuiExecutionPlan,
-                replacements=replacements
-            )
-            
-            # 刷新界面
-            patterns = self.graph_view.load_plans_data(plans_data)
-            
-            # 刷新属性编辑器（清空当前节点，等待用户重新选中）
-            self.prop_editor.current_node_data = None
-            self.prop_editor.setEnabled(False)
-            
-            # 清空上下文面板
-            self.context_panel.clear_context()
-            
-            # 更新占位符面板
-            if patterns:
-                self._update_placeholder_panel(plans_data[patterns[0]])
-            
-            print(f"Replaced and reloaded {len(patterns)} patterns with: {replacements}")
-        except Exception as e:
-            print(f"Error replacing placeholders: {e}")
-            import traceback
-            traceback.print_exc()
-            QMessageBox.warning(self, "Error", f"替换失败: {e}")
+        self._update_execution_plan()
+        self.statusBar().showMessage(f"已应用 {len(replacements)} 个占位符值，将在执行时替换（模板文件保持不变）", 5000)
+        print(f"Placeholders applied for execution: {replacements}")
 
     def save_plan(self):
         """保存 JSON 计划文件"""
@@ -509,8 +650,6 @@ class MainWindow(QMainWindow):
         self._perform_save(force_dialog=True)
 
     def _perform_save(self, force_dialog=False):
-        import json
-        
         # 如果强制对话框 或 没有加载过文件，则询问保存路径
         if force_dialog or not self.current_file_path:
             # 使用上次的路径作为起始目录
@@ -522,22 +661,26 @@ class MainWindow(QMainWindow):
             path = self.current_file_path
         
         try:
-            # 从 graph_view 获取要保存的数据
-            save_data = self.graph_view.get_save_data()
-            
-            # 在 main_ui 中执行文件写入
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(save_data, f, indent=2, ensure_ascii=False)
+            # 只重新序列化修改过的 pattern，原子写入
+            self.plan_saver.save_now(path)
             
             # 更新当前文件路径
             self.current_file_path = path
             self._update_file_status()
             
-            print(f"Saved {len(save_data)} patterns to {path}")
+            print(f"Saved {len(self.graph_view.all_plans)} patterns to {path}")
         except Exception as e:
             print(f"Error saving plan: {e}")
             import traceback
             traceback.print_exc()
+            QMessageBox.warning(self, "Error", f"保存失败: {e}")
+    
+    def _on_plan_saved(self, path: str, count: int, elapsed_ms: float):
+        self.statusBar().showMessage(f"已保存 {path}（{count} 个 pattern 重新序列化，{elapsed_ms:.0f} ms）", 3000)
+    
+    def _on_plan_save_failed(self, path: str, error: str):
+        print(f"Error saving plan: {error}")
+        self.statusBar().showMessage(f"自动保存失败: {error}", 5000)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
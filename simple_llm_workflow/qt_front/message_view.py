@@ -0,0 +1,521 @@
+"""
+上下文消息的虚拟化列表
+
+消息按页从后端获取，只有滚动到可见范围附近的页才会请求；
+每条消息只绘制折叠后的预览，长内容（如大型工具输出）双击展开，右键可复制完整内容。
+"""
+import json
+from typing import Optional
+
+from PyQt5.QtWidgets import (QListView, QStyledItemDelegate, QStyle, QWidget, QVBoxLayout, QHBoxLayout,
+                             QLineEdit, QPushButton, QLabel, QComboBox, QMenu, QApplication, QAbstractItemView)
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRect, QPoint, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QFontMetrics
+
+
+PAGE_SIZE = 50               # 每次向后端请求的消息数
+PREVIEW_LINES = 12           # 折叠时显示的最大行数
+PREVIEW_CHARS = 1500         # 折叠时显示的最大字符数
+EXPANDED_MAX_CHARS = 200_000  # 展开后最多绘制的字符数，完整内容通过右键复制
+EXCERPT_RADIUS = 120         # 查找命中位于折叠部分时，预览中附带的上下文字符数
+
+ROLE_COLORS = {
+    "assistant": "#4CAF50",
+    "user": "#2196F3",
+    "human": "#2196F3",
+    "tool": "#FFC107",
+    "system": "#9E9E9E",
+}
+
+MessageRole = Qt.UserRole + 1  # 消息 dict，未加载时为 None
+
+
+def message_text(message: dict) -> str:
+    """消息的完整展示文本（内容 + 工具调用）"""
+    content = message.get("content", "")
+    text = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False, default=str)
+    for call in message.get("tool_calls") or []:
+        args = json.dumps(call.get("args", {}), ensure_ascii=False, default=str)
+        text += f"\n🔧 {call.get('name', 'unknown')}({args})"
+    return text
+
+
+class MessageListModel(QAbstractListModel):
+    """
+    按页加载的消息列表模型
+
+    行数为消息总数，未加载的行返回 None；视图通过 ensure_loaded 请求可见范围，
+    模型对尚未请求过的页发出 pageRequested。
+    """
+
+    pageRequested = pyqtSignal(int, int)  # (offset, limit)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._total = 0
+        self._messages: dict[int, dict] = {}
+        self._requested_pages: set[int] = set()
+        self._expanded: set[int] = set()
+        self._previews: dict[int, tuple[str, bool]] = {}  # 行 -> (预览文本, 是否被折叠)
+        self.highlight = ""
+        self.matches: set[int] = set()
+        # 同一轮事件循环内到达的多页只触发一次重新布局（每次布局会遍历所有行）
+        self._layout_timer = QTimer(self)
+        self._layout_timer.setSingleShot(True)
+        self._layout_timer.setInterval(0)
+        self._layout_timer.timeout.connect(self._relayout)
+
+    # ---------- QAbstractListModel ----------
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._total
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return self.display_text(row)
+        if role == MessageRole:
+            return self._messages.get(row)
+        return None
+
+    # ---------- 数据 ----------
+
+    def reset(self, total: int, messages: Optional[list[dict]] = None):
+        """重置为 total 条消息；messages 不为空时为全部消息（本地模式，不再请求）"""
+        self._layout_timer.stop()
+        self.beginResetModel()
+        self._total = total
+        self._messages = dict(enumerate(messages)) if messages else {}
+        self._requested_pages = set(range((total + PAGE_SIZE - 1) // PAGE_SIZE)) if messages else set()
+        self._expanded.clear()
+        self._previews.clear()
+        self.matches = set()
+        self.endResetModel()
+
+    def is_fully_loaded(self) -> bool:
+        return len(self._messages) >= self._total
+
+    def ensure_loaded(self, first: int, last: int):
+        """请求覆盖 [first, last] 的尚未请求的页"""
+        last = min(last, self._total - 1)
+        if last < 0:
+            return
+        for page in range(max(first, 0) // PAGE_SIZE, last // PAGE_SIZE + 1):
+            if page in self._requested_pages:
+                continue
+            self._requested_pages.add(page)
+            self.pageRequested.emit(page * PAGE_SIZE, PAGE_SIZE)
+
+    def set_page(self, offset: int, messages: list[dict]):
+        """后端返回的一页消息"""
+        if not messages:
+            return
+        for i, message in enumerate(messages, start=offset):
+            if i < self._total:
+                self._messages[i] = message
+                self._previews.pop(i, None)
+        self._layout_timer.start()
+
+    def _relayout(self):
+        self.layoutAboutToBeChanged.emit()
+        self.layoutChanged.emit()
+
+    def retry_pending(self):
+        """请求失败后允许重新请求尚未加载的页"""
+        self._requested_pages = {
+            page for page in self._requested_pages
+            if all(i in self._messages for i in range(page * PAGE_SIZE, min((page + 1) * PAGE_SIZE, self._total)))
+        }
+
+    def full_text(self, row: int) -> Optional[str]:
+        message = self._messages.get(row)
+        return message_text(message) if message is not None else None
+
+    # ---------- 折叠 / 展开 ----------
+
+    def display_text(self, row: int) -> Optional[str]:
+        message = self._messages.get(row)
+        if message is None:
+            return None
+        if row in self._expanded:
+            text = message_text(message)
+            if len(text) > EXPANDED_MAX_CHARS:
+                text = text[:EXPANDED_MAX_CHARS] + f"\n… 仅显示前 {EXPANDED_MAX_CHARS} 字符，右键复制完整内容"
+            return text
+        return self._preview(row, message)[0]
+
+    def is_collapsed(self, row: int) -> bool:
+        message = self._messages.get(row)
+        return message is not None and row not in self._expanded and self._preview(row, message)[1]
+
+    def toggle_expanded(self, row: int):
+        if row in self._expanded:
+            self._expanded.discard(row)
+        elif self.is_collapsed(row):
+            self._expanded.add(row)
+        else:
+            return
+        self._relayout()
+
+    def _preview(self, row: int, message: dict) -> tuple[str, bool]:
+        cached = self._previews.get(row)
+        if cached is not None:
+            return cached
+        text = message_text(message)
+        cut = -1
+        for _ in range(PREVIEW_LINES):
+            cut = text.find("\n", cut + 1)
+            if cut < 0:
+                break
+        cut = min(len(text) if cut < 0 else cut, PREVIEW_CHARS)
+        if cut >= len(text):
+            cached = (text, False)
+        else:
+            preview = text[:cut]
+            excerpt = self._excerpt(text, cut)
+            if excerpt:
+                preview += f"\n…\n{excerpt}"
+            preview += f"\n… 共 {text.count(chr(10)) + 1} 行 / {len(text)} 字符，双击展开"
+            cached = (preview, True)
+        self._previews[row] = cached
+        return cached
+
+    def _excerpt(self, text: str, cut: int) -> str:
+        """查找内容只出现在折叠部分时，截取命中位置附近的文本"""
+        if not self.highlight:
+            return ""
+        lowered = text.casefold()
+        needle = self.highlight.casefold()
+        if needle in lowered[:cut]:
+            return ""
+        pos = lowered.find(needle, cut)
+        if pos < 0:
+            return ""
+        start = max(cut, pos - EXCERPT_RADIUS)
+        return text[start:pos + len(needle) + EXCERPT_RADIUS]
+
+    # ---------- 查找 ----------
+
+    def set_highlight(self, query: str):
+        if query == self.highlight:
+            return
+        self.highlight = query
+        self._previews.clear()
+        self._relayout()
+
+    def search_local(self, query: str) -> Optional[list[int]]:
+        """全部消息已在本地时直接查找，否则返回 None（由后端查找）"""
+        if not self.is_fully_loaded():
+            return None
+        needle = query.casefold()
+        return [row for row in range(self._total) if needle in message_text(self._messages[row]).casefold()]
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """
+    绘制消息卡片：角色标题 + 换行的预览文本
+
+    非统一行高的 QListView 每次布局都会对所有行调用 sizeHint，
+    因此字体度量和宽度只在尺寸变化时重新计算，行高按 (行, 宽度, 文本) 缓存。
+    """
+
+    PADDING = 6
+    PLACEHOLDER_LINES = 3  # 未加载行的估计高度，减少加载后滚动条跳动
+
+    def __init__(self, view: QListView):
+        super().__init__(view)
+        self._view = view
+        self._heights: dict[tuple, int] = {}
+        self.update_metrics()
+
+    def update_metrics(self):
+        """视图宽度或字体变化后调用"""
+        self._fm = QFontMetrics(self._view.font())
+        self._width = max(50, self._view.viewport().width() - 2 * self.PADDING - 8)
+        self._header = self._fm.height() + self.PADDING
+        self._placeholder = QSize(
+            self._width, self._header + self._fm.height() * self.PLACEHOLDER_LINES + 2 * self.PADDING
+        )
+
+    def sizeHint(self, option, index) -> QSize:
+        row = index.row()
+        text = index.model().display_text(row)
+        if text is None:
+            return self._placeholder
+        key = (row, self._width, hash(text))
+        height = self._heights.get(key)
+        if height is None:
+            if len(self._heights) > 5000:
+                self._heights.clear()
+            height = self._fm.boundingRect(QRect(0, 0, self._width, 10 ** 7), Qt.TextWordWrap, text).height()
+            self._heights[key] = height
+        return QSize(self._width, self._header + height + 2 * self.PADDING)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(2, 2, -2, -2)
+        selected = bool(option.state & QStyle.State_Selected)
+        painter.fillRect(rect, QColor("#3a4a5a" if selected else "#2d2d2d"))
+        model = index.model()
+        row = index.row()
+        if row in model.matches:
+            painter.fillRect(QRect(rect.left(), rect.top(), 3, rect.height()), QColor("#FFC107"))
+
+        inner = rect.adjusted(self.PADDING + 2, self.PADDING, -self.PADDING, -self.PADDING)
+        fm = QFontMetrics(option.font)
+        message = index.data(MessageRole)
+        if message is None:
+            painter.setPen(QColor("#777"))
+            painter.drawText(inner, Qt.AlignLeft | Qt.AlignTop, f"#{row + 1}  加载中…")
+            painter.restore()
+            return
+
+        role = message.get("role", "unknown")
+        header = f"#{row + 1}  [{role}]"
+        if message.get("tool_call_id"):
+            header += f"  {message['tool_call_id']}"
+        if model.is_collapsed(row):
+            header += "  ▸ 已折叠"
+        bold = QFont(option.font)
+        bold.setBold(True)
+        painter.setFont(bold)
+        painter.setPen(QColor(ROLE_COLORS.get(role, "#BDBDBD")))
+        painter.drawText(QRect(inner.left(), inner.top(), inner.width(), fm.height()), Qt.AlignLeft, header)
+
+        painter.setFont(option.font)
+        painter.setPen(QColor("#dddddd"))
+        text_rect = QRect(inner.left(), inner.top() + fm.height() + self.PADDING,
+                          self._width, inner.height() - fm.height() - self.PADDING)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, index.data(Qt.DisplayRole))
+        painter.restore()
+
+
+class MessageListView(QListView):
+    """按可见范围请求消息页的列表视图，双击展开/折叠，右键复制"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setUniformItemSizes(False)
+        self.setResizeMode(QListView.Adjust)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self._delegate = MessageDelegate(self)
+        self.setItemDelegate(self._delegate)
+
+        self._fetch_timer = QTimer(self)
+        self._fetch_timer.setSingleShot(True)
+        self._fetch_timer.setInterval(0)
+        self._fetch_timer.timeout.connect(self._fetch_visible)
+        self.verticalScrollBar().valueChanged.connect(self.schedule_fetch)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.modelReset.connect(self.schedule_fetch)
+        model.layoutChanged.connect(self.schedule_fetch)
+
+    def schedule_fetch(self, *_):
+        self._fetch_timer.start()
+
+    def resizeEvent(self, event):
+        self._delegate.update_metrics()
+        super().resizeEvent(event)
+        self.schedule_fetch()
+
+    def _fetch_visible(self):
+        model = self.model()
+        if model is None or model.rowCount() == 0:
+            return
+        top = self.indexAt(QPoint(4, 4))
+        bottom = self.indexAt(QPoint(4, self.viewport().height() - 4))
+        first = top.row() if top.isValid() else 0
+        last = bottom.row() if bottom.isValid() else first + PAGE_SIZE
+        # 上下各预取半页
+        model.ensure_loaded(first - PAGE_SIZE // 2, last + PAGE_SIZE // 2)
+
+    def mouseDoubleClickEvent(self, event):
+        index = self.indexAt(event.pos())
+        if index.isValid():
+            self.model().toggle_expanded(index.row())
+            return
+        super().mouseDoubleClickEvent(event)
+
+    def contextMenuEvent(self, event):
+        index = self.indexAt(event.pos())
+        if not index.isValid() or index.data(MessageRole) is None:
+            return
+        model = self.model()
+        menu = QMenu(self)
+        copy_action = menu.addAction("复制消息")
+        toggle_action = None
+        if model.is_collapsed(index.row()):
+            toggle_action = menu.addAction("展开")
+        elif index.row() in model._expanded:
+            toggle_action = menu.addAction("折叠")
+        action = menu.exec_(event.globalPos())
+        if action == copy_action:
+            QApplication.clipboard().setText(model.full_text(index.row()) or "")
+        elif action is not None and action == toggle_action:
+            model.toggle_expanded(index.row())
+
+
+class MessageContextView(QWidget):
+    """
+    节点上下文消息面板：执行前/后切换 + 上下文内查找 + 虚拟化消息列表
+
+    分页模式下通过 messagesRequested / searchRequested 向外请求数据，
+    结果由 set_page 传入；本地模式（消息已随上下文返回）不发出请求。
+    """
+
+    messagesRequested = pyqtSignal(str, int, int)  # (which, offset, limit)
+    searchRequested = pyqtSignal(str, str)  # (which, query)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+
+        bar = QHBoxLayout()
+        self.which_combo = QComboBox()
+        self.which_combo.addItem("执行前消息", "before")
+        self.which_combo.addItem("执行后消息", "after")
+        self.which_combo.currentIndexChanged.connect(lambda _: self._show_current())
+        bar.addWidget(self.which_combo)
+        self.find_edit = QLineEdit()
+        self.find_edit.setPlaceholderText("在上下文中查找（回车）")
+        self.find_edit.returnPressed.connect(self._on_find)
+        bar.addWidget(self.find_edit)
+        self.prev_btn = QPushButton("↑")
+        self.next_btn = QPushButton("↓")
+        for btn, step in ((self.prev_btn, -1), (self.next_btn, 1)):
+            btn.setFixedWidth(28)
+            btn.clicked.connect(lambda _, s=step: self._step_match(s))
+            bar.addWidget(btn)
+        self.match_label = QLabel("")
+        self.match_label.setStyleSheet("color: #aaa;")
+        bar.addWidget(self.match_label)
+        layout.addLayout(bar)
+
+        self.model = MessageListModel(self)
+        self.model.pageRequested.connect(self._on_page_requested)
+        self.list_view = MessageListView()
+        self.list_view.setModel(self.model)
+        self.model.layoutChanged.connect(self._keep_pinned)
+        layout.addWidget(self.list_view)
+
+        self._counts: dict[str, int] = {"before": 0, "after": 0}
+        self._local: Optional[dict[str, list[dict]]] = None
+        self._matches: list[int] = []
+        self._match_pos = 0
+        self._pinned_row: Optional[int] = None  # 跳转到的行，上方的页加载完成前保持在顶部
+
+    @property
+    def which(self) -> str:
+        return self.which_combo.currentData()
+
+    def load(self, counts: dict[str, int], local: Optional[dict[str, list[dict]]] = None):
+        """
+        显示新节点的消息
+
+        Args:
+            counts: before/after 的消息总数（分页模式）
+            local: before/after 的全部消息（本地模式，提供时忽略 counts）
+        """
+        self._local = local
+        self._counts = {k: len(v) for k, v in local.items()} if local is not None else dict(counts)
+        self._show_current()
+
+    def clear(self):
+        self.load({"before": 0, "after": 0})
+
+    def _show_current(self):
+        which = self.which
+        messages = self._local.get(which) if self._local is not None else None
+        self._pinned_row = None
+        self.model.reset(self._counts.get(which, 0), messages)
+        self._clear_matches()
+        query = self.find_edit.text().strip()
+        self.model.set_highlight(query)
+        if query:
+            self._on_find()
+
+    def _on_page_requested(self, offset: int, limit: int):
+        if self._local is None:
+            self.messagesRequested.emit(self.which, offset, limit)
+
+    def set_page(self, page: dict):
+        """后端返回的消息页或查找结果（与当前显示不符的页被忽略）"""
+        if page.get("which") != self.which:
+            return
+        total = page.get("total", 0)
+        if total != self.model.rowCount():
+            # 上下文已变化（如节点重新执行），按新的总数重新加载
+            self._counts[self.which] = total
+            self.model.reset(total)
+        self.model.set_page(page.get("offset", 0), page.get("messages") or [])
+        if page.get("matches") is not None:
+            self._apply_matches(page["matches"])
+
+    def page_failed(self):
+        self.model.retry_pending()
+
+    # ---------- 查找 ----------
+
+    def _on_find(self):
+        query = self.find_edit.text().strip()
+        self.model.set_highlight(query)
+        if not query:
+            self._clear_matches()
+            return
+        matches = self.model.search_local(query)
+        if matches is not None:
+            self._apply_matches(matches)
+        else:
+            self.match_label.setText("查找中…")
+            self.searchRequested.emit(self.which, query)
+
+    def _clear_matches(self):
+        self._matches = []
+        self._match_pos = 0
+        self.model.matches = set()
+        self.match_label.setText("")
+        self.list_view.viewport().update()
+
+    def _apply_matches(self, matches: list[int]):
+        self._matches = list(matches)
+        self._match_pos = 0
+        self.model.matches = set(matches)
+        if not matches:
+            self.match_label.setText("无匹配")
+            self.list_view.viewport().update()
+            return
+        self._goto_match()
+
+    def _step_match(self, step: int):
+        if not self._matches:
+            self._on_find()
+            return
+        self._match_pos = (self._match_pos + step) % len(self._matches)
+        self._goto_match()
+
+    def _goto_match(self):
+        row = self._matches[self._match_pos]
+        index = self.model.index(row)
+        self._pinned_row = row
+        self.list_view.scrollTo(index, QAbstractItemView.PositionAtTop)
+        self.list_view.setCurrentIndex(index)
+        self.list_view.schedule_fetch()
+        self.match_label.setText(f"{self._match_pos + 1}/{len(self._matches)}")
+
+    def _keep_pinned(self):
+        """上方的消息加载后行高变化，重新滚动到跳转的行"""
+        row = self._pinned_row
+        if row is None or row >= self.model.rowCount():
+            self._pinned_row = None
+            return
+        self.list_view.scrollTo(self.model.index(row), QAbstractItemView.PositionAtTop)
+        if all(self.model.display_text(r) is not None for r in range(max(0, row - PAGE_SIZE // 2), row + 1)):
+            self._pinned_row = None
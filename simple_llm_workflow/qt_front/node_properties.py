@@ -228,11 +228,14 @@ class NodePropertyEditor(QGroupBox):
         
         self.enable_search_cb = QCheckBox("启用搜索")
         self.enable_thinking_cb = QCheckBox("启用思考")
+        self.semantic_cache_cb = QCheckBox("启用语义缓存")
+        self.semantic_cache_cb.setToolTip("prompt 与之前的调用足够相似时（如只有日期不同）直接复用缓存的回复")
         
         llm_setting_layout.addRow("温度 (Temperature):", self.temp_spin)
         llm_setting_layout.addRow("Top-P:", self.topp_spin)
         llm_setting_layout.addRow(self.enable_search_cb)
         llm_setting_layout.addRow(self.enable_thinking_cb)
+        llm_setting_layout.addRow(self.semantic_cache_cb)
         
         # 添加拉伸量以将字段推向顶部
         llm_setting_layout.addRow(QWidget())  # 占位符
@@ -278,6 +281,7 @@ class NodePropertyEditor(QGroupBox):
         self.topp_spin.valueChanged.connect(self._auto_save)
         self.enable_search_cb.stateChanged.connect(self._auto_save)
         self.enable_thinking_cb.stateChanged.connect(self._auto_save)
+        self.semantic_cache_cb.stateChanged.connect(self._auto_save)
         
         # --- 连接 ThreadManager 信号 ---
         ThreadManager.instance().threadsChanged.connect(self._refresh_thread_dropdowns)
@@ -632,6 +636,7 @@ class NodePropertyEditor(QGroupBox):
         self.topp_spin.setValue(self._get_node_val("top_p", 0.9))
         self.enable_search_cb.setChecked(self._get_node_val("enable_search", False))
         self.enable_thinking_cb.setChecked(self._get_node_val("enable_thinking", False))
+        self.semantic_cache_cb.setChecked(self._get_node_val("semantic_cache", False))
             
         self.update_field_visibility(ntype)
         
@@ -734,6 +739,7 @@ class NodePropertyEditor(QGroupBox):
         self._set_node_val("top_p", self.topp_spin.value())
         self._set_node_val("enable_search", self.enable_search_cb.isChecked())
         self._set_node_val("enable_thinking", self.enable_thinking_cb.isChecked())
+        self._set_node_val("semantic_cache", self.semantic_cache_cb.isChecked())
     
     def save_node_data(self):
         """手动保存 - 更新数据并触发连接更新"""
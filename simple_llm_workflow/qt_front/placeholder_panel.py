@@ -20,14 +20,14 @@ class PlaceholderPanel(QWidget):
     功能:
     - 显示当前 pattern 的占位符列表
     - 提供值编辑输入框
-    - "替换" 按钮触发替换逻辑
+    - "应用" 按钮确认填写的值（执行时发送给后端替换，模板不变）
     - "自动检测" 按钮扫描 JSON 提取占位符
     
     信号:
-    - replaceRequested: 当用户点击替换按钮时发射
+    - replaceRequested: 当用户点击应用按钮时发射
     """
     
-    replaceRequested = pyqtSignal()  # 请求执行替换
+    replaceRequested = pyqtSignal()  # 请求应用占位符值
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -66,8 +66,8 @@ class PlaceholderPanel(QWidget):
         # 按钮区域
         btn_layout = QHBoxLayout()
         
-        self._replace_btn = QPushButton("🔄 替换并重新加载")
-        self._replace_btn.setToolTip("用填写的值替换占位符并重新加载文件")
+        self._replace_btn = QPushButton("✅ 应用占位符")
+        self._replace_btn.setToolTip("填写的值在初始化执行器和全部运行时由后端替换，计划文件保持模板形式")
         self._replace_btn.setStyleSheet("""
             QPushButton {
                 background-color: #1565c0;
@@ -191,7 +191,7 @@ class PlaceholderPanel(QWidget):
     
     
     def _on_replace_clicked(self):
-        """替换按钮点击处理"""
+        """应用按钮点击处理"""
         self.replaceRequested.emit()
 
 
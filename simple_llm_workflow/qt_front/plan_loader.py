@@ -0,0 +1,182 @@
+"""
+计划文件的后台加载
+
+文件的读取、解析和模板处理在工作线程中进行，pattern 列表处理完成后立即可用；
+每个 pattern 在首次切换到时才做 schema 校验，其余 pattern 在后台依次校验。
+"""
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Iterator, Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from simple_llm_workflow.schemas import GuiExecutionPlan
+
+
+BUSY = -1  # progress 的百分比为 BUSY 时表示进度未知
+
+
+class LazyPlans(MutableMapping):
+    """
+    pattern_name -> GuiExecutionPlan 的延迟校验字典
+
+    构造时只保存原始 dict，首次访问某个 pattern 时才校验为 GuiExecutionPlan 并缓存。
+    可同时被 GUI 线程和后台校验线程访问；校验在锁外进行，结果只在尚未缓存时写入。
+    原始 dict 不会被修改，保存时未修改过的 pattern 可直接用它序列化（见 source）。
+    """
+
+    def __init__(self, raw_plans: dict[str, dict], schema: type = GuiExecutionPlan):
+        self._schema = schema
+        self._entries: dict[str, Any] = dict(raw_plans)  # 未校验的为原始 dict
+        self._sources: dict[str, dict] = dict(raw_plans)
+        self._parsed: set[str] = set()
+        self._errors: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str):
+        with self._lock:
+            value = self._entries[name]
+            if name in self._parsed:
+                return value
+            if name in self._errors:
+                raise ValueError(self._errors[name])
+        try:
+            plan = self._schema.model_validate(value)
+        except ValidationError as e:
+            message = f"Pattern '{name}' 校验失败: {e}"
+            with self._lock:
+                self._errors[name] = message
+            raise ValueError(message) from e
+        with self._lock:
+            if name in self._parsed:
+                return self._entries[name]
+            if self._entries.get(name) is value:
+                self._entries[name] = plan
+                self._parsed.add(name)
+        return plan
+
+    def __setitem__(self, name: str, plan):
+        with self._lock:
+            self._entries[name] = plan
+            self._sources.pop(name, None)
+            self._parsed.add(name)
+            self._errors.pop(name, None)
+
+    def __delitem__(self, name: str):
+        with self._lock:
+            del self._entries[name]
+            self._sources.pop(name, None)
+            self._parsed.discard(name)
+            self._errors.pop(name, None)
+
+    def __contains__(self, name) -> bool:
+        # 不触发校验
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_parsed(self, name: str) -> bool:
+        return name in self._parsed
+
+    def source(self, name: str) -> Optional[dict]:
+        """文件中该 pattern 的原始 dict（pattern 被替换或删除后返回 None）"""
+        return self._sources.get(name)
+
+    def pending(self) -> list[str]:
+        """尚未校验（且未失败）的 pattern"""
+        with self._lock:
+            return [n for n in self._entries if n not in self._parsed and n not in self._errors]
+
+    def validate(self, name: str) -> Optional[str]:
+        """校验指定 pattern，返回错误信息（成功或 pattern 已被删除时返回 None）"""
+        try:
+            self[name]
+        except KeyError:
+            return None
+        except ValueError as e:
+            return str(e)
+        return None
+
+
+class _TemplateOutput(BaseModel):
+    """
+    接收模板处理结果的占位 schema：接受任意字段、不做校验
+
+    所有文件都只经过一次执行器的模板加载（load_plans_from_templates），
+    用它代替 GuiExecutionPlan 取回处理后的 dict，再交给 LazyPlans 延迟校验。
+    """
+    model_config = ConfigDict(extra="allow")
+
+
+class PlanLoadWorker(QThread):
+    """
+    计划文件加载线程
+
+    run() 依次：模板加载（读取、解析并处理文件）-> 校验第一个 pattern -> 发出 loaded，
+    之后继续在后台校验其余 pattern。requestInterruption() 在各阶段之间生效。
+    """
+
+    progress = pyqtSignal(int, str)  # (百分比或 BUSY, 阶段说明)
+    loaded = pyqtSignal(object)  # LazyPlans 或 dict[str, GuiExecutionPlan]
+    failed = pyqtSignal(str)
+    patternInvalid = pyqtSignal(str, str)  # (pattern_name, 错误信息)，后台校验失败
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self):
+        try:
+            plans = self._load()
+        except Exception as e:
+            if not self.isInterruptionRequested():
+                self.failed.emit(f"{type(e).__name__}: {e}")
+            return
+        if plans is None or self.isInterruptionRequested():
+            return  # 已取消
+        self.progress.emit(100, "完成")
+        self.loaded.emit(plans)
+
+        # 后台校验其余 pattern
+        if isinstance(plans, LazyPlans):
+            for name in plans.pending():
+                if self.isInterruptionRequested():
+                    return
+                error = plans.validate(name)
+                if error:
+                    self.patternInvalid.emit(name, error)
+
+    def _load(self):
+        if self.isInterruptionRequested():
+            return None
+
+        # 文件只由执行器的模板加载读取和解析一次（无法分块报告进度，显示为忙碌状态）；
+        # 占位 schema 取回处理后的 dict，schema 校验延迟到首次访问
+        from llm_linear_executor.os_plan import load_plans_from_templates
+        self.progress.emit(BUSY, "读取并处理模板")
+        processed = load_plans_from_templates(self.path, schema=_TemplateOutput)
+        # 库调用本身不可中断，期间请求的取消在返回后生效（结果直接丢弃）
+        if self.isInterruptionRequested():
+            return None
+        plans = LazyPlans({
+            name: plan.model_dump() if isinstance(plan, BaseModel) else plan
+            for name, plan in processed.items()
+        })
+        if not plans:
+            raise ValueError("文件中没有任何 pattern")
+
+        # 第一个有效的 pattern 会立即显示，在线程内先完成校验
+        self.progress.emit(85, "校验首个 pattern")
+        errors = []
+        for name in plans:
+            try:
+                plans[name]
+                return plans
+            except ValueError as e:
+                errors.append(str(e))
+        raise ValueError("文件中没有有效的 pattern:\n" + "\n".join(errors))
@@ -0,0 +1,188 @@
+"""
+计划文件的增量保存
+
+每个 pattern 序列化后的 JSON 片段被缓存，保存时只重新序列化修改过的 pattern，
+其余 pattern 直接拼接缓存的片段；文件先写入同目录的临时文件再原子替换，
+写入过程中崩溃不会损坏原文件。修改后经过防抖延迟在后台线程自动保存。
+"""
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+
+AUTOSAVE_DELAY_MS = 2000  # 最后一次修改后多久自动保存
+
+
+def atomic_write_text(path: str, text: str):
+    """写入同目录临时文件并 fsync 后用 os.replace 替换目标文件，保留原文件权限"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def pattern_fragment(plan_dict: dict) -> str:
+    """pattern 的 JSON 片段，缩进与 json.dump(all_data, indent=2) 中的第二层一致"""
+    return json.dumps(plan_dict, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+
+
+def join_fragments(names: list[str], fragments: dict[str, str]) -> str:
+    """拼接为与 json.dump(all_data, indent=2, ensure_ascii=False) 相同的文本"""
+    if not names:
+        return "{}"
+    body = ",\n".join(f"  {json.dumps(name, ensure_ascii=False)}: {fragments[name]}" for name in names)
+    return "{\n" + body + "\n}"
+
+
+class PlanSaver(QObject):
+    """
+    NodeGraphView 计划库的保存器
+
+    - 脏标记来自 graph_view.take_dirty_patterns()，只有这些 pattern 在 GUI 线程做 model_dump
+    - 从未修改过的延迟加载 pattern 直接使用文件中的原始 dict，不经过 model_dump
+    - JSON 编码、拼接和写文件在单个后台线程中按提交顺序执行
+    """
+
+    saved = pyqtSignal(str, int, float)  # (路径, 重新序列化的 pattern 数, 耗时 ms)
+    saveFailed = pyqtSignal(str, str)  # (路径, 错误信息)
+
+    def __init__(self, graph_view, delay_ms: int = AUTOSAVE_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.graph_view = graph_view
+        self.path: Optional[str] = None
+        self.autosave_enabled = True
+        self._fragments: dict[str, str] = {}  # 已写入文件的片段
+        self._known: set[str] = set()  # 已有片段或已提交序列化的 pattern
+        self._redump: set[str] = set()  # 写入失败、需从当前数据重新序列化的 pattern
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan-saver")
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._autosave)
+        graph_view.planModified.connect(self.schedule)
+
+    def reset(self, path: Optional[str]):
+        """加载新文件后清空片段缓存"""
+        self._timer.stop()
+        self.path = path
+        with self._lock:
+            self._fragments.clear()
+            self._known.clear()
+            self._redump.clear()
+
+    def schedule(self, *_):
+        """防抖：在最后一次修改后 delay_ms 保存"""
+        if self.path and self.autosave_enabled:
+            self._timer.start()
+
+    def _autosave(self):
+        if self.path:
+            self.save_async(self.path)
+
+    # =========================================================================
+    # 保存
+    # =========================================================================
+    def _snapshot(self) -> tuple[list[str], dict[str, Any], set[str]]:
+        """
+        在 GUI 线程中收集需要重新序列化的 pattern
+
+        Returns:
+            (pattern 顺序, pattern -> 待编码的 dict, 其中来自当前数据（而非原始文件）的 pattern)
+        """
+        plans = self.graph_view.all_plans
+        dirty = self.graph_view.take_dirty_patterns()
+        source_of = getattr(plans, "source", None)  # LazyPlans 保留的原始 dict
+        with self._lock:
+            dirty |= self._redump
+            self._redump = set()
+            known = set(self._known)
+        names = list(plans)
+        jobs: dict[str, Any] = {}
+        dumped: set[str] = set()
+        for name in names:
+            if name in known and name not in dirty:
+                continue
+            source = source_of(name) if source_of is not None and name not in dirty else None
+            if source is None:
+                source = plans[name].model_dump(exclude_none=True)
+                dumped.add(name)
+            jobs[name] = source
+        with self._lock:
+            self._known.update(jobs)
+        return names, jobs, dumped
+
+    def _write(self, path: str, names: list[str], jobs: dict[str, Any], dumped: set[str]) -> tuple[int, float]:
+        """后台线程：编码修改过的 pattern，拼接缓存片段并原子写入"""
+        start = time.perf_counter()
+        try:
+            encoded = {name: pattern_fragment(data) for name, data in jobs.items()}
+            with self._lock:
+                fragments = {name: encoded.get(name) or self._fragments.get(name) for name in names}
+            missing = [name for name, fragment in fragments.items() if fragment is None]
+            if missing:
+                # 之前的保存失败，这些 pattern 的片段未写入
+                raise RuntimeError(f"patterns not serialized yet: {missing}")
+            atomic_write_text(path, join_fragments(names, fragments))
+        except BaseException:
+            with self._lock:
+                self._known.difference_update(jobs)
+                self._redump.update(dumped)
+            raise
+        with self._lock:
+            self._fragments = fragments
+        return len(jobs), (time.perf_counter() - start) * 1000
+
+    def _submit(self, path: str):
+        self._timer.stop()
+        names, jobs, dumped = self._snapshot()
+        future = self._executor.submit(self._write, path, names, jobs, dumped)
+
+        def on_done(f):
+            error = f.exception()
+            if error is not None:
+                self.saveFailed.emit(path, f"{type(error).__name__}: {error}")
+            else:
+                count, elapsed = f.result()
+                self.saved.emit(path, count, elapsed)
+
+        future.add_done_callback(on_done)
+        return future
+
+    def save_async(self, path: str):
+        """后台保存（自动保存使用），结果通过 saved / saveFailed 信号通知"""
+        self._submit(path)
+
+    def save_now(self, path: str):
+        """同步保存（手动保存使用），失败时抛出异常"""
+        self._submit(path).result()
+        self.path = path
+
+    def shutdown(self):
+        """立即保存未写入的修改并等待后台线程结束"""
+        if self._timer.isActive() and self.path:
+            try:
+                self.save_now(self.path)
+            except Exception as e:
+                print(f"Error saving plan on exit: {e}")
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,92 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QTextBrowser, QSplitter, QDialogButtonBox)
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+
+
+class RunAllResultsDialog(QDialog):
+    """显示所有 pattern 并发运行结果的对话框"""
+
+    COLUMNS = ["Pattern", "状态", "耗时 (s)", "输入 tokens", "输出 tokens", "总 tokens", "输出"]
+
+    def __init__(self, result: dict, parent=None):
+        """
+        参数:
+            result: RunAllPatternsResponse 的字典形式
+        """
+        super().__init__(parent)
+        self.setWindowTitle("全部运行结果")
+        self.resize(1000, 600)
+        self._results = result.get("results", [])
+
+        layout = QVBoxLayout(self)
+
+        # 汇总信息
+        usage = result.get("tokens_usage", {})
+        summary = QLabel(
+            f"完成 {result.get('completed', 0)} / 失败 {result.get('failed', 0)}　"
+            f"总耗时 {result.get('elapsed', 0):.1f}s　"
+            f"总 tokens {usage.get('total_tokens', 0)}"
+        )
+        summary.setStyleSheet("font-weight: bold; padding: 4px;")
+        layout.addWidget(summary)
+
+        splitter = QSplitter(Qt.Vertical)
+        layout.addWidget(splitter)
+
+        # 结果表格
+        self.table = QTableWidget(len(self._results), len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(len(self.COLUMNS) - 1, QHeaderView.Stretch)
+
+        for row, item in enumerate(self._results):
+            usage = item.get("tokens_usage") or {}
+            failed = item.get("status") != "completed"
+            output = item.get("error") if failed else (item.get("content") or "")
+            values = [
+                item.get("pattern", ""),
+                "❌ 失败" if failed else "✓ 完成",
+                f"{item.get('elapsed', 0):.2f}",
+                str(usage.get("input_tokens", 0)),
+                str(usage.get("output_tokens", 0)),
+                str(usage.get("total_tokens", 0)),
+                (output or "").replace("\n", " ")[:200],
+            ]
+            for col, value in enumerate(values):
+                cell = QTableWidgetItem(value)
+                if col == 1:
+                    cell.setForeground(QColor("#F44336" if failed else "#4CAF50"))
+                if 2 <= col <= 5:
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, cell)
+
+        splitter.addWidget(self.table)
+
+        # 选中行的完整输出
+        self.output_browser = QTextBrowser()
+        self.output_browser.setPlaceholderText("选中一行查看完整输出")
+        splitter.addWidget(self.output_browser)
+        splitter.setSizes([350, 250])
+
+        self.table.currentCellChanged.connect(self._on_row_changed)
+        if self._results:
+            self.table.selectRow(0)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def _on_row_changed(self, row, _col, _prev_row, _prev_col):
+        if row < 0 or row >= len(self._results):
+            return
+        item = self._results[row]
+        if item.get("status") == "completed":
+            self.output_browser.setPlainText(item.get("content") or "")
+        else:
+            self.output_browser.setPlainText(f"错误: {item.get('error') or ''}")
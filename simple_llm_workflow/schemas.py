@@ -7,7 +7,10 @@ from llm_linear_executor.schemas import (
     NodeDefinition,
     ExecutionPlan
 )
-from pydantic import Field, model_validator
+from pydantic import Field, model_validator, model_serializer, PrivateAttr
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator, Sequence
+from itertools import islice
 from typing import Optional, Any
 from pydantic import BaseModel
 from enum import Enum
@@ -27,6 +30,16 @@ class NodeProperties(NodeDefinition):
     # 布局信息 (直接平铺在对象中，方便存取)
     x: int = Field(default=0, description="UI X坐标")
     y: int = Field(default=0, description="UI Y坐标")
+    # 语义缓存（仅前端标记，初始化执行器时转换为 SemanticCacheConfig）
+    semantic_cache: bool = Field(default=False, description="是否对该节点启用语义缓存")
+
+    @model_serializer(mode='wrap')
+    def _drop_default_flags(self, handler) -> dict:
+        # 未启用语义缓存时不写入该字段，避免每个保存的节点都多出 "semantic_cache": false
+        data = handler(self)
+        if not self.semantic_cache:
+            data.pop("semantic_cache", None)
+        return data
 
     @model_validator(mode='after')
     def _init_coords(self) -> 'NodeProperties':
@@ -153,10 +166,18 @@ class NodeExecutionState(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     error: Optional[str] = None
+    metrics: dict[str, Any] = {}  # 执行指标，如 llm_routes（每次 LLM 调用选择的供应商、延迟和切换记录）
+    context_version: int = 0  # 当前节点上下文的版本号，0 表示尚无上下文（见 NodeContext.version）
 
 
 class NodeContext(BaseModel):
-    """节点上下文信息 - 用于前端展示"""
+    """
+    节点上下文信息 - 用于前端展示
+
+    执行器内部只记录线程共享消息日志中的偏移量 (_before_end/_after_end)，
+    thread_messages_before/after 在 materialize() 时才按偏移量切出，
+    避免每个节点保存两份完整的线程消息。
+    """
     node_id: int
     node_name: str
     thread_id: str
@@ -166,6 +187,98 @@ class NodeContext(BaseModel):
     llm_output: str = ""                      # LLM 输出
     tool_calls: list[dict] = []               # 工具调用记录
     data_out_content: Optional[str] = None    # 输出到父线程的内容
+    version: int = 0                          # 上下文版本号，执行器内单调递增；节点重新执行后变化，前端据此缓存
+
+    # 增量存储：引用线程的序列化消息日志（同一线程的节点共享同一个列表，None 为不展示的消息）
+    # 由 data_in 创建的线程，日志是源线程日志的视图（ThreadLog），切片时才物化
+    _before_log: Optional[Sequence[Optional[dict]]] = PrivateAttr(default=None)
+    _before_end: int = PrivateAttr(default=0)
+    _after_log: Optional[Sequence[Optional[dict]]] = PrivateAttr(default=None)
+    _after_end: int = PrivateAttr(default=0)
+    # 日志的可见消息数前缀（visible[i] 为前 i 条中非 None 的条数），分页与计数不扫描日志
+    _before_visible: Optional[Sequence[int]] = PrivateAttr(default=None)
+    _after_visible: Optional[Sequence[int]] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_log(
+        cls,
+        before_log: Sequence[Optional[dict]],
+        before_end: int,
+        after_log: Sequence[Optional[dict]],
+        after_end: int,
+        before_visible: Optional[Sequence[int]] = None,
+        after_visible: Optional[Sequence[int]] = None,
+        **data
+    ) -> 'NodeContext':
+        """创建仅记录日志偏移量的节点上下文（before/after_visible 为日志的可见消息数前缀）"""
+        context = cls(**data)
+        context._before_log = before_log
+        context._before_end = before_end
+        context._after_log = after_log
+        context._after_end = after_end
+        context._before_visible = before_visible
+        context._after_visible = after_visible
+        return context
+
+    def _log(self, which: str) -> tuple[Sequence[Optional[dict]], int, Optional[Sequence[int]]]:
+        if which not in ("before", "after"):
+            raise ValueError(f"which 必须是 before 或 after: {which}")
+        if which == "before":
+            return self._before_log, self._before_end, self._before_visible
+        return self._after_log, self._after_end, self._after_visible
+
+    def message_count(self, which: str) -> int:
+        """执行前 (before) 或执行后 (after) 的可见线程消息数"""
+        log, end, visible = self._log(which)
+        if log is None:
+            return len(self.thread_messages_before if which == "before" else self.thread_messages_after)
+        if visible is None:
+            return sum(1 for m in islice(log, end) if m is not None)
+        return visible[end]
+
+    def message_page(self, which: str, offset: int = 0, limit: Optional[int] = None) -> list[dict]:
+        """
+        可见消息中 [offset, offset + limit) 的一页（分页接口使用）
+
+        按可见消息数前缀二分定位日志区间，只切片该区间，不复制整个日志。
+        """
+        log, end, visible = self._log(which)
+        if log is None:
+            messages = self.thread_messages_before if which == "before" else self.thread_messages_after
+            return messages[offset:None if limit is None else offset + limit]
+        if visible is None:
+            return self.messages(which)[offset:None if limit is None else offset + limit]
+        total = visible[end]
+        stop = total if limit is None else min(total, offset + limit)
+        if offset >= stop:
+            return []
+        # 第 offset 条可见消息的日志下标，以及第 stop 条（不含）之前的日志边界
+        start_raw = bisect_right(visible, offset, 0, end + 1) - 1
+        stop_raw = bisect_left(visible, stop, start_raw, end + 1)
+        return [m for m in log[start_raw:stop_raw] if m is not None]
+
+    def iter_messages(self, which: str) -> Iterator[dict]:
+        """按顺序迭代可见消息，不物化列表（查找使用）"""
+        log, end, _ = self._log(which)
+        if log is None:
+            return iter(self.thread_messages_before if which == "before" else self.thread_messages_after)
+        return (m for m in islice(log, end) if m is not None)
+
+    def messages(self, which: str) -> list[dict]:
+        """执行前 (before) 或执行后 (after) 的全部线程消息，不复制消息字典"""
+        log, end, _ = self._log(which)
+        if log is None:
+            return self.thread_messages_before if which == "before" else self.thread_messages_after
+        return [m for m in log[:end] if m is not None]
+
+    def materialize(self) -> 'NodeContext':
+        """返回填充了 thread_messages_before/after 的副本（已填充时返回自身）"""
+        if self._before_log is None:
+            return self
+        return self.model_copy(update={
+            "thread_messages_before": self.messages("before"),
+            "thread_messages_after": self.messages("after"),
+        })
 
 
 # =========================================================================
@@ -184,16 +297,86 @@ class ToolInfo(BaseModel):
     name: str
     description: str = "No description"
     parameters: Optional[dict[str, Any]] = None
+    json_schema: Optional[dict[str, Any]] = None  # args_schema 的 JSON Schema
 
 class ToolListResponse(BaseModel):
     """获取工具列表响应"""
     tools: list[ToolInfo]
 
+# 2.1 Tools Reload (POST /api/tools/reload, GET /api/tools/events)
+class ToolsReloadEvent(BaseModel):
+    """工具配置热重载事件"""
+    seq: int
+    timestamp: str
+    status: str  # success / failed
+    path: Optional[str] = None
+    tools: list[str] = []
+    message: str = ""
+
+class ToolsReloadEventsResponse(BaseModel):
+    """热重载事件列表响应"""
+    events: list[ToolsReloadEvent]
+
+# LLM Providers (GET /api/llm/providers)
+class LLMProviderStats(BaseModel):
+    """多供应商路由中单个端点的滚动统计"""
+    name: str
+    model: Optional[str] = None
+    calls: int = 0                       # 统计窗口内的调用次数
+    error_rate: float = 0.0
+    avg_latency: Optional[float] = None  # 成功调用的平均延迟（秒）
+    healthy: bool = True                 # False 表示处于冷却期
+    pinned_nodes: list[str] = []         # 固定使用该供应商的节点
+
+class LLMProvidersResponse(BaseModel):
+    """LLM 供应商列表响应，routed=False 表示当前未使用多供应商路由"""
+    routed: bool
+    providers: list[LLMProviderStats] = []
+
+# Semantic Cache (GET/DELETE /api/semantic-cache)
+class SemanticCacheStats(BaseModel):
+    """单个节点的语义缓存统计"""
+    pattern: str  # 缓存所属的 pattern（未指定时为计划内容的摘要）
+    node_name: str
+    entries: int
+    max_entries: int
+    threshold: float
+    hits: int
+    misses: int
+
+class SemanticCacheStatsResponse(BaseModel):
+    """语义缓存统计响应"""
+    caches: list[SemanticCacheStats] = []
+
 # 3. Init Executor (POST /api/executor/init)
+class SemanticCacheConfig(BaseModel):
+    """语义缓存配置（按节点启用，缓存按 (pattern, 节点名称) 在执行器之间共享）"""
+    nodes: list[str] = []  # 启用语义缓存的节点名称
+    pattern: Optional[str] = None  # 所属 pattern，为空时按计划内容区分
+    threshold: float = Field(default=0.95, ge=0.5, le=1.0)  # 余弦相似度阈值
+    max_entries: int = Field(default=256, ge=1, le=10000)  # 每个节点的最大缓存条目数
+
+class ContextBudgetConfig(BaseModel):
+    """
+    线程上下文预算配置
+
+    strategy:
+    - truncate: 保留开头 keep_first 条消息和最近的消息，丢弃中间最旧的消息
+    - keep_recent: 只保留系统消息和最近的消息
+    - summarize: 被丢弃的消息由 LLM 压缩为一条摘要
+    """
+    max_tokens: int = Field(default=32000, ge=256)  # 每个线程发送给 LLM 的最大 tokens
+    strategy: str = Field(default="truncate", pattern="^(truncate|keep_recent|summarize)$")
+    keep_first: int = Field(default=1, ge=0)  # truncate / summarize 保留的开头消息数（通常是任务）
+    thread_max_tokens: dict[str, int] = {}  # 线程 -> 预算，覆盖 max_tokens（0 表示不限制）
+
 class InitExecutorRequest(BaseModel):
     """初始化执行器请求"""
     plan: dict  # ExecutionPlan 的字典形式
     default_tool_limit: Optional[int] = 1  # 默认工具调用次数限制
+    semantic_cache: Optional[SemanticCacheConfig] = None  # 语义缓存（默认关闭）
+    context_budget: Optional[ContextBudgetConfig] = None  # 线程上下文预算（默认不压缩）
+    placeholders: Optional[dict[str, str]] = None  # 占位符值 {"{name}" 或 "name": value}
 
 class InitExecutorResponse(BaseModel):
     """初始化执行器响应"""
@@ -261,6 +444,20 @@ class NodeContextResponse(BaseModel):
     llm_output: str
     tool_calls: list[dict]
     data_out_content: Optional[str]
+    version: int = 0  # 上下文版本号，同一 (executor_id, node_id, version) 的内容不会变化
+    # include_messages=false 时消息列表为空，前端按数量分页获取
+    thread_messages_before_count: int = 0
+    thread_messages_after_count: int = 0
+
+# 9.1. Get Node Context Messages (GET /api/executor/{id}/nodes/{node_id}/context/messages)
+class NodeMessagesPageResponse(BaseModel):
+    """节点上下文消息的一页"""
+    node_id: int
+    which: str  # before / after
+    total: int  # 消息总数
+    offset: int
+    messages: list[dict]
+    matches: Optional[list[int]] = None  # 指定 search 时，所有包含该文本的消息下标
 
 # 10. Get Executor Messages (GET /api/executor/{id}/messages)
 class ExecutorMessagesResponse(BaseModel):
@@ -268,6 +465,105 @@ class ExecutorMessagesResponse(BaseModel):
     executor_id: str
     messages: list[dict]
 
+# 11. Run All Patterns (POST /api/plans/run-all)
+class RunAllPatternsRequest(BaseModel):
+    """并发运行多个 pattern 的请求"""
+    plans: dict[str, dict]  # pattern 名称 -> ExecutionPlan 的字典形式
+    default_tool_limit: Optional[int] = 1
+    max_concurrency: int = Field(default=4, ge=1, le=32)  # 同时运行的 pattern 数上限
+    semantic_cache: Optional[SemanticCacheConfig] = None  # 语义缓存（默认关闭）
+    context_budget: Optional[ContextBudgetConfig] = None  # 线程上下文预算（默认不压缩）
+    placeholders: Optional[dict[str, str]] = None  # 占位符值，应用于所有 pattern
+    keep_executors: bool = False  # 保留执行器以便查询节点上下文（需调用方删除）
+
+class PatternRunResult(BaseModel):
+    """单个 pattern 的运行结果"""
+    pattern: str
+    executor_id: Optional[str] = None  # 仅 keep_executors 时返回
+    status: str  # completed / failed
+    content: Optional[str] = None
+    tokens_usage: dict = {}
+    error: Optional[str] = None
+    elapsed: float = 0.0  # 秒
+
+class RunAllPatternsResponse(BaseModel):
+    """并发运行多个 pattern 的汇总结果"""
+    results: list[PatternRunResult]
+    completed: int
+    failed: int
+    tokens_usage: dict  # 所有 pattern 的 tokens 合计
+    elapsed: float  # 总耗时（秒）
+
+# 12. Sweep Node (POST /api/executor/{id}/nodes/{node_id}/sweep)
+class SweepNodeRequest(BaseModel):
+    """参数对比请求：各维度取值的笛卡尔积即为运行的参数组合"""
+    models: Optional[list[str]] = None
+    temperatures: Optional[list[float]] = None
+    top_ps: Optional[list[float]] = None
+    max_concurrency: int = Field(default=4, ge=1, le=16)
+
+class SweepRunResult(BaseModel):
+    """单组参数的运行结果"""
+    config: dict[str, Any]
+    status: str  # completed / failed
+    output: Optional[str] = None
+    llm_input: str = ""
+    latency: float = 0.0  # 秒
+    tokens_usage: dict = {}
+    error: Optional[str] = None
+
+class SweepNodeResponse(BaseModel):
+    """参数对比响应"""
+    node_id: int
+    node_name: str
+    results: list[SweepRunResult]
+    elapsed: float
+
+# Plan Estimate (POST /api/plans/estimate)
+class PlanEstimateRequest(BaseModel):
+    """执行前 token / 费用估算请求"""
+    plan: dict  # ExecutionPlan 的字典形式
+    default_tool_limit: Optional[int] = 1
+    context_window: int = Field(default=131072, ge=1)  # 模型上下文窗口（tokens）
+    expected_output_tokens: int = Field(default=512, ge=0)  # 每次 LLM 回复的预计 token 数
+    tool_output_tokens: int = Field(default=800, ge=0)  # 每次工具结果的预计 token 数
+    input_price_per_1k: float = Field(default=0.0, ge=0)  # 每千输入 token 价格
+    output_price_per_1k: float = Field(default=0.0, ge=0)  # 每千输出 token 价格
+
+class NodeTokenEstimate(BaseModel):
+    """单个节点的 token 估算"""
+    node_id: int
+    node_name: str
+    thread_id: str
+    prompt_tokens: int       # 任务提示
+    inherited_tokens: int    # 执行前线程中已有的消息
+    tool_schema_tokens: int  # 工具描述与参数表
+    tool_calls: int          # 预计工具调用次数
+    input_tokens: int        # 该节点所有 LLM 调用的输入合计
+    peak_input_tokens: int   # 单次 LLM 调用的最大输入（与上下文窗口比较）
+    output_tokens: int
+    context_ratio: float     # peak_input_tokens / context_window
+    status: str              # ok / warning / overflow
+
+class ThreadTokenEstimate(BaseModel):
+    """单个线程的 token 估算"""
+    thread_id: str
+    nodes: int
+    input_tokens: int
+    output_tokens: int
+    peak_input_tokens: int
+    final_tokens: int  # 执行结束时线程上下文的大小
+
+class PlanEstimateResponse(BaseModel):
+    """执行前 token / 费用估算响应"""
+    nodes: list[NodeTokenEstimate]
+    threads: list[ThreadTokenEstimate]
+    total_input_tokens: int
+    total_output_tokens: int
+    estimated_cost: float
+    context_window: int
+    warnings: list[str] = []
+
 if __name__ == "__main__":
     from llm_linear_executor.os_plan import load_plans_from_templates
     plans = load_plans_from_templates(r"llm_linear_executor\example\example1\example.json", schema=GuiExecutionPlan)
@@ -1,14 +1,21 @@
 # 异步执行器定义 V2
 # 独立的异步版本，逻辑与同步版本 Executor 相同
 # 业务扩展应继承此类
-import copy
+import asyncio
+import inspect
+import time
 from datetime import datetime
 from typing import Callable, Optional, Any
 from llm_linear_executor.executor import Executor 
 from simple_llm_workflow.schemas import (
     NodeDefinition, ExecutionPlan,NodeStatus,NodeContext,NodeStatus,NodeExecutionState
 )
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from simple_llm_workflow.server.message_store import MessageStore
+from simple_llm_workflow.server.thread_view import OffsetView, SliceView, ThreadLog
+from simple_llm_workflow.llm_router import route_scope
+from simple_llm_workflow.prompt_template import render_plan, render_messages, wrap_llm_factory as with_input_capture
+from simple_llm_workflow.server.semantic_cache import SemanticCache, wrap_llm_factory as with_semantic_cache
+from simple_llm_workflow.server.context_budget import ContextBudget, wrap_llm_factory as with_context_budget
 
 import logging
 logger = logging.getLogger(__name__)
@@ -30,7 +37,10 @@ class AsyncExecutor(Executor):
         plan: ExecutionPlan,
         tools_map: dict[str, Callable] | None = None, # 工具映射 {tool_name: callable}
         default_tools_limit: int | None = 1, # 默认工具调用次数限制（每个工具的默认调用次数），None 表示无限制
-        llm_factory: Callable[..., Any] | None = None # LLM 工厂函数，用于创建 LLM 实例
+        llm_factory: Callable[..., Any] | None = None, # LLM 工厂函数，用于创建 LLM 实例
+        semantic_caches: dict[str, SemanticCache] | None = None, # 节点名称 -> 语义缓存（仅这些节点启用）
+        context_budget: ContextBudget | None = None, # 线程上下文预算，None 表示不压缩
+        placeholders: dict[str, str] | None = None # 占位符值 {name 或 '{name}': value}
     ):
         """
         初始化异步执行器
@@ -40,7 +50,40 @@ class AsyncExecutor(Executor):
             tools_map: 工具映射 {tool_name: callable}
             default_tools_limit: 默认工具调用次数限制（每个工具的默认调用次数），None 表示无限制
             llm_factory: LLM 工厂函数，用于创建 LLM 实例
+            semantic_caches: 节点名称 -> 语义缓存，相似的 prompt 直接返回缓存回复
+            context_budget: 线程上下文预算，每次调用 LLM 前按预算压缩输入消息
+            placeholders: 占位符值，初始化时用编译好的 prompt 模板填充计划中的 {placeholder}
         """
+        # 保存构造参数，用于 fork 出独立的执行器（参数对比等）
+        self._init_kwargs = dict(
+            plan=plan,
+            tools_map=tools_map,
+            default_tools_limit=default_tools_limit,
+            llm_factory=llm_factory,
+            context_budget=context_budget,
+            placeholders=placeholders
+        )
+        
+        # 占位符只在初始化时按编译好的模板填充一次，执行中不再重建 prompt
+        plan = render_plan(plan, placeholders)
+        
+        # 消息驻留存储：线程、data_out 合并与快照共享同一份消息对象
+        # 需先于父类初始化创建，父类初始化过程中可能已创建线程
+        self.message_store = MessageStore()
+        
+        # LLM 包装：上下文预算（最外层，先压缩输入）-> 输入记录 -> 语义缓存 -> 原始工厂
+        self.semantic_caches = semantic_caches or {}
+        self.context_budget = context_budget
+        if llm_factory is not None:
+            raw_factory = llm_factory
+            if self.semantic_caches:
+                llm_factory = with_semantic_cache(llm_factory, self.semantic_caches)
+            llm_factory = with_input_capture(llm_factory)
+            if context_budget is not None:
+                llm_factory = with_context_budget(
+                    llm_factory, context_budget, self.message_store, summary_factory=raw_factory
+                )
+        
         # 调用父类初始化
         # 注意：父类 __init__ 签名是 (plan, tools_map, default_tools_limit, llm_factory)
         super().__init__(
@@ -53,11 +96,27 @@ class AsyncExecutor(Executor):
         # ===== 状态追踪（扩展） =====
         self.node_states: dict[int, NodeExecutionState] = {}
         self.node_contexts: dict[int, NodeContext] = {}
+        self._context_version = 0  # 最近一次记录的节点上下文版本号（单调递增）
         self._current_node_index = 0  # 当前执行到的节点索引
         
+        # 父类初始化时创建的线程消息写入驻留存储
+        for thread_messages in self.context["messages"].values():
+            self.message_store.intern_list(thread_messages)
+        
         # 上下文历史快照，记录每个节点执行前的 context
         # 用于支持节点重新执行时恢复上下文
-        self.context_history: dict[int, dict] = {}  # {node_id: deepcopy(self.context)}
+        self.context_history: dict[int, dict] = {}  # {node_id: message_store.snapshot_context(self.context)}
+        
+        # 每个线程的序列化消息日志（只追加），NodeContext 仅记录其中的偏移量
+        # _thread_log_refs 与日志一一对应，保存原始消息对象用于检测线程消息是否被替换
+        # 由 data_in 创建的线程，日志为源线程日志区间的视图 + 本线程追加的部分
+        self._thread_logs: dict[str, list[Optional[dict]] | ThreadLog] = {}
+        self._thread_log_refs: dict[str, list | ThreadLog] = {}
+        # 可见消息数前缀：_thread_log_visible[t][i] 为日志前 i 条中非 None 的条数（长度为日志长度 + 1），
+        # 分页和计数按它直接定位，不需要扫描日志
+        self._thread_log_visible: dict[str, list[int] | ThreadLog] = {}
+        # 上次同步时的线程消息列表对象：列表未被替换且末尾已记录的消息仍在原位时视为只追加，跳过逐条比较
+        self._thread_log_lists: dict[str, list] = {}
         
         # 初始化所有节点状态
         self._init_node_states()
@@ -75,25 +134,110 @@ class AsyncExecutor(Executor):
     # =========================================================================
     # 消息序列化辅助
     # =========================================================================
+    def _serialize_message(self, msg) -> Optional[dict]:
+        """将单条消息序列化为字典（使用驻留记录的缓存），不支持的消息类型返回 None"""
+        return self.message_store.serialize(msg)
+
     def _serialize_messages(self, messages: list) -> list[dict]:
         """将消息列表序列化为字典列表，用于前端展示"""
         result = []
         for msg in messages:
-            if isinstance(msg, HumanMessage):
-                result.append({"role": "user", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                item = {"role": "assistant", "content": msg.content}
-                if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                    item["tool_calls"] = msg.tool_calls
+            item = self._serialize_message(msg)
+            if item is not None:
                 result.append(item)
-            elif isinstance(msg, ToolMessage):
-                result.append({
-                    "role": "tool",
-                    "content": msg.content,
-                    "tool_call_id": msg.tool_call_id
-                })
         return result
 
+    def _sync_thread_log(self, thread_id: str) -> list[Optional[dict]]:
+        """
+        将线程的序列化日志与当前线程消息同步，只序列化新增的消息
+
+        线程消息正常情况下只追加：消息列表仍是上次同步的同一对象、长度未减少且上次最后一条仍在原位时，
+        直接追加新消息（O(新增)）。否则（如重新执行时恢复上下文会替换整个列表）逐条比较找出公共前缀，
+        从该处重建一个新的日志列表，旧列表保留给已有的 NodeContext 引用。
+
+        Returns:
+            该线程当前的序列化日志
+        """
+        messages = self._get_thread_messages(thread_id)
+        log = self._thread_logs.get(thread_id)
+        refs = self._thread_log_refs.get(thread_id)
+        visible = self._thread_log_visible.get(thread_id)
+
+        if log is None:
+            log, refs, visible = [], [], [0]
+        elif self._thread_log_lists.get(thread_id) is messages and len(messages) >= len(refs) and (
+            not refs or messages[len(refs) - 1] is refs[-1]
+        ):
+            pass  # 只追加
+        else:
+            # 检测到改写：逐条比较对象身份（中间的消息被替换或删除时首尾可能不变，驻留后相同内容共享对象）。
+            # 视图日志（ThreadLog）同样支持迭代 / 切片，切片物化为普通列表
+            prefix = 0
+            for ref, msg in zip(refs, messages):
+                if ref is not msg:
+                    break
+                prefix += 1
+            if prefix < len(refs):
+                log, refs, visible = log[:prefix], refs[:prefix], visible[:prefix + 1]
+
+        for msg in messages[len(refs):]:
+            refs.append(msg)
+            # 不展示的消息以 None 占位，保证日志与消息下标一一对应
+            item = self._serialize_message(msg)
+            log.append(item)
+            visible.append(visible[-1] + (item is not None))
+
+        self._thread_logs[thread_id] = log
+        self._thread_log_refs[thread_id] = refs
+        self._thread_log_visible[thread_id] = visible
+        self._thread_log_lists[thread_id] = messages
+        return log
+
+    # =========================================================================
+    # 线程创建与合并（覆盖父类，结果消息写入驻留存储）
+    # =========================================================================
+    def _create_thread(self, thread_id: str, node: NodeDefinition):
+        """
+        创建线程，继承自 data_in 的消息与源线程共享同一份对象
+
+        新线程的序列化日志是源线程日志对应区间的视图（ThreadLog），
+        继承的消息不重新序列化，也不复制源日志。
+        """
+        source_thread = node.data_in_thread or self.main_thread_id
+        source_messages = self.context["messages"].get(source_thread)
+        source_log = self._sync_thread_log(source_thread) if source_messages is not None else None
+
+        super()._create_thread(thread_id, node)
+        messages = self.context["messages"][thread_id]
+        self.message_store.intern_list(messages)
+
+        if source_log is None or thread_id == source_thread:
+            return
+        start, end = node.data_in_slice or (None, None)
+        start, stop, _ = slice(start, end).indices(len(source_messages))
+        stop = max(start, stop)
+        # 父类只做切片时，新线程开头与源区间逐个为同一对象；否则退回普通日志
+        if len(messages) < stop - start or any(
+            messages[i] is not source_messages[start + i] for i in range(stop - start)
+        ):
+            return
+        self._thread_logs[thread_id] = ThreadLog(SliceView(source_log, start, stop))
+        self._thread_log_refs[thread_id] = ThreadLog(
+            SliceView(self._thread_log_refs[source_thread], start, stop)
+        )
+        self._thread_log_visible[thread_id] = ThreadLog(
+            OffsetView(self._thread_log_visible[source_thread], start, stop + 1)
+        )
+        self._thread_log_lists[thread_id] = messages
+
+    def _merge_data_out(self, source_thread: str, target_thread: str):
+        """合并 data_out 到目标线程，新增消息写入驻留存储"""
+        start = len(self.context["messages"].get(target_thread, []))
+        super()._merge_data_out(source_thread, target_thread)
+        target_messages = self.context["messages"].get(target_thread)
+        if target_messages is not None:
+            self.message_store.intern_list(target_messages, start)
+
     # =========================================================================
     # 主执行方法（异步）- 覆盖父类 execute (同步)
     # =========================================================================
@@ -150,22 +294,23 @@ class AsyncExecutor(Executor):
         Returns:
             节点执行结果
         """
-        # 保存执行前的上下文快照（用于支持重新执行）
-        self.context_history[node_id] = copy.deepcopy(self.context)
+        # 保存执行前的上下文快照（用于支持重新执行），消息按引用共享
+        self.context_history[node_id] = self.message_store.snapshot_context(self.context)
         
         # 更新状态为 RUNNING
         self.node_states[node_id].status = NodeStatus.RUNNING
         self.node_states[node_id].start_time = datetime.now()
+        self.node_states[node_id].metrics = {}
         
         try:
             # 确保线程存在（必须先创建线程，才能记录消息）
             if node.thread_id not in self.context["messages"]:
                 self._create_thread(node.thread_id, node)
             
-            # 记录执行前的线程消息（在线程确保存在后获取）
-            messages_before = self._serialize_messages(
-                self._get_thread_messages(node.thread_id)
-            )
+            # 记录执行前的线程消息偏移量（在线程确保存在后获取）
+            log_before = self._sync_thread_log(node.thread_id)
+            visible_before = self._thread_log_visible[node.thread_id]
+            before_end = len(log_before)
             
             # 使用处理器分发 (父类的方法)
             handler = self._node_handlers.get(node.node_type)
@@ -176,11 +321,18 @@ class AsyncExecutor(Executor):
 
             # 执行节点 (使用 await，兼容父类的异步 handler)
             # 对于 tool-first 节点，工具调用发生在 handler 内部
-            content = await handler(node)
-            # LLM 输入 prompt
-            llm_input = self._get_prompt(node)
-            # 删除 prompt 中的 当前节点的输出content
-            llm_input = llm_input.replace(content, "")
+            # 路由作用域：多供应商路由按节点固定规则选择端点，并记录每次调用的路由
+            with route_scope(node.node_name, node.thread_id) as scope:
+                try:
+                    content = await handler(node)
+                finally:
+                    self._record_scope_metrics(node_id, scope)
+            # 节点新产生的消息写入驻留存储
+            self.message_store.intern_list(
+                self.context["messages"][node.thread_id], before_end
+            )
+            # LLM 输入：节点最后一次 LLM 调用实际发送的消息（在调用时记录）
+            llm_input = render_messages(scope.llm_inputs[-1]) if scope.llm_inputs else ""
             
             # 如果节点设置了 data_out，根据 data_out_thread 合并到目标线程
             # (这个逻辑已经包含在父类 handler 里了吗？)
@@ -197,23 +349,29 @@ class AsyncExecutor(Executor):
                 target_thread = node.data_out_thread if node.data_out_thread else self.main_thread_id
                 self._merge_data_out(node.thread_id, target_thread)
             
-            # 记录执行后的线程消息
-            messages_after = self._serialize_messages(
-                self._get_thread_messages(node.thread_id)
-            )
+            # 记录执行后的线程消息偏移量
+            log_after = self._sync_thread_log(node.thread_id)
+            visible_after = self._thread_log_visible[node.thread_id]
             
-            # 保存节点上下文
-            self.node_contexts[node_id] = NodeContext(
+            # 保存节点上下文（仅记录偏移量，消息在 get_node_context 时物化）
+            self._context_version += 1
+            self.node_contexts[node_id] = NodeContext.from_log(
+                before_log=log_before,
+                before_end=before_end,
+                after_log=log_after,
+                after_end=len(log_after),
+                before_visible=visible_before,
+                after_visible=visible_after,
                 node_id=node_id,
                 node_name=node.node_name,
                 thread_id=node.thread_id,
-                thread_messages_before=messages_before,
-                thread_messages_after=messages_after,
                 llm_input=llm_input,
                 llm_output=content,
                 tool_calls=[],  # TODO: 收集工具调用记录，父类目前没有方便的接口暴露这个，除非解析 messsages
-                data_out_content=self.context["data_out"].get(node.thread_id, {}).get("content") if node.data_out else None
+                data_out_content=self.context["data_out"].get(node.thread_id, {}).get("content") if node.data_out else None,
+                version=self._context_version
             )
+            self.node_states[node_id].context_version = self._context_version
             
             # 更新状态为 COMPLETED
             self.node_states[node_id].status = NodeStatus.COMPLETED
@@ -231,6 +389,16 @@ class AsyncExecutor(Executor):
             logger.error(f"节点 {node.node_name} 执行失败: {e}")
             raise
 
+    def _record_scope_metrics(self, node_id: int, scope):
+        """把节点执行期间的 LLM 路由和上下文压缩记录写入节点指标"""
+        metrics = self.node_states[node_id].metrics
+        if scope.routes:
+            metrics["llm_routes"] = scope.routes
+        for event in scope.events:
+            metrics.setdefault(event["type"], []).append(
+                {k: v for k, v in event.items() if k != "type"}
+            )
+
     async def execute_step(self) -> Optional[NodeContext]:
         """
         单步执行：执行下一个待执行的节点
@@ -254,11 +422,33 @@ class AsyncExecutor(Executor):
         self.reset_tools_limit(node)
         await self._execute_single_node(node, next_node_id)
         
-        return self.node_contexts.get(next_node_id)
+        return self.get_node_context(next_node_id)
 
-    def get_node_context(self, node_id: int) -> Optional[NodeContext]:
-        """获取指定节点的上下文信息"""
-        return self.node_contexts.get(node_id)
+    def get_node_context(self, node_id: int, include_messages: bool = True) -> Optional[NodeContext]:
+        """获取指定节点的上下文信息（按需物化执行前后的线程消息，include_messages=False 时不包含消息）"""
+        context = self.node_contexts.get(node_id)
+        if context is None:
+            return None
+        if include_messages:
+            return context.materialize()
+        return context.model_copy(update={"thread_messages_before": [], "thread_messages_after": []})
+    
+    def get_node_message_count(self, node_id: int, which: str) -> Optional[int]:
+        """指定节点执行前 (before) / 执行后 (after) 的线程消息数，节点没有上下文时返回 None"""
+        context = self.node_contexts.get(node_id)
+        return context.message_count(which) if context else None
+
+    def get_node_messages(self, node_id: int, which: str, offset: int = 0, limit: int | None = None) -> Optional[list[dict]]:
+        """获取指定节点执行前 (before) / 执行后 (after) 的一页线程消息，用于分页展示"""
+        context = self.node_contexts.get(node_id)
+        return context.message_page(which, offset, limit) if context else None
+
+    def search_node_messages(self, node_id: int, which: str, match: Callable[[dict], bool]) -> Optional[list[int]]:
+        """返回满足 match 的消息下标（与分页下标一致）"""
+        context = self.node_contexts.get(node_id)
+        if context is None:
+            return None
+        return [i for i, message in enumerate(context.iter_messages(which)) if match(message)]
 
     def get_all_node_states(self) -> list[NodeExecutionState]:
         """获取所有节点的执行状态"""
@@ -280,6 +470,84 @@ class AsyncExecutor(Executor):
             "progress_percent": (completed / total * 100) if total > 0 else 0
         }
 
+    # =========================================================================
+    # 参数对比（在独立的执行器副本上重新执行节点）
+    # =========================================================================
+    def fork(self, llm_factory: Callable[..., Any] | None = None) -> 'AsyncExecutor':
+        """使用相同的计划和工具创建一个独立的执行器，可替换 LLM 工厂（不使用语义缓存）"""
+        kwargs = dict(self._init_kwargs)
+        if llm_factory is not None:
+            kwargs["llm_factory"] = llm_factory
+        return type(self)(**kwargs)
+
+    async def sweep_node(
+        self,
+        node_id: int,
+        configs: list[dict[str, Any]],
+        max_concurrency: int = 4
+    ) -> list[dict]:
+        """
+        使用多组 LLM 参数并发重新执行同一个节点
+
+        每组参数在一个 fork 出的执行器上运行，上下文从该节点执行前的快照恢复，
+        不影响当前执行器的上下文和节点状态。
+
+        Args:
+            node_id: 节点 ID（必须已执行过）
+            configs: LLM 工厂参数覆盖列表，如 [{"model": "qwen-plus", "temperature": 0.2}, ...]
+            max_concurrency: 同时运行的数量上限
+
+        Returns:
+            与 configs 一一对应的结果列表，包含 status, output, llm_input, latency, tokens_usage, error
+
+        Raises:
+            ValueError: 节点尚未执行过、未设置 LLM 工厂，或工厂不接受 configs 中的参数
+        """
+        if node_id not in self.context_history:
+            raise ValueError(f"节点 {node_id} 尚未执行过，无法进行参数对比")
+
+        snapshot = self.context_history[node_id]
+        node = self.plan.nodes[node_id - 1]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        # 在并发执行前校验参数覆盖：工厂不接受的参数直接抛出 ValueError，而不是让每组都失败
+        factories = [_override_llm_factory(self._init_kwargs["llm_factory"], config) for config in configs]
+
+        async def run(config: dict[str, Any], llm_factory: Callable[..., Any]) -> dict:
+            async with semaphore:
+                start = time.perf_counter()
+                fork = None
+                try:
+                    fork = self.fork(llm_factory=llm_factory)
+                    fork.context = self.message_store.restore_context(snapshot)
+                    for thread_messages in fork.context["messages"].values():
+                        fork.message_store.intern_list(thread_messages)
+                    fork._current_node_index = node_id - 1
+                    fork.reset_tokens_usage()
+                    fork.reset_tools_limit(node)
+                    output = await fork._execute_single_node(node, node_id)
+                    context = fork.node_contexts.get(node_id)
+                    return {
+                        "config": config,
+                        "status": "completed",
+                        "output": output,
+                        "llm_input": context.llm_input if context else "",
+                        "latency": time.perf_counter() - start,
+                        "tokens_usage": dict(fork.tokens_usage),
+                        "error": None,
+                    }
+                except Exception as e:
+                    return {
+                        "config": config,
+                        "status": "failed",
+                        "output": None,
+                        "llm_input": "",
+                        "latency": time.perf_counter() - start,
+                        "tokens_usage": dict(fork.tokens_usage) if fork else {},
+                        "error": str(e),
+                    }
+
+        return list(await asyncio.gather(*(run(config, factory) for config, factory in zip(configs, factories))))
+
     async def rerun_node(self, node_id: int) -> Optional[NodeContext]:
         """
         重新执行指定节点
@@ -306,7 +574,7 @@ class AsyncExecutor(Executor):
         logger.info(f"🔄 重新执行节点 {node_id}")
         
         # 1. 恢复上下文到该节点执行前的状态
-        self.context = copy.deepcopy(self.context_history[node_id])
+        self.context = self.message_store.restore_context(self.context_history[node_id])
         
         # 2. 删除该节点及之后的历史和上下文
         for nid in list(self.context_history.keys()):
@@ -323,6 +591,8 @@ class AsyncExecutor(Executor):
                 state.start_time = None
                 state.end_time = None
                 state.error = None
+                state.metrics = {}
+                state.context_version = 0
         
         # 4. 更新当前节点索引
         self._current_node_index = node_id - 1
@@ -334,4 +604,31 @@ class AsyncExecutor(Executor):
         
         logger.info(f"✅ 节点 {node_id} 重新执行完成")
         
-        return self.node_contexts.get(node_id)
+        return self.get_node_context(node_id)
+
+
+# =============================================================================
+# 辅助函数
+# =============================================================================
+def _override_llm_factory(factory: Callable[..., Any], overrides: dict[str, Any]) -> Callable[..., Any]:
+    """
+    包装 LLM 工厂，创建实例时用 overrides 覆盖参数
+
+    Raises:
+        ValueError: 工厂为空，或工厂签名不接受 overrides 中的参数
+    """
+    if factory is None:
+        raise ValueError("未设置 LLM 工厂")
+    try:
+        params = inspect.signature(factory).parameters
+    except (TypeError, ValueError):
+        params = None
+    if params is not None and not any(p.kind == p.VAR_KEYWORD for p in params.values()):
+        unsupported = [k for k in overrides if k not in params]
+        if unsupported:
+            raise ValueError(f"LLM 工厂不接受参数: {unsupported}")
+
+    def factory_with_overrides(*args, **kwargs):
+        return factory(*args, **{**kwargs, **overrides})
+
+    return factory_with_overrides
@@ -1,23 +1,48 @@
 # FastAPI 后端服务
 # 提供 RESTful API 用于前端与 AsyncExecutor 交互
+import asyncio
+import itertools
+import json
+import time
+from typing import Literal, Optional
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from simple_llm_workflow.server.executor_manager import executor_manager
+from simple_llm_workflow.server.responses import FastJSONResponse, encoded_response, etag_response
+from simple_llm_workflow.server.tools_watcher import ToolsConfigWatcher
+from simple_llm_workflow.llm_router import LLMRouter
+from simple_llm_workflow.server.token_estimator import estimate_plan
 from simple_llm_workflow.schemas import (
     ExecutionPlan,
     InitExecutorRequest, InitExecutorResponse,
     StepExecutorRequest, StepExecutorResponse,
     ExecutorStatusResponse, ExecutionResultResponse,
-    NodeContextResponse,
+    NodeContextResponse, NodeMessagesPageResponse,
     HealthCheckResponse, ToolInfo, ToolListResponse,
-    TerminateExecutorResponse, ListExecutorsResponse, ExecutorInfo
+    ToolsReloadEvent, ToolsReloadEventsResponse,
+    LLMProviderStats, LLMProvidersResponse,
+    SemanticCacheStats, SemanticCacheStatsResponse,
+    PlanEstimateRequest, PlanEstimateResponse,
+    TerminateExecutorResponse, ListExecutorsResponse, ExecutorInfo,
+    RunAllPatternsRequest, RunAllPatternsResponse, PatternRunResult,
+    SweepNodeRequest, SweepNodeResponse, SweepRunResult
 )
 
 
 
 
+# 参数对比单次请求的最大组合数
+SWEEP_MAX_RUNS = 64
+
+# 上下文消息分页的单页上限
+MESSAGES_PAGE_MAX = 500
+
+# tools_config.py 监听器（由 app.py 启动并设置了配置路径时创建）
+tools_watcher: ToolsConfigWatcher | None = None
+
+
 # =============================================================================
 # FastAPI 应用
 # =============================================================================
@@ -47,12 +72,23 @@ async def lifespan(app: FastAPI):
     #     print(f"⚠️ Warning: Could not load get_daily_stats tool: {e}")
     
     # 设置 LLM 工厂 (使用环境变量或默认值)
-    setup_llm_factory()
+    # 启动前已从 tools_config.py 设置工厂时不覆盖
+    if executor_manager._llm_factory is None:
+        setup_llm_factory()
+    
+    # 监听 tools_config.py，修改后自动热重载
+    global tools_watcher
+    if executor_manager.tools_config_path:
+        tools_watcher = ToolsConfigWatcher(executor_manager, executor_manager.tools_config_path)
+        tools_watcher.start()
     
     yield
     
     # 关闭时的清理
     print("🛑 Backend API shutting down...")
+    if tools_watcher is not None:
+        await tools_watcher.stop()
+        tools_watcher = None
     executor_manager.executors.clear()
 
 
@@ -60,7 +96,8 @@ app = FastAPI(
     title="Simple LLM Playground API",
     description="Backend API for LLM Executor debugging and visualization",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS 配置
@@ -87,53 +124,15 @@ async def root():
 
 
 @app.get("/api/tools", response_model=ToolListResponse)
-async def list_tools():
-    """列出所有已注册的工具"""
-    tools = []
-    for name, tool in executor_manager._tools_registry.items():
-        tool_data = {
-            "name": name,
-            "description": getattr(tool, 'description', 'No description'),
-        }
-        
-        # 尝试从 langchain 工具中提取参数信息
-        try:
-            # 检查是否为具有 args_schema 的 langchain 工具
-            if hasattr(tool, 'args_schema'):
-                schema = tool.args_schema
-                if schema:
-                    # 从 pydantic 模型获取字段信息
-                    tool_data["parameters"] = {}
-                    if hasattr(schema, 'model_fields'):
-                        for field_name, field_info in schema.model_fields.items():
-                            tool_data["parameters"][field_name] = {
-                                "type": str(field_info.annotation),
-                                "required": field_info.is_required(),
-                                "description": field_info.description or ""
-                            }
-            
-            # 同时尝试从函数签名中获取
-            if hasattr(tool, 'func'):
-                import inspect
-                sig = inspect.signature(tool.func)
-                if "parameters" not in tool_data:
-                    tool_data["parameters"] = {}
-                
-                for param_name, param in sig.parameters.items():
-                    if param_name not in tool_data["parameters"]:
-                        tool_data["parameters"][param_name] = {
-                            "type": str(param.annotation) if param.annotation != inspect.Parameter.empty else "Any",
-                            "required": param.default == inspect.Parameter.empty,
-                            "description": ""
-                        }
-        except Exception as e:
-            # 如果提取失败，则跳过参数提取
-            print(f"Warning: Could not extract parameters for tool {name}: {e}")
-        
-        tools.append(ToolInfo(**tool_data))
-    
-    return ToolListResponse(tools=tools)
+async def list_tools(request: Request):
+    """
+    列出所有已注册的工具
 
+    元数据在注册时提取并缓存，这里直接返回预先序列化的列表；
+    支持 ETag / If-None-Match，工具未变化时返回 304
+    """
+    body, etag = executor_manager.tool_metadata.listing()
+    return etag_response(request, body, etag)
 
 
 @app.post("/api/executor/init", response_model=InitExecutorResponse)
@@ -151,7 +150,10 @@ async def init_executor(request: InitExecutorRequest):
         # 创建执行器
         executor_id = executor_manager.create_executor(
             plan=plan,
-            default_tools_limit=request.default_tool_limit # 当这个是None时，导致后面会报错
+            default_tools_limit=request.default_tool_limit, # 当这个是None时，导致后面会报错
+            semantic_cache=request.semantic_cache,
+            context_budget=request.context_budget,
+            placeholders=request.placeholders
         )
         
         return InitExecutorResponse(
@@ -228,8 +230,121 @@ async def run_executor_sync(executor_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/plans/estimate", response_model=PlanEstimateResponse)
+async def estimate_plan_tokens(request: PlanEstimateRequest):
+    """
+    执行前估算计划的 token 使用量和费用
+
+    静态遍历计划，不调用 LLM 和工具；对可能超出上下文窗口的节点给出警告
+    """
+    try:
+        plan = ExecutionPlan(**request.plan)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = estimate_plan(
+        plan,
+        tool_info=executor_manager.tool_metadata.get,
+        default_tools_limit=request.default_tool_limit if request.default_tool_limit is not None else 1,
+        context_window=request.context_window,
+        expected_output_tokens=request.expected_output_tokens,
+        tool_output_tokens=request.tool_output_tokens,
+        input_price_per_1k=request.input_price_per_1k,
+        output_price_per_1k=request.output_price_per_1k
+    )
+    return PlanEstimateResponse(**result)
+
+
+@app.post("/api/plans/run-all", response_model=RunAllPatternsResponse)
+async def run_all_patterns(http_request: Request, request: RunAllPatternsRequest):
+    """
+    并发运行多个 pattern
+
+    每个 pattern 创建一个独立的执行器，最多同时运行 max_concurrency 个，
+    全部结束后返回汇总结果。执行器默认在结果汇总后（或请求取消时）移除，结果中 executor_id 为空；
+    keep_executors 为 True 时执行器保留在管理器中以便继续查询节点上下文，
+    由调用方通过 DELETE /api/executor/{executor_id} 删除。
+    """
+    if not request.plans:
+        raise HTTPException(status_code=400, detail="plans 不能为空")
+    
+    semaphore = asyncio.Semaphore(request.max_concurrency)
+    default_tool_limit = request.default_tool_limit if request.default_tool_limit is not None else 1
+    created: list[str] = []  # 本次请求创建的执行器
+    
+    async def run_pattern(pattern: str, plan_data: dict) -> PatternRunResult:
+        async with semaphore:
+            start = time.perf_counter()
+            executor_id = None
+            try:
+                plan = ExecutionPlan(**plan_data)
+                executor_id = executor_manager.create_executor(
+                    plan=plan,
+                    default_tools_limit=default_tool_limit,
+                    semantic_cache=(
+                        request.semantic_cache.model_copy(update={"pattern": pattern})
+                        if request.semantic_cache is not None else None
+                    ),
+                    context_budget=request.context_budget,
+                    placeholders=request.placeholders
+                )
+                created.append(executor_id)
+                executor_manager.executor_status[executor_id] = "running"
+                result = await executor_manager.get_executor(executor_id).execute()
+                executor_manager.executor_status[executor_id] = "completed"
+                return PatternRunResult(
+                    pattern=pattern,
+                    executor_id=executor_id,
+                    status="completed",
+                    content=result.get("content"),
+                    tokens_usage=dict(result.get("tokens_usage", {})),
+                    elapsed=time.perf_counter() - start
+                )
+            except Exception as e:
+                tokens_usage = {}
+                if executor_id:
+                    executor_manager.executor_status[executor_id] = "failed"
+                    tokens_usage = dict(executor_manager.get_executor(executor_id).tokens_usage)
+                return PatternRunResult(
+                    pattern=pattern,
+                    executor_id=executor_id,
+                    status="failed",
+                    tokens_usage=tokens_usage,
+                    error=str(e),
+                    elapsed=time.perf_counter() - start
+                )
+    
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            *(run_pattern(pattern, plan_data) for pattern, plan_data in request.plans.items())
+        )
+    finally:
+        if not request.keep_executors:
+            for executor_id in created:
+                executor_manager.remove_executor(executor_id)
+    if not request.keep_executors:
+        for result in results:
+            result.executor_id = None
+    
+    total_usage: dict[str, int] = {}
+    for result in results:
+        for key, value in result.tokens_usage.items():
+            if isinstance(value, (int, float)):
+                total_usage[key] = total_usage.get(key, 0) + value
+    
+    completed = sum(1 for r in results if r.status == "completed")
+    return encoded_response(http_request, RunAllPatternsResponse(
+        results=list(results),
+        completed=completed,
+        failed=len(results) - completed,
+        tokens_usage=total_usage,
+        elapsed=time.perf_counter() - start
+    ))
+
+
 @app.post("/api/executor/{executor_id}/step", response_model=StepExecutorResponse)
-async def step_executor(executor_id: str, request: StepExecutorRequest = None):
+async def step_executor(http_request: Request, executor_id: str, request: StepExecutorRequest = None):
     """
     单步执行
     
@@ -251,19 +366,19 @@ async def step_executor(executor_id: str, request: StepExecutorRequest = None):
                 progress=executor.get_execution_progress()
             )
         
-        return StepExecutorResponse(
+        return encoded_response(http_request, StepExecutorResponse(
             status="success",
             message=f"Node {context.node_id} executed",
             node_context=context.model_dump(),
             progress=executor.get_execution_progress()
-        )
+        ))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/executor/{executor_id}/status", response_model=ExecutorStatusResponse)
-async def get_executor_status(executor_id: str):
+async def get_executor_status(request: Request, executor_id: str):
     """
     获取执行器状态
     
@@ -275,34 +390,85 @@ async def get_executor_status(executor_id: str):
     
     overall_status = executor_manager.executor_status.get(executor_id, "unknown")
     
-    return ExecutorStatusResponse(
+    return encoded_response(request, ExecutorStatusResponse(
         executor_id=executor_id,
         overall_status=overall_status,
         progress=executor.get_execution_progress(),
         node_states=[s.model_dump() for s in executor.get_all_node_states()]
-    )
+    ))
 
 
 @app.get("/api/executor/{executor_id}/nodes/{node_id}/context", response_model=NodeContextResponse)
-async def get_node_context(executor_id: str, node_id: int):
+async def get_node_context(request: Request, executor_id: str, node_id: int, include_messages: bool = True):
     """
     获取节点上下文
     
-    返回指定节点的详细执行上下文信息
+    返回指定节点的详细执行上下文信息。
+    include_messages=false 时不返回执行前后的线程消息，只返回数量，消息通过 /context/messages 分页获取。
     """
     executor = executor_manager.get_executor(executor_id)
     if not executor:
         raise HTTPException(status_code=404, detail="Executor not found")
     
-    context = executor.get_node_context(node_id)
+    context = executor.get_node_context(node_id, include_messages=include_messages)
     if not context:
         raise HTTPException(status_code=404, detail=f"Context for node {node_id} not found")
     
-    return NodeContextResponse(**context.model_dump())
+    return encoded_response(request, NodeContextResponse(
+        **context.model_dump(),
+        thread_messages_before_count=executor.get_node_message_count(node_id, "before") or 0,
+        thread_messages_after_count=executor.get_node_message_count(node_id, "after") or 0,
+    ))
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    text = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False, default=str)
+    if message.get("tool_calls"):
+        text += "\n" + json.dumps(message["tool_calls"], ensure_ascii=False, default=str)
+    return text
+
+
+@app.get("/api/executor/{executor_id}/nodes/{node_id}/context/messages", response_model=NodeMessagesPageResponse)
+async def get_node_context_messages(
+    request: Request,
+    executor_id: str,
+    node_id: int,
+    which: Literal["before", "after"] = "before",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=0, le=MESSAGES_PAGE_MAX),
+    search: Optional[str] = None
+):
+    """
+    分页获取节点执行前/后的线程消息
+    
+    指定 search 时额外返回所有包含该文本（不区分大小写）的消息下标，用于上下文内查找。
+    """
+    executor = executor_manager.get_executor(executor_id)
+    if not executor:
+        raise HTTPException(status_code=404, detail="Executor not found")
+    
+    total = executor.get_node_message_count(node_id, which)
+    if total is None:
+        raise HTTPException(status_code=404, detail=f"Context for node {node_id} not found")
+    
+    matches = None
+    if search:
+        needle = search.casefold()
+        matches = executor.search_node_messages(node_id, which, lambda m: needle in _message_text(m).casefold())
+    
+    return encoded_response(request, NodeMessagesPageResponse(
+        node_id=node_id,
+        which=which,
+        total=total,
+        offset=offset,
+        messages=executor.get_node_messages(node_id, which, offset, limit),
+        matches=matches
+    ))
 
 
 @app.post("/api/executor/{executor_id}/nodes/{node_id}/rerun", response_model=StepExecutorResponse)
-async def rerun_node(executor_id: str, node_id: int):
+async def rerun_node(request: Request, executor_id: str, node_id: int):
     """
     重新执行指定节点
     
@@ -316,19 +482,62 @@ async def rerun_node(executor_id: str, node_id: int):
     try:
         context = await executor.rerun_node(node_id)
         
-        return StepExecutorResponse(
+        return encoded_response(request, StepExecutorResponse(
             status="success",
             message=f"节点 {node_id} 重新执行完成",
             node_context=context.model_dump() if context else None,
             progress=executor.get_execution_progress()
-        )
+        ))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/executor/{executor_id}/nodes/{node_id}/sweep", response_model=SweepNodeResponse)
+async def sweep_node(http_request: Request, executor_id: str, node_id: int, request: SweepNodeRequest):
+    """
+    参数对比：使用 model / temperature / top_p 的组合网格并发重新执行指定节点
+
+    每组参数从该节点执行前的上下文快照开始，在独立的执行器副本上运行，
+    不影响当前执行器的状态。
+    """
+    executor = executor_manager.get_executor(executor_id)
+    if not executor:
+        raise HTTPException(status_code=404, detail="Executor not found")
+    
+    # 构建参数网格（未指定的维度不覆盖）
+    axes = [
+        (name, values) for name, values in (
+            ("model", request.models),
+            ("temperature", request.temperatures),
+            ("top_p", request.top_ps),
+        ) if values
+    ]
+    if not axes:
+        raise HTTPException(status_code=400, detail="至少需要指定 models / temperatures / top_ps 中的一项")
+    configs = [
+        {name: value for (name, _), value in zip(axes, combo)}
+        for combo in itertools.product(*(values for _, values in axes))
+    ]
+    if len(configs) > SWEEP_MAX_RUNS:
+        raise HTTPException(status_code=400, detail=f"参数组合数 {len(configs)} 超过上限 {SWEEP_MAX_RUNS}")
+    
+    start = time.perf_counter()
+    try:
+        results = await executor.sweep_node(node_id, configs, request.max_concurrency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return encoded_response(http_request, SweepNodeResponse(
+        node_id=node_id,
+        node_name=executor.plan.nodes[node_id - 1].node_name,
+        results=[SweepRunResult(**r) for r in results],
+        elapsed=time.perf_counter() - start
+    ))
+
+
 @app.get("/api/executor/{executor_id}/messages")
-async def get_executor_messages(executor_id: str, thread_id: str = None):
+async def get_executor_messages(request: Request, executor_id: str, thread_id: str = None):
     """
     获取执行器的消息
     
@@ -340,10 +549,10 @@ async def get_executor_messages(executor_id: str, thread_id: str = None):
     
     if thread_id:
         messages = executor._get_thread_messages(thread_id)
-        return {
+        return encoded_response(request, {
             "thread_id": thread_id,
             "messages": executor._serialize_messages(messages)
-        }
+        })
     else:
         # 返回所有线程的消息
         all_messages = {}
@@ -351,7 +560,7 @@ async def get_executor_messages(executor_id: str, thread_id: str = None):
             all_messages[tid] = executor._serialize_messages(
                 executor.context["messages"][tid]
             )
-        return {"threads": all_messages}
+        return encoded_response(request, {"threads": all_messages})
 
 
 @app.delete("/api/executor/{executor_id}", response_model=TerminateExecutorResponse)
@@ -393,6 +602,54 @@ async def list_executors():
 # 工具注册 API（用于动态注册工具）
 # =============================================================================
 
+@app.post("/api/tools/reload", response_model=ToolsReloadEvent)
+async def reload_tools():
+    """
+    手动重新加载 tools_config.py
+
+    已创建的执行器继续使用原有工具，之后创建的执行器使用新工具
+    """
+    if tools_watcher is None:
+        raise HTTPException(status_code=400, detail="未设置 tools_config.py，无法热重载")
+    return ToolsReloadEvent(**await tools_watcher.reload())
+
+
+@app.get("/api/tools/events", response_model=ToolsReloadEventsResponse)
+async def list_tools_reload_events(after: int = 0):
+    """获取热重载事件（只返回序号大于 after 的事件）"""
+    events = [ToolsReloadEvent(**e) for e in executor_manager.tools_reload_events if e["seq"] > after]
+    return ToolsReloadEventsResponse(events=events)
+
+
+@app.get("/api/llm/providers", response_model=LLMProvidersResponse)
+async def list_llm_providers():
+    """获取多供应商路由中各端点的延迟、错误率和健康状态"""
+    router = executor_manager._llm_factory
+    if not isinstance(router, LLMRouter):
+        return LLMProvidersResponse(routed=False)
+    providers = []
+    for stats in router.stats():
+        pinned = [node for node, name in router.pins.items() if name == stats["name"]]
+        providers.append(LLMProviderStats(**stats, pinned_nodes=pinned))
+    return LLMProvidersResponse(routed=True, providers=providers)
+
+
+@app.get("/api/semantic-cache", response_model=SemanticCacheStatsResponse)
+async def get_semantic_cache_stats():
+    """获取各节点语义缓存的条目数和命中统计"""
+    return SemanticCacheStatsResponse(caches=[
+        SemanticCacheStats(pattern=pattern, node_name=name, **cache.stats())
+        for (pattern, name), cache in executor_manager.semantic_caches.items()
+    ])
+
+
+@app.delete("/api/semantic-cache", response_model=SemanticCacheStatsResponse)
+async def clear_semantic_cache():
+    """清空所有语义缓存"""
+    executor_manager.clear_semantic_caches()
+    return await get_semantic_cache_stats()
+
+
 @app.post("/api/tools/register")
 async def register_tool_endpoint(
     tool_name: str,
@@ -586,12 +843,14 @@ def setup_llm_factory(
         print("⚠️ Warning: No API key found. Please set DASHSCOPE_API_KEY or OPENAI_API_KEY environment variable.")
 
     # 使用 lambda 捕获所有参数，确保闭包正确捕获变量
-    factory = lambda: _create_llm_instance(
-        model=model,
-        api_key=api_key,
-        api_base=api_base,
-        **kwargs
-    )
+    # 调用时传入的参数（如参数对比中的 model/temperature/top_p）覆盖预设值
+    factory = lambda **overrides: _create_llm_instance(**{
+        "model": model,
+        "api_key": api_key,
+        "api_base": api_base,
+        **kwargs,
+        **overrides
+    })
 
     executor_manager.set_llm_factory(factory)
 
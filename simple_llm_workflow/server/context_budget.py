@@ -0,0 +1,335 @@
+# 线程上下文预算
+# 每次调用 LLM 前检查输入消息的 token 数，超出线程预算时按策略压缩（截断、保留首尾或摘要）
+# 只压缩发送给 LLM 的消息列表，线程历史本身不变
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import Runnable
+
+from simple_llm_workflow.llm_router import current_route_scope
+from simple_llm_workflow.server.message_store import MessageStore
+
+
+STRATEGIES = ("truncate", "keep_recent", "summarize")
+
+SUMMARY_PROMPT = (
+    "请将以下对话历史压缩为简洁的摘要，保留关键事实、数据、结论和未完成的事项，"
+    "不要添加原文没有的信息。\n\n{history}"
+)
+SUMMARY_PREFIX = "[早期对话摘要]\n"
+
+
+class ContextBudget:
+    """
+    线程上下文预算策略
+
+    - truncate: 保留开头的 keep_first 条消息（通常是任务）和最近的消息，丢弃中间最旧的消息
+    - keep_recent: 只保留系统消息和最近的消息
+    - summarize: 与 truncate 相同，但被丢弃的消息由 LLM 压缩为一条摘要插入在开头之后
+
+    最后一条消息（当前任务提示）始终保留；工具结果不会与对应的工具调用分离。
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        strategy: str = "truncate",
+        keep_first: int = 1,
+        thread_max_tokens: Optional[dict[str, int]] = None,
+        summary_max_tokens: int = 512
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"未知的上下文压缩策略: {strategy}，可选: {STRATEGIES}")
+        self.max_tokens = max_tokens
+        self.strategy = strategy
+        self.keep_first = keep_first
+        self.thread_max_tokens = dict(thread_max_tokens or {})
+        self.summary_max_tokens = summary_max_tokens
+
+    def limit_for(self, thread_id: Optional[str]) -> Optional[int]:
+        """线程的 token 预算，0 或负数表示不限制"""
+        limit = self.thread_max_tokens.get(thread_id, self.max_tokens) if thread_id else self.max_tokens
+        return limit if limit and limit > 0 else None
+
+    def select(self, messages: list, counts: list[int], limit: int) -> Optional[tuple[list[int], int, int]]:
+        """
+        计算需要保留的消息
+
+        Returns:
+            (开头保留的下标, 丢弃区间起点, 尾部起点)；未超出预算或无法压缩时返回 None
+        """
+        n = len(messages)
+        if n < 2 or sum(counts) <= limit:
+            return None
+
+        # 开头：系统消息（keep_recent 保留所有系统消息）+ keep_first 条其他消息
+        head: list[int] = []
+        i = 0
+        while i < n - 1 and isinstance(messages[i], SystemMessage):
+            head.append(i)
+            i += 1
+        if self.strategy != "keep_recent":
+            kept = 0
+            while i < n - 1 and kept < self.keep_first:
+                head.append(i)
+                i += 1
+                kept += 1
+            # 开头保留了发起工具调用的 AIMessage 时，其工具结果也一并保留
+            if head and getattr(messages[head[-1]], "tool_calls", None):
+                while i < n - 1 and isinstance(messages[i], ToolMessage):
+                    head.append(i)
+                    i += 1
+        drop_start = i
+
+        # keep_recent 保留中间的系统消息，预先从预算中扣除
+        pinned = set()
+        if self.strategy == "keep_recent":
+            pinned = {j for j in range(drop_start, n - 1) if isinstance(messages[j], SystemMessage)}
+
+        # 尾部：从最后一条消息向前累加，直到用完剩余预算
+        budget = limit - sum(counts[j] for j in head) - sum(counts[j] for j in pinned)
+        if self.strategy == "summarize":
+            budget -= self.summary_max_tokens
+        tail_start = n - 1
+        used = counts[n - 1]
+        while tail_start - 1 >= drop_start:
+            cost = 0 if tail_start - 1 in pinned else counts[tail_start - 1]
+            if used + cost > budget:
+                break
+            tail_start -= 1
+            used += cost
+        # 尾部不能以孤立的工具结果开头：向前扩展到发起这些工具调用的 AIMessage
+        # （扩展到丢弃区间起点仍是工具结果时，说明无法在不拆分的情况下压缩）
+        while tail_start > drop_start and isinstance(messages[tail_start], ToolMessage):
+            tail_start -= 1
+
+        # 中间的系统消息同样保留（尾部中的已包含在尾部）
+        head.extend(sorted(j for j in pinned if j < tail_start))
+
+        if tail_start <= drop_start:
+            return None
+        return head, drop_start, tail_start
+
+
+class BudgetedChatModel(Runnable):
+    """
+    带上下文预算的 LLM 代理（LangChain Runnable）
+
+    invoke / ainvoke / stream / astream 时根据当前节点所在线程的预算压缩输入消息，
+    batch 与 | 组合由 Runnable 基于 invoke / ainvoke 实现，同样会压缩。
+    每条消息的 token 数来自消息存储的记录缓存，不会重复计算。
+    """
+
+    def __init__(self, model: Any, compactor: 'ContextCompactor'):
+        self._model = model
+        self._compactor = compactor
+
+    def bind_tools(self, *args, **kwargs) -> 'BudgetedChatModel':
+        return BudgetedChatModel(self._model.bind_tools(*args, **kwargs), self._compactor)
+
+    def bind(self, **kwargs) -> 'BudgetedChatModel':
+        return BudgetedChatModel(self._model.bind(**kwargs), self._compactor)
+
+    def with_structured_output(self, *args, **kwargs) -> 'BudgetedChatModel':
+        return BudgetedChatModel(self._model.with_structured_output(*args, **kwargs), self._compactor)
+
+    def with_config(self, config=None, **kwargs) -> 'BudgetedChatModel':
+        return BudgetedChatModel(self._model.with_config(config, **kwargs), self._compactor)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+    def _compact_sync(self, input: Any) -> Any:
+        plan = self._compactor.plan(input)
+        if plan is None:
+            return input
+        return self._compactor.apply(plan, self._compactor.summarize_sync(plan))
+
+    async def _compact_async(self, input: Any) -> Any:
+        plan = self._compactor.plan(input)
+        if plan is None:
+            return input
+        return self._compactor.apply(plan, await self._compactor.summarize_async(plan))
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._model.invoke(self._compact_sync(input), config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self._model.ainvoke(await self._compact_async(input), config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        yield from self._model.stream(self._compact_sync(input), config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        async for chunk in self._model.astream(await self._compact_async(input), config, **kwargs):
+            yield chunk
+
+    def __repr__(self) -> str:
+        return f"BudgetedChatModel({self._model!r})"
+
+
+class ContextCompactor:
+    """
+    执行器级别的压缩器：持有预算策略、消息存储和摘要缓存
+
+    摘要按线程缓存；新的丢弃区间以上次的区间为前缀时，只对新增部分做增量摘要。
+    """
+
+    def __init__(
+        self,
+        budget: ContextBudget,
+        message_store: MessageStore,
+        summary_factory: Optional[Callable[..., Any]] = None
+    ):
+        self.budget = budget
+        self.message_store = message_store
+        self.summary_factory = summary_factory
+        self._summaries: dict[str, tuple[tuple, str]] = {}  # 线程 -> (已摘要消息的记录键, 摘要)
+
+    def plan(self, input: Any) -> Optional[dict]:
+        """计算当前调用的压缩方案，不需要压缩时返回 None"""
+        scope = current_route_scope()
+        if scope is None or not isinstance(input, list) or not input:
+            return None
+        if not all(isinstance(m, BaseMessage) for m in input):
+            return None
+        limit = self.budget.limit_for(scope.thread_id)
+        if limit is None:
+            return None
+
+        counts = [self.message_store.token_count(m) for m in input]
+        selection = self.budget.select(input, counts, limit)
+        if selection is None:
+            return None
+        head, drop_start, tail_start = selection
+        head_set = set(head)
+        dropped = [i for i in range(drop_start, tail_start) if i not in head_set]
+        return {
+            "scope": scope,
+            "messages": input,
+            "counts": counts,
+            "head": [i for i in head if i < drop_start],
+            "kept_middle": [i for i in head if i >= drop_start],
+            "dropped": dropped,
+            "tail_start": tail_start,
+        }
+
+    def apply(self, plan: dict, summary: Optional[str]) -> list:
+        """按方案构建压缩后的消息列表，并记录压缩事件"""
+        messages, counts = plan["messages"], plan["counts"]
+        result = [messages[i] for i in plan["head"]]
+        if summary:
+            result.append(HumanMessage(content=SUMMARY_PREFIX + summary))
+        result.extend(messages[i] for i in plan["kept_middle"])
+        result.extend(messages[plan["tail_start"]:])
+
+        scope = plan["scope"]
+        scope.events.append({
+            "type": "context_budget",
+            "thread_id": scope.thread_id,
+            "strategy": self.budget.strategy,
+            "tokens_before": sum(counts),
+            "tokens_after": sum(self.message_store.token_count(m) for m in result),
+            "dropped_messages": len(plan["dropped"]),
+            "summarized": bool(summary),
+        })
+        return result
+
+    # =========================================================================
+    # 摘要
+    # =========================================================================
+    def _message_key(self, msg: BaseMessage) -> tuple:
+        """消息的内容键（与消息存储的驻留键一致），不依赖对象地址，重新构建的消息也能匹配"""
+        record = self.message_store.record_of(msg)
+        key = record.key() if record is not None else None
+        if key is None:
+            key = (msg.type, msg.id, str(msg.content), getattr(msg, "tool_call_id", None))
+        return key
+
+    def _summary_request(self, plan: dict) -> Optional[tuple[str, tuple, list[BaseMessage]]]:
+        """
+        返回 (线程, 丢弃消息的记录键, 摘要输入)；缓存命中或不需要摘要时摘要输入为空列表，
+        非 summarize 策略返回 None
+        """
+        if self.budget.strategy != "summarize" or self.summary_factory is None:
+            return None
+        thread_id = plan["scope"].thread_id or ""
+        messages = plan["messages"]
+        dropped = [messages[i] for i in plan["dropped"]]
+        ids = tuple(self._message_key(m) for m in dropped)
+
+        cached = self._summaries.get(thread_id)
+        if cached is not None and cached[0] == ids:
+            return thread_id, ids, []
+        lines = []
+        new_messages = dropped
+        if cached is not None and ids[:len(cached[0])] == cached[0]:
+            # 增量摘要：上次的摘要 + 新丢弃的消息
+            lines.append(f"已有摘要: {cached[1]}")
+            new_messages = dropped[len(cached[0]):]
+        for m in new_messages:
+            content = m.content if isinstance(m.content, str) else str(m.content)
+            lines.append(f"{m.type}: {content}")
+        history = "\n".join(lines)
+        # 摘要输入本身也限制在预算以内（按约 2 字符/token 粗略截取最近部分）
+        max_chars = self.budget.limit_for(thread_id) * 2 if self.budget.limit_for(thread_id) else len(history)
+        prompt = SUMMARY_PROMPT.format(history=history[-max_chars:])
+        return thread_id, ids, [HumanMessage(content=prompt)]
+
+    def _store_summary(self, thread_id: str, ids: tuple, response: Any) -> str:
+        summary = response.content if isinstance(getattr(response, "content", None), str) else str(response)
+        self._summaries[thread_id] = (ids, summary)
+        return summary
+
+    def summarize_sync(self, plan: dict) -> Optional[str]:
+        request = self._summary_request(plan)
+        if request is None:
+            return None
+        thread_id, ids, summary_input = request
+        if not summary_input:
+            return self._summaries[thread_id][1]
+        try:
+            response = self.summary_factory(temperature=0).invoke(summary_input)
+        except Exception as e:
+            print(f"⚠️ 上下文摘要失败，改为直接截断: {e}")
+            return None
+        return self._store_summary(thread_id, ids, response)
+
+    async def summarize_async(self, plan: dict) -> Optional[str]:
+        request = self._summary_request(plan)
+        if request is None:
+            return None
+        thread_id, ids, summary_input = request
+        if not summary_input:
+            return self._summaries[thread_id][1]
+        try:
+            response = await self.summary_factory(temperature=0).ainvoke(summary_input)
+        except Exception as e:
+            print(f"⚠️ 上下文摘要失败，改为直接截断: {e}")
+            return None
+        return self._store_summary(thread_id, ids, response)
+
+
+def wrap_llm_factory(
+    factory: Callable[..., Any],
+    budget: ContextBudget,
+    message_store: MessageStore,
+    summary_factory: Optional[Callable[..., Any]] = None
+) -> Callable[..., Any]:
+    """
+    包装 LLM 工厂，创建的 LLM 在调用前按线程预算压缩输入消息
+
+    Args:
+        factory: LLM 工厂
+        budget: 预算策略
+        message_store: 执行器的消息存储（提供缓存的 token 数）
+        summary_factory: summarize 策略用于生成摘要的 LLM 工厂
+    """
+    compactor = ContextCompactor(budget, message_store, summary_factory)
+
+    def budgeted_factory(*args, **kwargs):
+        return BudgetedChatModel(factory(*args, **kwargs), compactor)
+
+    return budgeted_factory
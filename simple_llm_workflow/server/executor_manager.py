@@ -1,8 +1,14 @@
+import hashlib
 import uuid
+from collections import deque
 from datetime import datetime
 from typing import Any
 from simple_llm_workflow.server.async_executor import AsyncExecutor
-from simple_llm_workflow.schemas import ExecutionPlan
+from simple_llm_workflow.schemas import ExecutionPlan, SemanticCacheConfig, ContextBudgetConfig
+from simple_llm_workflow.server.context_budget import ContextBudget
+from simple_llm_workflow.server.semantic_cache import SemanticCache
+from simple_llm_workflow.server.tool_metadata import ToolMetadata, ToolMetadataCache
+from simple_llm_workflow.tool_loader import LazyTool
 
 # =============================================================================
 # 执行器管理
@@ -15,35 +21,129 @@ class ExecutorManager:
         self.executor_status: dict[str, str] = {}  # executor_id -> overall status
         self.executor_start_times: dict[str, str] = {}  # executor_id -> start_time (ISO format)
         self._tools_registry: dict[str, Any] = {}  # 全局工具注册表
+        self.tool_metadata = ToolMetadataCache()  # 工具元数据（注册时提取）
         self._llm_factory = None  # LLM 工厂函数
+        self.tools_config_path: str | None = None  # tools_config.py 路径（用于热重载）
+        self.tools_reload_events: deque[dict] = deque(maxlen=50)  # 最近的热重载结果
+        self._tools_reload_seq = 0
+        self.semantic_caches: dict[tuple[str, str], SemanticCache] = {}  # (pattern, 节点名称) -> 语义缓存（跨执行器共享）
         
     def register_tool(self, name: str, tool: Any):
         """注册工具到全局注册表"""
         self._tools_registry[name] = tool
+        self.tool_metadata.set(name, tool)
         
     def set_llm_factory(self, factory):
         """设置 LLM 工厂函数"""
         self._llm_factory = factory
         
+    def replace_tools(self, tools: dict[str, Any], llm_factory=None, tool_metadata: ToolMetadata | None = None):
+        """
+        整体替换工具注册表和 LLM 工厂（热重载）
+
+        以新字典整体替换而非原地修改，已创建的执行器持有各自的工具映射和工厂，不受影响；
+        只有之后创建的执行器使用新配置。tool_metadata 为在加载线程中预先提取的元数据。
+        """
+        self._tools_registry = dict(tools)
+        self.tool_metadata.replace_all(tool_metadata if tool_metadata is not None else self._tools_registry)
+        if llm_factory is not None:
+            self._llm_factory = llm_factory
+            # 模型配置可能已变化，旧的缓存回复不再可用
+            self.clear_semantic_caches()
+
+    def add_tools_reload_event(self, status: str, message: str, tools: list[str] | None = None) -> dict:
+        """记录一次热重载结果"""
+        self._tools_reload_seq += 1
+        event = {
+            "seq": self._tools_reload_seq,
+            "timestamp": datetime.now().isoformat(),
+            "status": status,
+            "path": self.tools_config_path,
+            "tools": tools or [],
+            "message": message,
+        }
+        self.tools_reload_events.append(event)
+        return event
+
     def get_tools_map(self, tool_names: list[str] | None) -> dict:
         """根据工具名称列表获取工具映射"""
         if not tool_names:
             return self._tools_registry.copy()
         return {name: self._tools_registry[name] for name in tool_names if name in self._tools_registry}
     
+    def _plan_tools_map(self, plan: ExecutionPlan) -> dict:
+        """
+        构建执行器使用的工具映射
+
+        只导入计划中实际用到的延迟工具，未用到的工具保持延迟状态（访问时才导入）。
+        """
+        used = set()
+        for node in plan.nodes:
+            used.update(node.tools or [])
+            if node.initial_tool_name:
+                used.add(node.initial_tool_name)
+
+        tools_map = {}
+        for name, tool in self._tools_registry.items():
+            if name in used and isinstance(tool, LazyTool):
+                tool = tool.resolve()
+            tools_map[name] = tool
+        return tools_map
+
+    def get_semantic_caches(
+        self, config: SemanticCacheConfig | None, plan: ExecutionPlan
+    ) -> dict[str, SemanticCache]:
+        """
+        获取配置中各节点的语义缓存（不存在时创建）
+
+        缓存按 (pattern, 节点名称) 共享，不同 pattern 中的同名节点互不命中；
+        未指定 pattern 时以计划内容的摘要区分。
+
+        Returns:
+            节点名称 -> 语义缓存
+
+        Raises:
+            ValueError: 未安装 numpy
+        """
+        if config is None or not config.nodes:
+            return {}
+        pattern = config.pattern or "plan-" + hashlib.sha1(plan.model_dump_json().encode("utf-8")).hexdigest()[:12]
+        caches = {}
+        for node_name in config.nodes:
+            key = (pattern, node_name)
+            cache = self.semantic_caches.get(key)
+            if cache is None or cache.max_entries != config.max_entries:
+                cache = SemanticCache(threshold=config.threshold, max_entries=config.max_entries)
+                self.semantic_caches[key] = cache
+            cache.threshold = config.threshold
+            caches[node_name] = cache
+        return caches
+
+    def clear_semantic_caches(self):
+        """清空所有语义缓存"""
+        for cache in self.semantic_caches.values():
+            cache.clear()
+
     def create_executor(
         self,
         plan: ExecutionPlan,
-        default_tools_limit: int | None = None
+        default_tools_limit: int | None = None,
+        semantic_cache: SemanticCacheConfig | None = None,
+        context_budget: ContextBudgetConfig | None = None,
+        placeholders: dict[str, str] | None = None
     ) -> str:
         """创建新的执行器实例"""
         executor_id = str(uuid.uuid4())
+        budget = ContextBudget(**context_budget.model_dump()) if context_budget is not None else None
 
         executor = AsyncExecutor(
             plan=plan,
-            tools_map=self._tools_registry.copy(),
+            tools_map=self._plan_tools_map(plan),
             default_tools_limit=default_tools_limit,
-            llm_factory=self._llm_factory
+            llm_factory=self._llm_factory,
+            semantic_caches=self.get_semantic_caches(semantic_cache, plan),
+            context_budget=budget,
+            placeholders=placeholders
         )
         
         self.executors[executor_id] = executor
@@ -0,0 +1,278 @@
+# 消息驻留存储
+# 线程消息列表仍为 LangChain 消息（由父类执行器直接读写），内容相同的消息驻留为同一对象；
+# MessageRecord 是每条消息的旁路索引（缓存序列化结果和 token 数），上下文快照只保存记录
+import copy
+import json
+import weakref
+from typing import Any, Optional
+
+from langchain_core.messages import (
+    BaseMessage, HumanMessage, AIMessage, ToolMessage, SystemMessage
+)
+
+from simple_llm_workflow.server.token_estimator import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+
+
+# LangChain 消息类型 -> 角色
+_ROLE_BY_TYPE = {
+    "human": "user",
+    "HumanMessageChunk": "user",
+    "ai": "assistant",
+    "AIMessageChunk": "assistant",
+    "tool": "tool",
+    "ToolMessageChunk": "tool",
+    "system": "system",
+    "SystemMessageChunk": "system",
+}
+
+# 前端展示的角色（其余角色序列化为 None）
+_DISPLAY_ROLES = frozenset({"user", "assistant", "tool"})
+
+_UNSET = object()
+
+
+class MessageRecord:
+    """
+    消息记录
+
+    - 保存角色、内容、工具调用和元数据，可无损重建 LangChain 消息
+    - 序列化结果和 token 数按记录缓存，重复计算为 O(1)
+    - 上下文快照保存记录；恢复时通过弱引用复用仍存活的 LangChain 对象，否则重新构建
+    """
+    __slots__ = (
+        "role", "content", "tool_calls", "tool_call_id", "msg_id", "name", "extra",
+        "response_metadata", "usage_metadata",
+        "_serialized", "_message_ref", "_tokens"
+    )
+
+    def __init__(
+        self,
+        role: str,
+        content: Any,
+        tool_calls: Optional[list] = None,
+        tool_call_id: Optional[str] = None,
+        msg_id: Optional[str] = None,
+        name: Optional[str] = None,
+        extra: Optional[dict] = None,
+        response_metadata: Optional[dict] = None,
+        usage_metadata: Optional[dict] = None
+    ):
+        self.role = role
+        self.content = content
+        self.tool_calls = tool_calls
+        self.tool_call_id = tool_call_id
+        self.msg_id = msg_id
+        self.name = name
+        self.extra = extra  # additional_kwargs，为空时不保存
+        self.response_metadata = response_metadata
+        self.usage_metadata = usage_metadata  # 仅 AI 消息
+        self._serialized = _UNSET
+        self._message_ref: Optional[weakref.ref] = None
+        self._tokens: Optional[int] = None
+
+    @classmethod
+    def from_message(cls, msg: BaseMessage) -> 'MessageRecord':
+        """从 LangChain 消息创建记录"""
+        return cls(
+            role=_ROLE_BY_TYPE.get(msg.type, msg.type),
+            content=msg.content,
+            tool_calls=list(getattr(msg, "tool_calls", None) or []) or None,
+            tool_call_id=getattr(msg, "tool_call_id", None),
+            msg_id=msg.id,
+            name=msg.name,
+            extra=dict(msg.additional_kwargs) if msg.additional_kwargs else None,
+            response_metadata=dict(msg.response_metadata) if msg.response_metadata else None,
+            usage_metadata=getattr(msg, "usage_metadata", None) or None,
+        )
+
+    def key(self) -> Optional[tuple]:
+        """
+        驻留键，无法计算时返回 None（不驻留）
+
+        包含消息的全部字段（含 additional_kwargs 和元数据），键相同的消息才会被替换为同一对象，
+        例如内容相同但 token 用量不同的两条 AI 回复不会合并。
+        """
+        def dump(value: Any) -> Optional[str]:
+            return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str) if value else None
+
+        try:
+            return (
+                self.role,
+                self.msg_id,
+                self.name,
+                self.content if isinstance(self.content, str) else json.dumps(
+                    self.content, sort_keys=True, ensure_ascii=False, default=str
+                ),
+                self.tool_call_id,
+                dump(self.tool_calls),
+                dump(self.extra),
+                dump(self.response_metadata),
+                dump(self.usage_metadata),
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def to_dict(self) -> Optional[dict]:
+        """序列化为前端展示用的字典（结果缓存），不展示的角色返回 None"""
+        if self._serialized is _UNSET:
+            if self.role not in _DISPLAY_ROLES:
+                self._serialized = None
+            else:
+                item = {"role": self.role, "content": self.content}
+                if self.role == "assistant" and self.tool_calls:
+                    item["tool_calls"] = self.tool_calls
+                elif self.role == "tool":
+                    item["tool_call_id"] = self.tool_call_id
+                self._serialized = item
+        return self._serialized
+
+    def token_count(self) -> int:
+        """估算的 token 数（首次计算后缓存，记录不可变，之后不再重新计算）"""
+        if self._tokens is None:
+            content = self.content if isinstance(self.content, str) else json.dumps(
+                self.content, ensure_ascii=False, default=str
+            )
+            tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+            if self.tool_calls:
+                tokens += estimate_tokens(json.dumps(self.tool_calls, ensure_ascii=False, default=str))
+            self._tokens = tokens
+        return self._tokens
+
+    def live_message(self) -> Optional[BaseMessage]:
+        """返回仍存活的 LangChain 消息对象"""
+        return self._message_ref() if self._message_ref is not None else None
+
+    def build_message(self) -> BaseMessage:
+        """构建新的 LangChain 消息对象"""
+        kwargs = {"content": self.content, "id": self.msg_id, "name": self.name}
+        if self.extra:
+            kwargs["additional_kwargs"] = dict(self.extra)
+        if self.response_metadata:
+            kwargs["response_metadata"] = dict(self.response_metadata)
+        if self.role == "user":
+            return HumanMessage(**kwargs)
+        if self.role == "assistant":
+            if self.usage_metadata:
+                kwargs["usage_metadata"] = self.usage_metadata
+            return AIMessage(tool_calls=list(self.tool_calls or []), **kwargs)
+        if self.role == "tool":
+            return ToolMessage(tool_call_id=self.tool_call_id or "", **kwargs)
+        return SystemMessage(**kwargs)
+
+
+class MessageStore:
+    """
+    驻留 (intern) 的不可变消息存储
+
+    - 内容相同的消息只保存一条 MessageRecord，线程列表、data_out 合并和上下文快照都引用它
+    - 约定：消息一旦进入存储即视为不可变，任何修改都应创建新消息
+    - 存储随执行器创建和销毁，不跨执行器共享
+    """
+
+    def __init__(self):
+        self._records: dict[tuple, MessageRecord] = {}
+        self._by_object: dict[int, MessageRecord] = {}  # id(LangChain 消息) -> 记录
+        self._object_refs: dict[int, weakref.ref] = {}  # id(LangChain 消息) -> 弱引用（对象销毁时解除登记）
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _track(self, msg: BaseMessage, record: MessageRecord):
+        """登记 LangChain 对象与记录的对应关系，对象销毁时自动解除"""
+        oid = id(msg)
+        by_object = self._by_object
+        object_refs = self._object_refs
+
+        def _release(ref, oid=oid):
+            if object_refs.get(oid) is ref:
+                del object_refs[oid]
+                by_object.pop(oid, None)
+
+        ref = weakref.ref(msg, _release)
+        object_refs[oid] = ref
+        by_object[oid] = record
+        if record.live_message() is None:
+            record._message_ref = ref
+
+    def record_of(self, msg: Any) -> Optional[MessageRecord]:
+        """返回消息对应的驻留记录，非 LangChain 消息返回 None"""
+        record = self._by_object.get(id(msg))
+        if record is not None:
+            return record
+        if not isinstance(msg, BaseMessage):
+            return None
+
+        # 每个对象只转换一次：无论是否与已有记录重复，都登记该对象，之后的查找为 O(1)
+        record = MessageRecord.from_message(msg)
+        key = record.key()
+        if key is not None:
+            existing = self._records.get(key)
+            if existing is not None:
+                record = existing
+            else:
+                self._records[key] = record
+        self._track(msg, record)
+        return record
+
+    def to_message(self, record: MessageRecord) -> BaseMessage:
+        """LLM 边界：返回记录对应的 LangChain 消息（优先复用存活对象）"""
+        msg = record.live_message()
+        if msg is None:
+            msg = record.build_message()
+            self._track(msg, record)
+        return msg
+
+    def intern(self, msg: Any) -> Any:
+        """返回与 msg 等价的驻留消息对象"""
+        record = self.record_of(msg)
+        return self.to_message(record) if record is not None else msg
+
+    def intern_list(self, messages: list, start: int = 0) -> None:
+        """原地将 messages[start:] 替换为驻留消息"""
+        for i in range(start, len(messages)):
+            messages[i] = self.intern(messages[i])
+
+    def token_count(self, msg: Any) -> int:
+        """单条消息的 token 数（使用记录缓存），非 LangChain 消息按文本估算"""
+        record = self.record_of(msg)
+        if record is not None:
+            return record.token_count()
+        return estimate_tokens(msg if isinstance(msg, str) else str(msg)) + MESSAGE_OVERHEAD_TOKENS
+
+    def serialize(self, msg: Any) -> Optional[dict]:
+        """序列化单条消息（使用记录缓存）"""
+        record = self.record_of(msg)
+        return record.to_dict() if record is not None else None
+
+    # =========================================================================
+    # 上下文快照
+    # =========================================================================
+    def snapshot_context(self, context: dict) -> dict:
+        """
+        创建上下文快照
+
+        messages 中的消息以 MessageRecord 元组保存，其余字段深拷贝。
+        相比 deepcopy 整个 context，快照成本与消息内容大小无关。
+        """
+        snapshot = {}
+        for key, value in context.items():
+            if key == "messages":
+                snapshot[key] = {
+                    tid: tuple(self.record_of(m) or m for m in msgs) for tid, msgs in value.items()
+                }
+            else:
+                snapshot[key] = copy.deepcopy(value)
+        return snapshot
+
+    def restore_context(self, snapshot: dict) -> dict:
+        """从快照恢复出可修改的上下文（在此处把记录转换回 LangChain 消息）"""
+        context = {}
+        for key, value in snapshot.items():
+            if key == "messages":
+                context[key] = {
+                    tid: [self.to_message(r) if isinstance(r, MessageRecord) else r for r in msgs]
+                    for tid, msgs in value.items()
+                }
+            else:
+                context[key] = copy.deepcopy(value)
+        return context
@@ -0,0 +1,78 @@
+# 高性能 JSON 响应
+# 节点上下文等大体积响应使用 orjson 序列化，并按 Accept-Encoding 协商 gzip/zstd 压缩
+from typing import Any
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from simple_llm_workflow import codec
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 codec.dumps (orjson 优先) 序列化的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return codec.dumps(content)
+
+
+def encoded_response(
+    request: Request,
+    content: Any,
+    status_code: int = 200,
+    min_size: int = codec.COMPRESS_MIN_SIZE
+) -> Response:
+    """
+    构建 JSON 响应，超过阈值时按客户端声明的编码压缩
+
+    Args:
+        request: 当前请求（读取 Accept-Encoding）
+        content: Pydantic 模型或可序列化对象
+        status_code: HTTP 状态码
+        min_size: 触发压缩的最小字节数
+
+    Returns:
+        Response: 已序列化（可能已压缩）的响应
+    """
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    body = codec.dumps(content)
+    headers = {"Vary": "Accept-Encoding"}
+
+    if len(body) >= min_size:
+        encoding = codec.negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            body = codec.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers
+    )
+
+
+def etag_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    min_size: int = codec.COMPRESS_MIN_SIZE
+) -> Response:
+    """
+    返回预先序列化的 JSON 响应体，支持 ETag 条件请求
+
+    If-None-Match 与 etag 匹配时返回 304（无响应体），否则按需压缩后返回。
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    if len(body) >= min_size:
+        encoding = codec.negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            body = codec.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,354 @@
+# LLM 调用的近似语义缓存
+# 使用本地哈希 n-gram 向量化（仅依赖 NumPy，完全离线），相似度超过阈值时直接返回缓存的回复
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖：pip install simple-llm-workflow[semantic-cache]
+    np = None
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessageChunk, message_chunk_to_message
+from langchain_core.runnables import Runnable
+
+from simple_llm_workflow.llm_router import current_route_scope
+from simple_llm_workflow.prompt_template import render_messages
+
+
+def _require_numpy():
+    if np is None:
+        raise ValueError("语义缓存需要 numpy，请先安装: pip install numpy")
+
+
+class HashingVectorizer:
+    """
+    字符 n-gram 哈希向量化
+
+    - 文本按字符切分 n-gram（默认 3~5），哈希到固定维度，带符号以抵消碰撞
+    - 结果做 L2 归一化，点积即余弦相似度
+    - 无需训练和词表，中英文通用
+    """
+
+    def __init__(self, dim: int = 2048, ngram_range: tuple[int, int] = (3, 5)):
+        _require_numpy()
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    # 多项式滚动哈希的基数与最终混合常数（splitmix64）
+    _BASE = 1_000_003
+    _MIX = 0xBF58476D1CE4E5B9
+
+    def transform(self, text: str) -> 'np.ndarray':
+        text = " ".join(text.lower().split())
+        # 按码点整体向量化：每个 n 只需 n 次整列运算，不再逐个 n-gram 调用哈希函数
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        lo, hi = self.ngram_range
+        hashes = []
+        for n in range(lo, hi + 1):
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            h = np.full(count, n, dtype=np.uint64)
+            for k in range(n):
+                h = h * np.uint64(self._BASE) + codes[k:k + count]
+            h ^= h >> np.uint64(31)
+            h *= np.uint64(self._MIX)
+            h ^= h >> np.uint64(29)
+            hashes.append(h)
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if hashes:
+            h = np.concatenate(hashes)
+            signs = np.where(h >> np.uint64(63), 1.0, -1.0)
+            vector += np.bincount((h % np.uint64(self.dim)).astype(np.intp), weights=signs,
+                                  minlength=self.dim).astype(np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector /= norm
+        return vector
+
+
+class SemanticCache:
+    """
+    单个节点的语义缓存
+
+    - 向量保存在预分配的连续矩阵中，查找为一次矩阵-向量乘法
+    - 只在 LLM 参数（模型、温度、绑定的工具等）相同的条目之间匹配
+    - 达到 max_entries 后淘汰最久未命中的条目；超过 max_prompt_chars 的 prompt 不缓存
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+        max_prompt_chars: int = 200_000,
+        vectorizer: Optional[HashingVectorizer] = None
+    ):
+        _require_numpy()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_prompt_chars = max_prompt_chars
+        self.vectorizer = vectorizer or HashingVectorizer()
+
+        self._vectors = np.zeros((max_entries, self.vectorizer.dim), dtype=np.float32)
+        self._param_ids = np.full(max_entries, -1, dtype=np.int64)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._responses: list[Any] = [None] * max_entries
+        self._size = 0
+        self._clock = 0
+        self._param_keys: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _param_id(self, params_key: str) -> int:
+        return self._param_keys.setdefault(params_key, len(self._param_keys))
+
+    def lookup(self, prompt: str, params_key: str = "") -> Optional[tuple[Any, float]]:
+        """
+        查找相似的缓存条目
+
+        Returns:
+            (缓存的回复, 相似度)，未命中返回 None
+        """
+        if len(prompt) > self.max_prompt_chars:
+            return None
+        vector = self.vectorizer.transform(prompt)
+        with self._lock:
+            param_id = self._param_keys.get(params_key)
+            if self._size == 0 or param_id is None:
+                self.misses += 1
+                return None
+            sims = self._vectors[:self._size] @ vector
+            sims[self._param_ids[:self._size] != param_id] = -1.0
+            best = int(np.argmax(sims))
+            similarity = float(sims[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            return self._responses[best], similarity
+
+    def store(self, prompt: str, response: Any, params_key: str = ""):
+        """写入缓存，已满时淘汰最久未使用的条目"""
+        if len(prompt) > self.max_prompt_chars:
+            return
+        vector = self.vectorizer.transform(prompt)
+        with self._lock:
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._param_ids[slot] = self._param_id(params_key)
+            self._last_used[slot] = self._clock
+            self._responses[slot] = response
+
+    def clear(self):
+        with self._lock:
+            self._size = 0
+            self._param_keys.clear()
+            self._responses = [None] * self.max_entries
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# =============================================================================
+# LLM 工厂包装
+# =============================================================================
+def _binding_key(name: str, args: tuple, kwargs: dict) -> str:
+    """绑定操作的参数键，工具只取名称"""
+    parts = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            parts.append(",".join(getattr(t, "name", None) or getattr(t, "__name__", repr(t)) for t in arg))
+        else:
+            parts.append(repr(arg))
+    parts.extend(f"{k}={v!r}" for k, v in sorted(kwargs.items()))
+    return f"{name}({';'.join(parts)})"
+
+
+class CachedChatModel(Runnable):
+    """
+    带语义缓存的 LLM 代理（LangChain Runnable）
+
+    当前节点启用了语义缓存时，先查缓存，命中则直接返回缓存回复的副本（不计 token）；
+    未命中时调用实际 LLM，不含工具调用的回复写入缓存。
+    stream / astream 命中时以单个分块返回缓存回复，未命中时边转发边拼接，完整结束后写入缓存；
+    batch 与 | 组合由 Runnable 基于 invoke / ainvoke 实现，同样经过缓存。
+    """
+
+    def __init__(self, model: Any, caches: dict[str, SemanticCache], params_key: str):
+        self._model = model
+        self._caches = caches
+        self._params_key = params_key
+
+    def _rebind(self, name: str, model: Any, args: tuple, kwargs: dict) -> 'CachedChatModel':
+        return CachedChatModel(model, self._caches, self._params_key + _binding_key(name, args, kwargs))
+
+    def bind_tools(self, *args, **kwargs) -> 'CachedChatModel':
+        return self._rebind("bind_tools", self._model.bind_tools(*args, **kwargs), args, kwargs)
+
+    def bind(self, **kwargs) -> 'CachedChatModel':
+        return self._rebind("bind", self._model.bind(**kwargs), (), kwargs)
+
+    def with_structured_output(self, *args, **kwargs) -> 'CachedChatModel':
+        return self._rebind("with_structured_output", self._model.with_structured_output(*args, **kwargs), args, kwargs)
+
+    def with_config(self, config=None, **kwargs) -> 'CachedChatModel':
+        return self._rebind("with_config", self._model.with_config(config, **kwargs), (config,), kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._model, name)
+
+    def _cache_for_current_node(self) -> tuple[Optional[SemanticCache], Optional[list]]:
+        scope = current_route_scope()
+        if scope is None:
+            return None, None
+        return self._caches.get(scope.node_name), scope.routes
+
+    def _hit(self, cache: SemanticCache, routes: Optional[list], prompt: str, start: float):
+        found = cache.lookup(prompt, self._params_key)
+        if found is None:
+            return None
+        response, similarity = found
+        if routes is not None:
+            routes.append({
+                "provider": "semantic_cache",
+                "similarity": round(similarity, 4),
+                "latency": round(time.perf_counter() - start, 3),
+                "failovers": [],
+            })
+        if hasattr(response, "model_copy"):
+            update = {"usage_metadata": None} if hasattr(response, "usage_metadata") else {}
+            return response.model_copy(update=update)
+        return response
+
+    def _store(self, cache: SemanticCache, prompt: str, response: Any):
+        if not getattr(response, "tool_calls", None):
+            cache.store(prompt, response, self._params_key)
+
+    @staticmethod
+    def _as_chunk(response: Any) -> Any:
+        """缓存的完整回复转为单个流式分块"""
+        if isinstance(response, AIMessage) and not isinstance(response, AIMessageChunk):
+            return AIMessageChunk(
+                content=response.content,
+                additional_kwargs=response.additional_kwargs,
+                response_metadata=response.response_metadata,
+                id=response.id
+            )
+        return response
+
+    @staticmethod
+    def _join(chunks: list) -> Any:
+        """拼接流式分块为完整回复，无法拼接时返回 None（不写入缓存）"""
+        if not chunks:
+            return None
+        try:
+            combined = chunks[0]
+            for chunk in chunks[1:]:
+                combined = combined + chunk
+        except TypeError:
+            return None
+        return message_chunk_to_message(combined) if isinstance(combined, BaseMessageChunk) else combined
+
+    def invoke(self, input, config=None, **kwargs):
+        cache, routes = self._cache_for_current_node()
+        if cache is None:
+            return self._model.invoke(input, config, **kwargs)
+        prompt = render_messages(input)
+        cached = self._hit(cache, routes, prompt, time.perf_counter())
+        if cached is not None:
+            return cached
+        response = self._model.invoke(input, config, **kwargs)
+        self._store(cache, prompt, response)
+        return response
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        cache, routes = self._cache_for_current_node()
+        if cache is None:
+            return await self._model.ainvoke(input, config, **kwargs)
+        # 渲染和向量化在长 prompt 上仍有几十毫秒，放到线程池中以免阻塞事件循环
+        prompt = await asyncio.to_thread(render_messages, input)
+        cached = await asyncio.to_thread(self._hit, cache, routes, prompt, time.perf_counter())
+        if cached is not None:
+            return cached
+        response = await self._model.ainvoke(input, config, **kwargs)
+        await asyncio.to_thread(self._store, cache, prompt, response)
+        return response
+
+    def stream(self, input, config=None, **kwargs) -> Iterator:
+        cache, routes = self._cache_for_current_node()
+        if cache is None:
+            yield from self._model.stream(input, config, **kwargs)
+            return
+        prompt = render_messages(input)
+        cached = self._hit(cache, routes, prompt, time.perf_counter())
+        if cached is not None:
+            yield self._as_chunk(cached)
+            return
+        chunks = []
+        for chunk in self._model.stream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        response = self._join(chunks)
+        if response is not None:
+            self._store(cache, prompt, response)
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        cache, routes = self._cache_for_current_node()
+        if cache is None:
+            async for chunk in self._model.astream(input, config, **kwargs):
+                yield chunk
+            return
+        prompt = await asyncio.to_thread(render_messages, input)
+        cached = await asyncio.to_thread(self._hit, cache, routes, prompt, time.perf_counter())
+        if cached is not None:
+            yield self._as_chunk(cached)
+            return
+        chunks = []
+        async for chunk in self._model.astream(input, config, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        response = self._join(chunks)
+        if response is not None:
+            await asyncio.to_thread(self._store, cache, prompt, response)
+
+    def __repr__(self) -> str:
+        return f"CachedChatModel({self._model!r})"
+
+
+def wrap_llm_factory(factory: Callable[..., Any], caches: dict[str, SemanticCache]) -> Callable[..., Any]:
+    """
+    包装 LLM 工厂，创建的 LLM 在启用了语义缓存的节点上先查缓存
+
+    Args:
+        factory: 原始 LLM 工厂
+        caches: 节点名称 -> 语义缓存
+    """
+    def cached_factory(*args, **kwargs):
+        params_key = repr((args, sorted(kwargs.items())))
+        return CachedChatModel(factory(*args, **kwargs), caches, params_key)
+
+    return cached_factory
@@ -0,0 +1,105 @@
+# 线程日志的惰性切片视图
+# data_in 继承的消息以视图引用源线程的序列化日志，不复制列表，只在需要时物化
+from collections.abc import Sequence
+from itertools import chain
+from typing import Any
+
+
+class SliceView(Sequence):
+    """
+    源列表 [start, stop) 区间的只读视图
+
+    区间在创建时确定，源列表之后追加的元素不影响视图。
+    """
+    __slots__ = ("_source", "_start", "_stop")
+
+    def __init__(self, source: Sequence, start: int, stop: int):
+        self._source = source
+        self._start = start
+        self._stop = max(start, stop)
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._source[self._start + i] for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("SliceView index out of range")
+        return self._source[self._start + index]
+
+    def __iter__(self):
+        source = self._source
+        for i in range(self._start, self._stop):
+            yield source[i]
+
+    def __repr__(self) -> str:
+        return f"SliceView({self._start}:{self._stop} of {len(self._source)})"
+
+
+class OffsetView(SliceView):
+    """
+    数值列表 [start, stop) 区间的视图，每个元素减去区间起点的值
+
+    用于前缀计数：源线程可见消息数前缀在继承区间上的视图从 0 开始计数。
+    """
+    __slots__ = ("_offset",)
+
+    def __init__(self, source: Sequence, start: int, stop: int):
+        super().__init__(source, start, stop)
+        self._offset = source[start]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [v - self._offset for v in super().__getitem__(index)]
+        return super().__getitem__(index) - self._offset
+
+    def __iter__(self):
+        offset = self._offset
+        for v in super().__iter__():
+            yield v - offset
+
+
+class ThreadLog(Sequence):
+    """
+    线程日志：继承部分为源线程日志的视图，线程自身的新消息追加在本地列表
+
+    支持 _sync_thread_log 与 NodeContext 用到的操作：len、下标、切片（物化为列表）、append。
+    """
+    __slots__ = ("_base", "_own")
+
+    def __init__(self, base: Sequence = ()):
+        self._base = base
+        self._own: list[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._own)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            base_len = len(self._base)
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                if stop <= base_len:
+                    return self._base[start:stop]
+                return list(self._base[start:base_len]) + self._own[max(start - base_len, 0):stop - base_len]
+            return [self[i] for i in range(start, stop, step)]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("ThreadLog index out of range")
+        base_len = len(self._base)
+        return self._base[index] if index < base_len else self._own[index - base_len]
+
+    def __iter__(self):
+        return chain(self._base, self._own)
+
+    def append(self, item: Any):
+        self._own.append(item)
+
+    def __repr__(self) -> str:
+        return f"ThreadLog(base={len(self._base)}, own={len(self._own)})"
@@ -0,0 +1,189 @@
+# 执行前的 token 与费用估算
+# 静态遍历 ExecutionPlan，模拟各线程的消息累积，不调用 LLM 和工具
+import math
+import re
+from typing import Callable, Optional
+
+from simple_llm_workflow import codec
+from simple_llm_workflow.schemas import ExecutionPlan
+
+
+# CJK 字符（含全角标点），按约 1 token/字估算
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_SPACE_RE = re.compile(r"\s+")
+
+# 每条消息的格式开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    快速估算文本的 token 数（不依赖分词器）
+
+    CJK 字符约 1 token/字，其余文本约 4 字符/token。
+    不做全局缓存（会长期持有大段文本）：消息的 token 数由 MessageRecord 缓存，
+    计划估算中的工具描述按工具名缓存。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    rest = _SPACE_RE.sub(" ", _CJK_RE.sub("", text)).strip()
+    return cjk + math.ceil(len(rest) / 4)
+
+
+def _message_tokens(text: str) -> int:
+    return estimate_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_plan(
+    plan: ExecutionPlan,
+    tool_info: Callable[[str], Optional[dict]],
+    default_tools_limit: int = 1,
+    context_window: int = 131072,
+    expected_output_tokens: int = 512,
+    tool_output_tokens: int = 800,
+    input_price_per_1k: float = 0.0,
+    output_price_per_1k: float = 0.0,
+    warn_ratio: float = 0.8
+) -> dict:
+    """
+    估算计划中每个节点的输入/输出 token
+
+    线程消息按父类执行器的规则模拟：
+    - 初始任务作为 main 线程的第一条消息
+    - 线程首次出现时，从 data_in_thread（默认 main）按 data_in_slice 继承消息
+    - 节点追加任务提示、工具调用往返和 LLM 回复；data_out 节点把回复合并到目标线程
+
+    Args:
+        plan: 执行计划
+        tool_info: 工具名称 -> 工具元数据（ToolInfo 字典），未知工具返回 None
+        default_tools_limit: 节点未设置 tools_limit 时每个工具的调用次数
+        context_window: 模型上下文窗口（tokens）
+        expected_output_tokens: 每次 LLM 回复的预计 token 数
+        tool_output_tokens: 每次工具调用结果的预计 token 数
+        input_price_per_1k / output_price_per_1k: 每千 token 价格，用于费用估算
+        warn_ratio: 输入超过上下文窗口的该比例时给出警告
+
+    Returns:
+        PlanEstimateResponse 结构的字典
+    """
+    # 线程 -> 各条消息的 token 数
+    threads: dict[str, list[int]] = {"main": [_message_tokens(plan.task or "")]}
+    tool_schema_tokens: dict[str, Optional[int]] = {}  # 工具名 -> 描述的 token 数（未注册为 None）
+    thread_stats: dict[str, dict] = {}
+    nodes = []
+    warnings = []
+
+    for i, node in enumerate(plan.nodes):
+        node_id = i + 1
+        thread_id = node.thread_id or "main"
+
+        # 线程首次出现：按 data_in 继承消息
+        if thread_id not in threads:
+            source = threads.get(node.data_in_thread or "main", [])
+            start, end = node.data_in_slice or (None, None)
+            threads[thread_id] = list(source[start:end])
+        history = threads[thread_id]
+
+        # 工具：描述/参数表随请求发送，调用次数按 tools_limit 估算
+        tool_names = list(node.tools or [])
+        if node.initial_tool_name and node.initial_tool_name not in tool_names:
+            tool_names.append(node.initial_tool_name)
+        schema_tokens = 0
+        for name in tool_names:
+            if name not in tool_schema_tokens:
+                info = tool_info(name)
+                tool_schema_tokens[name] = None if info is None else estimate_tokens(codec.dumps({
+                    "name": name,
+                    "description": info.get("description"),
+                    "parameters": info.get("json_schema") or info.get("parameters"),
+                }).decode("utf-8"))
+            if tool_schema_tokens[name] is None:
+                warnings.append(f"节点 {node_id} ({node.node_name}): 未注册的工具 {name}")
+                continue
+            schema_tokens += tool_schema_tokens[name]
+
+        limits = node.tools_limit or {}
+        tool_calls = sum(limits.get(name, default_tools_limit or 0) for name in (node.tools or []))
+        if not getattr(node, "enable_tool_loop", True):
+            tool_calls = min(tool_calls, 1)
+        if node.initial_tool_name:
+            tool_calls += 1
+
+        prompt_tokens = _message_tokens(node.task_prompt) if node.task_prompt else 0
+        inherited_tokens = sum(history)
+        input_tokens = inherited_tokens + prompt_tokens + schema_tokens
+        # 每次工具往返把调用与结果追加到上下文，第 k 次 LLM 调用的输入为 input + k * round
+        round_tokens = tool_output_tokens + MESSAGE_OVERHEAD_TOKENS * 2
+        peak_input_tokens = input_tokens + tool_calls * round_tokens
+        # LLM 调用次数：每次工具调用一次 + 最终回复一次（没有任务提示的节点不调用 LLM）
+        llm_calls = (tool_calls + 1) if node.task_prompt else 0
+        node_input_total = llm_calls * input_tokens + round_tokens * llm_calls * (llm_calls - 1) // 2
+        output_tokens = expected_output_tokens if node.task_prompt else 0
+
+        ratio = peak_input_tokens / context_window if context_window else 0.0
+        if ratio >= 1.0:
+            status = "overflow"
+            warnings.append(
+                f"节点 {node_id} ({node.node_name}): 预计输入 {peak_input_tokens} tokens，超出上下文窗口 {context_window}"
+            )
+        elif ratio >= warn_ratio:
+            status = "warning"
+            warnings.append(
+                f"节点 {node_id} ({node.node_name}): 预计输入 {peak_input_tokens} tokens，"
+                f"已达上下文窗口的 {ratio:.0%}"
+            )
+        else:
+            status = "ok"
+
+        nodes.append({
+            "node_id": node_id,
+            "node_name": node.node_name,
+            "thread_id": thread_id,
+            "prompt_tokens": prompt_tokens,
+            "inherited_tokens": inherited_tokens,
+            "tool_schema_tokens": schema_tokens,
+            "tool_calls": tool_calls,
+            "input_tokens": node_input_total,
+            "peak_input_tokens": peak_input_tokens,
+            "output_tokens": output_tokens,
+            "context_ratio": round(ratio, 4),
+            "status": status,
+        })
+
+        # 更新线程消息：任务提示、工具往返、回复
+        if node.task_prompt:
+            history.append(prompt_tokens)
+        for _ in range(tool_calls):
+            history.append(MESSAGE_OVERHEAD_TOKENS)
+            history.append(tool_output_tokens + MESSAGE_OVERHEAD_TOKENS)
+        if output_tokens:
+            history.append(output_tokens + MESSAGE_OVERHEAD_TOKENS)
+        if node.data_out and output_tokens:
+            target = node.data_out_thread or "main"
+            threads.setdefault(target, []).append(output_tokens + MESSAGE_OVERHEAD_TOKENS)
+
+        stats = thread_stats.setdefault(thread_id, {
+            "thread_id": thread_id, "nodes": 0, "input_tokens": 0, "output_tokens": 0, "peak_input_tokens": 0
+        })
+        stats["nodes"] += 1
+        stats["input_tokens"] += node_input_total
+        stats["output_tokens"] += output_tokens
+        stats["peak_input_tokens"] = max(stats["peak_input_tokens"], peak_input_tokens)
+
+    for thread_id, stats in thread_stats.items():
+        stats["final_tokens"] = sum(threads.get(thread_id, []))
+
+    total_input = sum(n["input_tokens"] for n in nodes)
+    total_output = sum(n["output_tokens"] for n in nodes)
+    return {
+        "nodes": nodes,
+        "threads": list(thread_stats.values()),
+        "total_input_tokens": total_input,
+        "total_output_tokens": total_output,
+        "estimated_cost": round(
+            total_input / 1000 * input_price_per_1k + total_output / 1000 * output_price_per_1k, 6
+        ),
+        "context_window": context_window,
+        "warnings": warnings,
+    }
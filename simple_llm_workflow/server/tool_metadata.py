@@ -0,0 +1,151 @@
+# 工具元数据缓存
+# 在注册时提取一次工具的描述、参数表和 JSON Schema，/api/tools 直接返回预先序列化的列表
+import hashlib
+import inspect
+from typing import Any
+
+from simple_llm_workflow import codec
+from simple_llm_workflow.tool_loader import LazyTool
+
+
+def extract_tool_info(name: str, tool: Any) -> dict:
+    """
+    提取工具元数据（与 ToolInfo 字段一致）
+
+    未导入的延迟工具直接使用声明中的元数据，不触发导入。
+    """
+    if isinstance(tool, LazyTool):
+        if not tool.is_loaded:
+            return {
+                "name": name,
+                "description": tool.description,
+                "parameters": tool.spec_parameters,
+                "json_schema": None,
+            }
+        tool = tool.resolve()
+
+    tool_data = {
+        "name": name,
+        "description": getattr(tool, 'description', 'No description'),
+        "json_schema": None,
+    }
+
+    # 尝试从 langchain 工具中提取参数信息
+    try:
+        # 检查是否为具有 args_schema 的 langchain 工具
+        schema = getattr(tool, 'args_schema', None)
+        if schema:
+            # 从 pydantic 模型获取字段信息
+            tool_data["parameters"] = {}
+            if hasattr(schema, 'model_fields'):
+                for field_name, field_info in schema.model_fields.items():
+                    tool_data["parameters"][field_name] = {
+                        "type": str(field_info.annotation),
+                        "required": field_info.is_required(),
+                        "description": field_info.description or ""
+                    }
+            if hasattr(schema, 'model_json_schema'):
+                tool_data["json_schema"] = schema.model_json_schema()
+            elif isinstance(schema, dict):
+                tool_data["json_schema"] = schema
+
+        # 同时尝试从函数签名中获取
+        if hasattr(tool, 'func') and tool.func is not None:
+            sig = inspect.signature(tool.func)
+            if "parameters" not in tool_data:
+                tool_data["parameters"] = {}
+
+            for param_name, param in sig.parameters.items():
+                if param_name not in tool_data["parameters"]:
+                    tool_data["parameters"][param_name] = {
+                        "type": str(param.annotation) if param.annotation != inspect.Parameter.empty else "Any",
+                        "required": param.default == inspect.Parameter.empty,
+                        "description": ""
+                    }
+    except Exception as e:
+        # 如果提取失败，则跳过参数提取
+        print(f"Warning: Could not extract parameters for tool {name}: {e}")
+
+    return tool_data
+
+
+class ToolMetadata:
+    """一组工具预先提取好的元数据（可在线程池中构建，再整体交给 ToolMetadataCache）"""
+
+    def __init__(self, tools: dict[str, Any]):
+        self.infos: dict[str, dict] = {}
+        self.hashes: dict[str, str] = {}
+        self.pending: dict[str, LazyTool] = {}  # 提取时尚未导入的延迟工具，导入后需重新提取
+        for name, tool in tools.items():
+            self.add(name, tool)
+
+    def add(self, name: str, tool: Any):
+        info = extract_tool_info(name, tool)
+        self.infos[name] = info
+        self.hashes[name] = hashlib.sha1(codec.dumps(info)).hexdigest()
+        if isinstance(tool, LazyTool) and not tool.is_loaded:
+            self.pending[name] = tool
+        else:
+            self.pending.pop(name, None)
+
+
+class ToolMetadataCache:
+    """
+    工具元数据缓存
+
+    - 工具注册/重新注册时提取并缓存该工具的元数据和哈希
+    - 未导入的延迟工具先使用声明中的元数据，导入后在下次读取时重新提取
+    - 列表响应体与 ETag 在首次请求时生成，任一工具变化后失效
+    """
+
+    def __init__(self):
+        self._metadata = ToolMetadata({})
+        self._listing: tuple[bytes, str] | None = None  # (响应体, ETag)
+
+    def set(self, name: str, tool: Any):
+        """注册或重新注册工具时更新元数据"""
+        self._metadata.add(name, tool)
+        self._listing = None
+
+    def replace_all(self, tools: dict[str, Any] | ToolMetadata):
+        """
+        整体替换（热重载）
+
+        Args:
+            tools: 工具映射，或已在线程池中提取好的 ToolMetadata（避免在事件循环中逐个提取）
+        """
+        self._metadata = tools if isinstance(tools, ToolMetadata) else ToolMetadata(tools)
+        self._listing = None
+
+    def _refresh_resolved(self):
+        """重新提取已被导入的延迟工具的元数据（参数、JSON Schema 在导入后才可用）"""
+        pending = self._metadata.pending
+        if not pending:
+            return
+        for name, tool in list(pending.items()):
+            if tool.is_loaded:
+                self._metadata.add(name, tool)
+                self._listing = None
+
+    def get(self, name: str) -> dict | None:
+        """单个工具的元数据"""
+        self._refresh_resolved()
+        return self._metadata.infos.get(name)
+
+    def get_hash(self, name: str) -> str | None:
+        """单个工具元数据的哈希"""
+        self._refresh_resolved()
+        return self._metadata.hashes.get(name)
+
+    def listing(self) -> tuple[bytes, str]:
+        """
+        返回 /api/tools 的响应体（ToolListResponse 结构）和 ETag
+        """
+        self._refresh_resolved()
+        if self._listing is None:
+            body = codec.dumps({"tools": list(self._metadata.infos.values())})
+            digest = hashlib.sha1(
+                "".join(f"{n}:{h};" for n, h in self._metadata.hashes.items()).encode()
+            ).hexdigest()
+            self._listing = (body, f'"{digest[:32]}"')
+        return self._listing
@@ -0,0 +1,121 @@
+# tools_config.py 热重载
+# 轮询配置文件的修改时间，变更后在独立模块名下重新导入，并整体替换工具注册表和 LLM 工厂
+import asyncio
+import itertools
+import os
+import sys
+
+from simple_llm_workflow.server.executor_manager import ExecutorManager
+from simple_llm_workflow.server.tool_metadata import ToolMetadata
+from simple_llm_workflow.tool_loader import load_tools_from_file
+
+
+class ToolsConfigWatcher:
+    """
+    tools_config.py 文件监听器
+
+    - 每隔 interval 秒检查文件的 mtime 和大小，变化且稳定 debounce 秒后触发重载
+    - 重载在线程池中执行（导入可能较慢），不阻塞事件循环
+    - 加载失败时保留原有工具，结果记录为热重载事件
+    """
+
+    def __init__(
+        self,
+        manager: ExecutorManager,
+        path: str,
+        interval: float = 1.0,
+        debounce: float = 0.3
+    ):
+        self.manager = manager
+        self.path = path
+        self.interval = interval
+        self.debounce = debounce
+        self._stamp = self._stat()
+        self._task: asyncio.Task | None = None
+        self._reload_lock = asyncio.Lock()
+        self._counter = itertools.count(1)
+        self._module_name: str | None = None
+
+    def _stat(self) -> tuple[int, int] | None:
+        """文件的 (mtime_ns, size)，文件不存在时返回 None"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    # =========================================================================
+    # 生命周期
+    # =========================================================================
+    def start(self):
+        """在当前事件循环中启动监听"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+            print(f"👀 正在监听工具配置: {self.path}")
+
+    async def stop(self):
+        """停止监听"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self._stat()
+            if stamp is None or stamp == self._stamp:
+                continue
+
+            # 等待写入完成（编辑器可能分多次写入）
+            await asyncio.sleep(self.debounce)
+            if self._stat() != stamp:
+                continue
+
+            await self.reload()
+
+    # =========================================================================
+    # 重载
+    # =========================================================================
+    def _load(self, module_name: str) -> dict:
+        """在独立模块名下加载配置（线程池中执行）"""
+        from simple_llm_workflow.main import create_llm_factory_from_config
+
+        config = load_tools_from_file(self.path, module_name=module_name, raise_errors=True)
+        config["llm_factory"] = create_llm_factory_from_config(config)
+        # 元数据提取（参数表、JSON Schema）也在线程池中完成，事件循环只做整体替换
+        config["tool_metadata"] = ToolMetadata(config["tools"])
+        return config
+
+    async def reload(self) -> dict:
+        """
+        重新加载配置并替换工具注册表
+
+        Returns:
+            本次重载的事件记录
+        """
+        async with self._reload_lock:
+            self._stamp = self._stat()
+            module_name = f"tools_config_reload_{next(self._counter)}"
+            try:
+                config = await asyncio.to_thread(self._load, module_name)
+            except Exception as e:
+                print(f"❌ 工具配置热重载失败，继续使用原有工具: {e}")
+                return self.manager.add_tools_reload_event("failed", str(e))
+
+            # 替换在事件循环线程中完成，与请求处理互斥
+            self.manager.replace_tools(config["tools"], config["llm_factory"], config["tool_metadata"])
+
+            # 新模块加载成功后再移除上一次重载的模块
+            if self._module_name is not None:
+                sys.modules.pop(self._module_name, None)
+            self._module_name = module_name
+
+            tools = list(config["tools"].keys())
+            print(f"🔄 工具配置已重载: {tools}")
+            return self.manager.add_tools_reload_event(
+                "success", f"已重载 {len(tools)} 个工具，新创建的执行器将使用新配置", tools
+            )
@@ -3,44 +3,161 @@
 
 从指定目录或文件中加载用户定义的tools。
 支持从 tools_config.py 中读取 TOOLS 字典。
+TOOLS 的值可以是工具对象，也可以是延迟导入声明（首次使用时才导入工具模块）。
 """
 
+import importlib
 import importlib.util
 import os
 import sys
+import threading
 from pathlib import Path
 from typing import Any, Callable
 
 
-def load_tools_from_file(file_path: str) -> dict[str, Any]:
+# =============================================================================
+# 延迟导入的工具
+# =============================================================================
+class LazyTool:
+    """
+    延迟导入的工具声明
+
+    保存工具的导入路径和元数据（描述、参数），列出工具时无需导入工具模块；
+    首次真正使用（创建执行器、访问工具属性或调用）时才导入。
+
+    声明方式（tools_config.py 中 TOOLS 的值）：
+    - "my_project.tools:search"
+    - {"path": "my_project.tools:search", "description": "...", "parameters": {...}}
+    """
+
+    def __init__(
+        self,
+        name: str,
+        import_path: str,
+        description: str = "",
+        parameters: dict[str, Any] | None = None
+    ):
+        module_name, _, attr = import_path.partition(":")
+        if not module_name or not attr:
+            raise ValueError(f"工具 '{name}' 的导入路径格式应为 'module:attr'，但收到了: {import_path}")
+        self.name = name
+        self.import_path = import_path
+        self.spec_description = description
+        self.spec_parameters = parameters
+        self._tool = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """工具模块是否已导入"""
+        return self._tool is not None
+
+    @property
+    def description(self) -> str:
+        """工具描述：优先使用声明中的描述，已导入时回退到工具自身的描述"""
+        if self.spec_description or self._tool is None:
+            return self.spec_description or "No description"
+        return getattr(self._tool, "description", "No description")
+
+    def resolve(self) -> Any:
+        """导入并返回真实的工具对象（线程安全，只导入一次）"""
+        if self._tool is None:
+            with self._lock:
+                if self._tool is None:
+                    module_name, _, attr = self.import_path.partition(":")
+                    try:
+                        target = importlib.import_module(module_name)
+                        for part in attr.split("."):
+                            target = getattr(target, part)
+                    except (ImportError, AttributeError) as e:
+                        raise ValueError(f"无法导入工具 '{self.name}' ({self.import_path}): {e}") from e
+                    self._tool = target
+                    print(f"📥 已导入工具: {self.name} ({self.import_path})")
+        return self._tool
+
+    def __getattr__(self, item: str) -> Any:
+        # 仅在常规属性查找失败时调用：转发给真实工具（触发导入）
+        if item.startswith("__") or item in ("_tool", "_lock"):
+            raise AttributeError(item)
+        return getattr(self.resolve(), item)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "lazy"
+        return f"LazyTool({self.name!r}, {self.import_path!r}, {state})"
+
+
+def resolve_tool(tool: Any) -> Any:
+    """返回真实的工具对象（LazyTool 在此处导入）"""
+    return tool.resolve() if isinstance(tool, LazyTool) else tool
+
+
+def parse_tool_spec(name: str, spec: Any) -> Any:
+    """
+    将 TOOLS 中的一项解析为工具
+
+    字符串和字典声明解析为 LazyTool，其余对象（已导入的工具）原样返回。
+    """
+    if isinstance(spec, str):
+        return LazyTool(name, spec)
+    if isinstance(spec, dict):
+        if "path" not in spec:
+            raise ValueError(f"工具 '{name}' 的声明缺少 'path' 字段")
+        return LazyTool(
+            name,
+            spec["path"],
+            description=spec.get("description", ""),
+            parameters=spec.get("parameters")
+        )
+    return spec
+
+
+def load_tools_from_file(
+    file_path: str,
+    module_name: str = "tools_config",
+    raise_errors: bool = False
+) -> dict[str, Any]:
     """
     从指定的Python文件中加载tools
     
     文件应该导出一个 TOOLS 字典，格式如：
     TOOLS = {
         "tool_name": tool_function,
+        "lazy_tool": "my_project.tools:lazy_tool",  # 延迟导入
         ...
     }
     
     也可以导出以下内容：
     - LLM_FACTORY: 可选的LLM工厂函数
     - LLM_CONFIG: 可选的LLM配置字典 (model, api_key, base_url等)
+    - LLM_PROVIDERS: 可选的多供应商配置列表，按延迟和错误率路由并自动切换
+    - LLM_PINS: 可选的节点固定供应商 {节点名称: 供应商名称}（配合 LLM_PROVIDERS）
     
     Args:
         file_path: Python文件的路径
+        module_name: 加载后的模块名（热重载时使用独立的模块名，与已加载的配置隔离）
+        raise_errors: 出错时抛出 ValueError，而不是返回空配置
         
     Returns:
-        包含加载配置的字典: {"tools": {...}, "llm_factory": ..., "llm_config": ...}
+        包含加载配置的字典: {"tools": {...}, "llm_factory": ..., "llm_config": ...,
+                             "llm_providers": ..., "llm_pins": ...}
     """
     file_path = Path(file_path).resolve()
+    empty = {"tools": {}, "llm_factory": None, "llm_config": None, "llm_providers": None, "llm_pins": None}
+
+    def fail(message: str) -> dict[str, Any]:
+        if raise_errors:
+            raise ValueError(message)
+        print(message)
+        return empty
     
     if not file_path.exists():
-        print(f"⚠️ 配置文件不存在: {file_path}")
-        return {"tools": {}, "llm_factory": None, "llm_config": None}
+        return fail(f"⚠️ 配置文件不存在: {file_path}")
     
     if not file_path.suffix == ".py":
-        print(f"⚠️ 配置文件必须是.py文件: {file_path}")
-        return {"tools": {}, "llm_factory": None, "llm_config": None}
+        return fail(f"⚠️ 配置文件必须是.py文件: {file_path}")
     
     # 将配置文件所在目录添加到sys.path，以便导入用户项目的模块
     config_dir = str(file_path.parent)
@@ -49,27 +166,36 @@ def load_tools_from_file(file_path: str) -> dict[str, Any]:
     
     try:
         # 动态加载模块
-        spec = importlib.util.spec_from_file_location("tools_config", file_path)
+        spec = importlib.util.spec_from_file_location(module_name, file_path)
         if spec is None or spec.loader is None:
-            print(f"⚠️ 无法加载配置文件: {file_path}")
-            return {"tools": {}, "llm_factory": None, "llm_config": None}
+            return fail(f"⚠️ 无法加载配置文件: {file_path}")
         
         module = importlib.util.module_from_spec(spec)
-        sys.modules["tools_config"] = module
-        spec.loader.exec_module(module)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
         
         result = {
             "tools": {},
             "llm_factory": None,
-            "llm_config": None
+            "llm_config": None,
+            "llm_providers": None,
+            "llm_pins": None
         }
         
         # 读取 TOOLS 字典
         if hasattr(module, "TOOLS"):
             tools = getattr(module, "TOOLS")
             if isinstance(tools, dict):
-                result["tools"] = tools
-                print(f"✅ 已加载 {len(tools)} 个工具: {list(tools.keys())}")
+                result["tools"] = {name: parse_tool_spec(name, spec) for name, spec in tools.items()}
+                lazy_count = sum(isinstance(t, LazyTool) for t in result["tools"].values())
+                print(f"✅ 已加载 {len(tools)} 个工具: {list(tools.keys())}"
+                      + (f"（{lazy_count} 个延迟导入）" if lazy_count else ""))
+            elif raise_errors:
+                raise ValueError(f"TOOLS 必须是字典，但收到了: {type(tools)}")
             else:
                 print(f"⚠️ TOOLS 必须是字典，但收到了: {type(tools)}")
         else:
@@ -85,13 +211,24 @@ def load_tools_from_file(file_path: str) -> dict[str, Any]:
             result["llm_config"] = getattr(module, "LLM_CONFIG")
             print(f"✅ 已加载 LLM_CONFIG: {list(result['llm_config'].keys())}")
         
+        # 读取可选的 LLM_PROVIDERS / LLM_PINS
+        if hasattr(module, "LLM_PROVIDERS"):
+            result["llm_providers"] = list(getattr(module, "LLM_PROVIDERS"))
+            result["llm_pins"] = dict(getattr(module, "LLM_PINS", None) or {})
+            print(f"✅ 已加载 {len(result['llm_providers'])} 个 LLM 供应商"
+                  + (f"，{len(result['llm_pins'])} 个节点固定" if result["llm_pins"] else ""))
+        
         return result
         
     except Exception as e:
+        if raise_errors:
+            if isinstance(e, ValueError):
+                raise
+            raise ValueError(f"加载配置文件时出错: {type(e).__name__}: {e}") from e
         print(f"❌ 加载配置文件时出错: {e}")
         import traceback
         traceback.print_exc()
-        return {"tools": {}, "llm_factory": None, "llm_config": None}
+        return empty
 
 
 TOOLS_CONFIG_TEMPLATE = '''"""
@@ -107,7 +244,17 @@ tools_config.py - Tool 配置文件
 # from my_project.tools import search_tool, calculate_tool
 
 # ============================================================================
-# 方式2：直接定义tool（使用 langchain 的 @tool 装饰器）
+# 方式2：延迟导入（推荐用于依赖较重的工具，首次使用时才导入，加快启动）
+# ============================================================================
+# "search": "my_project.tools:search_tool"
+# "search": {
+#     "path": "my_project.tools:search_tool",
+#     "description": "搜索工具",
+#     "parameters": {"query": {"type": "str", "required": True, "description": "关键词"}},
+# }
+
+# ============================================================================
+# 方式3：直接定义tool（使用 langchain 的 @tool 装饰器）
 # ============================================================================
 from langchain_core.tools import tool
 
@@ -124,6 +271,7 @@ TOOLS = {
     "example_tool": example_tool,
     # "search": search_tool,
     # "calculate": calculate_tool,
+    # "report": "my_project.tools:report_tool",
 }
 
 
@@ -135,6 +283,15 @@ TOOLS = {
 #     "api_key": "sk-xxx",
 #     "base_url": "https://api.openai.com/v1",
 # }
+
+# ============================================================================
+# 可选：多供应商路由（按延迟和错误率选择端点，出错时自动切换）
+# ============================================================================
+# LLM_PROVIDERS = [
+#     {"name": "dashscope", "model": "qwen-plus"},
+#     {"name": "openai", "model": "gpt-4o", "api_key": "sk-xxx", "base_url": "https://api.openai.com/v1"},
+# ]
+# LLM_PINS = {"总结": "openai"}  # 节点名称 -> 优先使用的供应商
 '''
 
 
@@ -0,0 +1,198 @@
+"""codec 编解码 / 压缩协商与 responses 响应构建"""
+import gzip
+import json
+from datetime import datetime
+from enum import Enum
+
+import pytest
+from pydantic import BaseModel
+
+from simple_llm_workflow import codec
+
+
+class Color(Enum):
+    RED = "red"
+
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+
+# =============================================================================
+# 压缩协商
+# =============================================================================
+@pytest.mark.parametrize("header", [None, "", "identity", "br", "deflate, br", "gzip;q=0", "*;q=0"])
+def test_negotiate_no_supported_encoding(header):
+    assert codec.negotiate_encoding(header) is None
+
+
+@pytest.mark.parametrize("header", ["gzip", "GZIP", " gzip ", "deflate, gzip", "gzip;q=0.5", "br;q=1, gzip;q=0.1"])
+def test_negotiate_gzip(monkeypatch, header):
+    monkeypatch.setattr(codec, "SUPPORTED_ENCODINGS", ("gzip",))
+    assert codec.negotiate_encoding(header) == "gzip"
+
+
+def test_negotiate_wildcard_picks_first_supported():
+    assert codec.negotiate_encoding("*") == codec.SUPPORTED_ENCODINGS[0]
+
+
+def test_negotiate_invalid_q_is_rejected(monkeypatch):
+    monkeypatch.setattr(codec, "SUPPORTED_ENCODINGS", ("gzip",))
+    assert codec.negotiate_encoding("gzip;q=abc") is None
+
+
+def test_negotiate_prefers_highest_q(monkeypatch):
+    monkeypatch.setattr(codec, "SUPPORTED_ENCODINGS", ("zstd", "gzip"))
+    assert codec.negotiate_encoding("gzip;q=0.9, zstd;q=0.5") == "gzip"
+    assert codec.negotiate_encoding("gzip;q=0.5, zstd;q=0.9") == "zstd"
+    # q 相同时按服务端优先级
+    assert codec.negotiate_encoding("gzip, zstd") == "zstd"
+    # 显式的 q=0 优先于通配符
+    assert codec.negotiate_encoding("zstd;q=0, *") == "gzip"
+
+
+def test_accept_encoding_lists_supported():
+    assert codec.ACCEPT_ENCODING == ", ".join(codec.SUPPORTED_ENCODINGS)
+
+
+# =============================================================================
+# 压缩 / 解压
+# =============================================================================
+PAYLOAD = codec.dumps({"messages": [{"role": "user", "content": "你好 " * 200}] * 20})
+
+
+@pytest.mark.parametrize("encoding", codec.SUPPORTED_ENCODINGS)
+def test_compress_roundtrip(encoding):
+    compressed = codec.compress(PAYLOAD, encoding)
+    assert len(compressed) < len(PAYLOAD)
+    assert codec.decompress(compressed, encoding) == PAYLOAD
+
+
+def test_gzip_is_standard_gzip():
+    assert gzip.decompress(codec.compress(PAYLOAD, "gzip")) == PAYLOAD
+
+
+@pytest.mark.parametrize("encoding", [None, "", "identity"])
+def test_decompress_passthrough(encoding):
+    assert codec.decompress(PAYLOAD, encoding) is PAYLOAD
+
+
+def test_unknown_encoding_raises():
+    with pytest.raises(ValueError):
+        codec.compress(PAYLOAD, "br")
+    with pytest.raises(ValueError):
+        codec.decompress(PAYLOAD, "br")
+
+
+def test_zstd_without_content_size():
+    zstandard = pytest.importorskip("zstandard")
+    # 流式压缩的帧不写入 content size
+    compressor = zstandard.ZstdCompressor().compressobj()
+    frame = compressor.compress(PAYLOAD) + compressor.flush()
+    assert codec.decompress(frame, "zstd") == PAYLOAD
+
+
+# =============================================================================
+# JSON
+# =============================================================================
+DATA = {
+    "text": "中文 ✓",
+    "when": datetime(2024, 1, 2, 3, 4, 5),
+    "color": Color.RED,
+    "tags": {"a"},
+    "pair": (1, 2),
+    "point": Point(x=1, y=2),
+}
+EXPECTED = {
+    "text": "中文 ✓",
+    "when": "2024-01-02T03:04:05",
+    "color": "red",
+    "tags": ["a"],
+    "pair": [1, 2],
+    "point": {"x": 1, "y": 2},
+}
+
+
+def test_dumps_loads_roundtrip():
+    body = codec.dumps(DATA)
+    assert isinstance(body, bytes)
+    assert codec.loads(body) == EXPECTED
+    assert codec.loads(body.decode("utf-8")) == EXPECTED
+
+
+def test_stdlib_fallback_matches(monkeypatch):
+    monkeypatch.setattr(codec, "orjson", None)
+    body = codec.dumps(DATA)
+    assert "中文".encode("utf-8") in body  # 不转义非 ASCII
+    assert json.loads(body) == EXPECTED
+    assert codec.loads(body) == EXPECTED
+
+
+def test_dumps_rejects_unknown_types(monkeypatch):
+    monkeypatch.setattr(codec, "orjson", None)
+    with pytest.raises(TypeError):
+        codec.dumps({"x": object()})
+
+
+# =============================================================================
+# 响应构建
+# =============================================================================
+def _request(**headers):
+    starlette_requests = pytest.importorskip("starlette.requests")
+    return starlette_requests.Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+@pytest.fixture
+def responses():
+    pytest.importorskip("fastapi")
+    from simple_llm_workflow.server import responses
+    return responses
+
+
+def test_encoded_response_compresses_large_body(responses, monkeypatch):
+    monkeypatch.setattr(codec, "SUPPORTED_ENCODINGS", ("gzip",))
+    content = {"items": ["x" * 100] * 50}
+    response = responses.encoded_response(_request(accept_encoding="gzip"), content)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert codec.loads(gzip.decompress(response.body)) == content
+
+
+def test_encoded_response_small_or_unaccepted_body(responses):
+    small = responses.encoded_response(_request(accept_encoding="gzip"), {"a": 1})
+    assert "content-encoding" not in small.headers
+    assert codec.loads(small.body) == {"a": 1}
+
+    large = {"items": ["x" * 100] * 50}
+    plain = responses.encoded_response(_request(), large)
+    assert "content-encoding" not in plain.headers
+    assert codec.loads(plain.body) == large
+
+
+def test_encoded_response_dumps_models(responses):
+    response = responses.encoded_response(_request(), Point(x=3, y=4), status_code=201)
+    assert response.status_code == 201
+    assert codec.loads(response.body) == {"x": 3, "y": 4}
+
+
+@pytest.mark.parametrize("if_none_match", ['"v1"', '"v0", "v1"', "*", ' "v1" '])
+def test_etag_response_not_modified(responses, if_none_match):
+    response = responses.etag_response(_request(if_none_match=if_none_match), b"{}", '"v1"')
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == '"v1"'
+
+
+def test_etag_response_changed(responses, monkeypatch):
+    monkeypatch.setattr(codec, "SUPPORTED_ENCODINGS", ("gzip",))
+    body = codec.dumps({"tools": ["t" * 50] * 50})
+    response = responses.etag_response(_request(if_none_match='"v0"', accept_encoding="gzip"), body, '"v1"')
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"v1"'
+    assert gzip.decompress(response.body) == body
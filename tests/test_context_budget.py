@@ -0,0 +1,162 @@
+"""ContextBudget.select：保留开头与尾部，工具结果不与工具调用分离"""
+import random
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from simple_llm_workflow.server.context_budget import ContextBudget
+
+
+def _call(call_id: str) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": "search", "args": {}, "id": call_id}])
+
+
+def _result(call_id: str) -> ToolMessage:
+    return ToolMessage(content="result", tool_call_id=call_id)
+
+
+def _kept(selection, n: int) -> list[int]:
+    head, drop_start, tail_start = selection
+    return sorted(set(head) | set(range(tail_start, n)))
+
+
+def _assert_pairs_intact(messages, kept: list[int]):
+    """保留的每条工具结果之前都紧接着保留了同一轮的工具调用（或同一轮的其他结果）"""
+    kept_set = set(kept)
+    for i in kept:
+        if isinstance(messages[i], ToolMessage):
+            j = i - 1
+            while j >= 0 and isinstance(messages[j], ToolMessage):
+                assert j in kept_set, f"工具结果 {i} 与同轮结果 {j} 被拆开"
+                j -= 1
+            assert j >= 0 and j in kept_set and messages[j].tool_calls, f"工具结果 {i} 缺少对应的工具调用"
+
+
+def test_invalid_strategy():
+    with pytest.raises(ValueError):
+        ContextBudget(max_tokens=100, strategy="drop_all")
+
+
+def test_within_budget_returns_none():
+    budget = ContextBudget(max_tokens=100)
+    messages = [HumanMessage(content="a"), AIMessage(content="b"), HumanMessage(content="c")]
+    assert budget.select(messages, [10, 10, 10], 30) is None
+    assert budget.select(messages[:1], [500], 30) is None
+
+
+def test_limit_for_threads():
+    budget = ContextBudget(max_tokens=100, thread_max_tokens={"a": 50, "b": 0})
+    assert budget.limit_for("a") == 50
+    assert budget.limit_for("b") is None
+    assert budget.limit_for("c") == 100
+    assert budget.limit_for(None) == 100
+
+
+def test_truncate_keeps_system_first_and_recent():
+    messages = [
+        SystemMessage(content="sys"), HumanMessage(content="task"),
+        AIMessage(content="1"), HumanMessage(content="2"), AIMessage(content="3"), HumanMessage(content="last"),
+    ]
+    head, drop_start, tail_start = ContextBudget(max_tokens=0, keep_first=1).select(messages, [10] * 6, 40)
+    assert head == [0, 1]
+    assert drop_start == 2
+    assert tail_start == 4  # 剩余 20 tokens：保留最后两条
+
+
+def test_head_keeps_results_of_its_tool_call():
+    messages = [
+        _call("c1"), _result("c1"), _result("c1"),
+        HumanMessage(content="q"), AIMessage(content="a"), HumanMessage(content="q"), AIMessage(content="a"),
+        HumanMessage(content="last"),
+    ]
+    head, drop_start, tail_start = ContextBudget(max_tokens=0, keep_first=1).select(messages, [10] * 8, 60)
+    assert head == [0, 1, 2]
+    assert drop_start == 3
+    _assert_pairs_intact(messages, _kept((head, drop_start, tail_start), len(messages)))
+
+
+def test_tail_does_not_start_with_tool_result():
+    messages = [
+        HumanMessage(content="task"), HumanMessage(content="old"),
+        _call("c1"), _result("c1"), _result("c1"),
+        AIMessage(content="answer"), HumanMessage(content="last"),
+    ]
+    counts = [10, 10, 50, 10, 10, 10, 10]
+    # 剩余预算只够 [结果, 结果, 回复, 最后一条]，尾部需要向前扩展到工具调用
+    head, drop_start, tail_start = ContextBudget(max_tokens=0, keep_first=1).select(messages, counts, 50)
+    assert tail_start == 2
+    _assert_pairs_intact(messages, _kept((head, drop_start, tail_start), len(messages)))
+
+
+def test_cannot_compress_without_splitting():
+    messages = [HumanMessage(content="task"), _call("c1"), _result("c1"), _result("c1"), HumanMessage(content="last")]
+    # 丢弃区间只剩工具调用与其结果，无法在不拆分的情况下压缩
+    assert ContextBudget(max_tokens=0, keep_first=1).select(messages, [10, 10, 10, 10, 10], 35) is None
+
+
+def test_keep_recent_keeps_all_system_messages():
+    messages = [
+        SystemMessage(content="sys"), HumanMessage(content="task"), AIMessage(content="1"),
+        SystemMessage(content="note"), HumanMessage(content="2"), AIMessage(content="3"), HumanMessage(content="last"),
+    ]
+    head, drop_start, tail_start = ContextBudget(max_tokens=0, strategy="keep_recent").select(messages, [10] * 7, 40)
+    assert drop_start == 1  # 不保留 keep_first
+    assert 0 in head and 3 in head
+    assert 1 not in head and 2 not in head
+    # 两条系统消息计入预算，剩余 20 tokens 保留最后两条
+    assert tail_start == 5
+
+
+def test_summarize_reserves_summary_tokens():
+    messages = [HumanMessage(content=str(i)) for i in range(6)]
+    truncate = ContextBudget(max_tokens=0, keep_first=1).select(messages, [10] * 6, 50)
+    summarize = ContextBudget(max_tokens=0, keep_first=1, strategy="summarize", summary_max_tokens=20).select(
+        messages, [10] * 6, 50
+    )
+    assert truncate[2] == 2
+    assert summarize[2] == 4
+
+
+def _conversation(rng: random.Random) -> list:
+    messages = []
+    if rng.random() < 0.5:
+        messages.append(SystemMessage(content="sys"))
+    for turn in range(rng.randint(1, 12)):
+        kind = rng.random()
+        if kind < 0.4:
+            call_id = f"c{turn}"
+            messages.append(_call(call_id))
+            messages.extend(_result(call_id) for _ in range(rng.randint(1, 3)))
+        elif kind < 0.7:
+            messages.append(AIMessage(content="a"))
+        else:
+            messages.append(HumanMessage(content="q"))
+    messages.append(HumanMessage(content="last"))
+    return messages
+
+
+@pytest.mark.parametrize("strategy", ["truncate", "keep_recent", "summarize"])
+def test_select_never_splits_tool_calls(strategy):
+    rng = random.Random(strategy)
+    for _ in range(500):
+        messages = _conversation(rng)
+        counts = [rng.randint(1, 30) for _ in messages]
+        budget = ContextBudget(max_tokens=0, strategy=strategy, keep_first=rng.randint(0, 3), summary_max_tokens=5)
+        limit = rng.randint(1, sum(counts))
+        selection = budget.select(messages, counts, limit)
+        if selection is None:
+            continue
+        head, drop_start, tail_start = selection
+        n = len(messages)
+        assert head == sorted(head)
+        assert all(i < drop_start for i in head) or strategy == "keep_recent"
+        assert drop_start < tail_start <= n - 1  # 至少丢弃一条，最后一条始终保留
+        kept = _kept(selection, n)
+        assert kept[-1] == n - 1
+        assert len(kept) < n
+        _assert_pairs_intact(messages, kept)
+        # 未因工具配对向前扩展时，保留部分不超出预算
+        if not isinstance(messages[tail_start], AIMessage) or not messages[tail_start].tool_calls:
+            reserved = budget.summary_max_tokens if strategy == "summarize" else 0
+            if sum(counts[i] for i in head) + counts[n - 1] + reserved <= limit:
+                assert sum(counts[i] for i in kept) + reserved <= limit
@@ -0,0 +1,112 @@
+"""NodeContext 基于线程日志偏移量的分页"""
+import random
+
+import pytest
+
+from simple_llm_workflow.schemas import NodeContext
+from simple_llm_workflow.server.thread_view import OffsetView, SliceView, ThreadLog
+
+
+def _log(pattern: str) -> tuple[list, list[int]]:
+    """按模式构建日志：'m' 为可见消息，'.' 为不展示的消息（None）；返回 (日志, 可见消息数前缀)"""
+    log, visible = [], [0]
+    for i, c in enumerate(pattern):
+        item = {"role": "user", "content": str(i)} if c == "m" else None
+        log.append(item)
+        visible.append(visible[-1] + (item is not None))
+    return log, visible
+
+
+def _context(log, visible, before_end, after_end, with_visible=True) -> NodeContext:
+    return NodeContext.from_log(
+        log, before_end, log, after_end,
+        before_visible=visible if with_visible else None,
+        after_visible=visible if with_visible else None,
+        node_id=1, node_name="n", thread_id="t"
+    )
+
+
+def _expected(log, end):
+    return [m for m in log[:end] if m is not None]
+
+
+@pytest.mark.parametrize("pattern", ["", "m", ".", "mmmm", "....", ".m.m.", "m..m..m", "..mm..mm.."])
+@pytest.mark.parametrize("with_visible", [True, False])
+def test_message_page_matches_full_slice(pattern, with_visible):
+    log, visible = _log(pattern)
+    for end in range(len(log) + 1):
+        context = _context(log, visible, end, len(log), with_visible)
+        expected = _expected(log, end)
+        assert context.message_count("before") == len(expected)
+        assert context.messages("before") == expected
+        assert list(context.iter_messages("before")) == expected
+        for offset in range(len(expected) + 2):
+            assert context.message_page("before", offset) == expected[offset:]
+            for limit in range(len(expected) + 2):
+                assert context.message_page("before", offset, limit) == expected[offset:offset + limit], (
+                    pattern, end, offset, limit
+                )
+
+
+def test_message_page_random():
+    rng = random.Random(0)
+    for _ in range(200):
+        log, visible = _log("".join(rng.choice("mm.") for _ in range(rng.randint(0, 60))))
+        end = rng.randint(0, len(log))
+        context = _context(log, visible, end, len(log))
+        expected = _expected(log, end)
+        offset = rng.randint(0, len(expected) + 3)
+        limit = rng.choice([None, rng.randint(0, 20)])
+        stop = None if limit is None else offset + limit
+        assert context.message_page("before", offset, limit) == expected[offset:stop]
+
+
+def test_message_page_does_not_copy_messages():
+    log, visible = _log("m.m")
+    page = _context(log, visible, 3, 3).message_page("after", 1, 1)
+    assert page[0] is log[2]
+
+
+def test_message_page_on_thread_log_views():
+    # data_in 线程：日志是源日志区间的视图 + 本线程追加，可见前缀是源前缀的 OffsetView
+    source, source_visible = _log("m.mm..m.m")
+    start, stop = 2, 7
+    log = ThreadLog(SliceView(source, start, stop))
+    visible = ThreadLog(OffsetView(source_visible, start, stop + 1))
+    for item in ({"role": "assistant", "content": "a"}, None, {"role": "user", "content": "b"}):
+        log.append(item)
+        visible.append(visible[-1] + (item is not None))
+
+    flat = list(log)
+    for end in range(len(flat) + 1):
+        context = _context(log, visible, end, len(flat))
+        expected = _expected(flat, end)
+        assert context.message_count("before") == len(expected)
+        for offset in range(len(expected) + 1):
+            for limit in (None, 0, 1, 2, 5):
+                stop_ = None if limit is None else offset + limit
+                assert context.message_page("before", offset, limit) == expected[offset:stop_]
+
+
+def test_materialized_context_pages_lists():
+    context = NodeContext(
+        node_id=1, node_name="n", thread_id="t",
+        thread_messages_before=[{"content": "a"}, {"content": "b"}],
+        thread_messages_after=[{"content": "a"}, {"content": "b"}, {"content": "c"}],
+    )
+    assert context.message_count("after") == 3
+    assert context.message_page("after", 1, 1) == [{"content": "b"}]
+    assert context.message_page("before", 1) == [{"content": "b"}]
+
+
+def test_materialize_fills_lists():
+    log, visible = _log("m.mm")
+    context = _context(log, visible, 2, 4).materialize()
+    assert context.thread_messages_before == _expected(log, 2)
+    assert context.thread_messages_after == _expected(log, 4)
+
+
+def test_invalid_which():
+    log, visible = _log("m")
+    with pytest.raises(ValueError):
+        _context(log, visible, 1, 1).message_page("middle")
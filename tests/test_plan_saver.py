@@ -0,0 +1,87 @@
+"""计划文件增量保存：拼接的片段与 json.dump(indent=2, ensure_ascii=False) 逐字节一致"""
+import json
+import random
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from simple_llm_workflow.qt_front.plan_saver import atomic_write_text, join_fragments, pattern_fragment
+
+
+def _joined(data: dict) -> str:
+    return join_fragments(list(data), {name: pattern_fragment(plan) for name, plan in data.items()})
+
+
+def _dumped(data: dict) -> str:
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("data", [
+    {},
+    {"only": {}},
+    {"a": {"task": "t", "nodes": []}, "b": {"task": "u", "nodes": [{"node_name": "n", "data_in_slice": None}]}},
+    {"中文模式": {"task": "总结一下：{topic}", "nodes": [{"node_name": "节点一", "tools": ["搜索"]}]}},
+    {'quote "name"': {"task": 'say "hi"\nthen\tleave'}, "back\\slash\nnewline": {"x": "\\n"}},
+    {"emoji 🚀": {"task": "🚀 launch", "nested": {"deep": {"deeper": [1, 2.5, True, None, [], {}]}}}},
+    {"p": {"empty_list": [], "empty_dict": {}, "list_of_empty": [[], {}], "num": -0.0, "big": 10 ** 20}},
+])
+def test_join_fragments_matches_json_dumps(data):
+    assert _joined(data) == _dumped(data)
+
+
+def _random_value(rng: random.Random, depth: int):
+    kinds = ["str", "int", "float", "bool", "none"] + (["list", "dict"] if depth < 4 else [])
+    kind = rng.choice(kinds)
+    if kind == "str":
+        return "".join(rng.choice('ab 中"\\\n\t{}é🚀') for _ in range(rng.randint(0, 8)))
+    if kind == "int":
+        return rng.randint(-1000, 1000)
+    if kind == "float":
+        return rng.uniform(-1e6, 1e6)
+    if kind == "bool":
+        return rng.random() < 0.5
+    if kind == "none":
+        return None
+    if kind == "list":
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {_random_value_key(rng): _random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+def _random_value_key(rng: random.Random) -> str:
+    return "".join(rng.choice('kv 键"\\\n') for _ in range(rng.randint(1, 6)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_join_fragments_matches_json_dumps_random(seed):
+    rng = random.Random(seed)
+    data = {_random_value_key(rng): _random_value(rng, 1) for _ in range(rng.randint(1, 6))}
+    data = {name: plan if isinstance(plan, dict) else {"value": plan} for name, plan in data.items()}
+    assert _joined(data) == _dumped(data)
+
+
+def test_cached_fragments_reused_after_edit():
+    """只重新序列化修改过的 pattern，其余复用缓存的片段，结果仍与整体序列化一致"""
+    data = {"a": {"task": "1"}, "b": {"task": "2", "nodes": [{"n": 1}]}, "c": {"task": "3"}}
+    fragments = {name: pattern_fragment(plan) for name, plan in data.items()}
+    data["b"]["nodes"].append({"n": 2})
+    fragments["b"] = pattern_fragment(data["b"])
+    del data["c"], fragments["c"]
+    data["d"] = {"task": "新增"}
+    fragments["d"] = pattern_fragment(data["d"])
+    assert join_fragments(list(data), fragments) == _dumped(data)
+
+
+def test_written_file_matches_json_dump(tmp_path):
+    data = {"中文": {"task": "a\nb", "nodes": [{"node_name": "x", "tools": []}]}, "second": {}}
+    expected_path = tmp_path / "expected.json"
+    with open(expected_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    path = tmp_path / "plans.json"
+    path.write_text("旧内容", encoding="utf-8")
+    atomic_write_text(str(path), _joined(data))
+
+    assert path.read_bytes() == expected_path.read_bytes()
+    assert json.loads(path.read_text(encoding="utf-8")) == data
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
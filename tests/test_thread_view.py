@@ -0,0 +1,97 @@
+"""线程日志视图：SliceView / OffsetView / ThreadLog"""
+import pytest
+
+from simple_llm_workflow.server.thread_view import OffsetView, SliceView, ThreadLog
+
+
+def test_slice_view_indexing():
+    source = list(range(10))
+    view = SliceView(source, 2, 6)
+    assert len(view) == 4
+    assert list(view) == [2, 3, 4, 5]
+    assert view[0] == 2 and view[3] == 5
+    assert view[-1] == 5 and view[-4] == 2
+    with pytest.raises(IndexError):
+        view[4]
+    with pytest.raises(IndexError):
+        view[-5]
+
+
+@pytest.mark.parametrize("index", [
+    slice(None), slice(1, 3), slice(-2, None), slice(None, None, 2), slice(3, 1), slice(-10, 10), slice(None, None, -1)
+])
+def test_slice_view_slicing_matches_list(index):
+    source = list(range(10))
+    view = SliceView(source, 2, 8)
+    assert view[index] == source[2:8][index]
+    assert isinstance(view[index], list)
+
+
+def test_slice_view_is_fixed_at_creation():
+    source = [0, 1, 2]
+    view = SliceView(source, 1, 3)
+    source.append(3)
+    assert list(view) == [1, 2]
+
+
+def test_slice_view_empty_range():
+    view = SliceView([1, 2, 3], 2, 1)
+    assert len(view) == 0
+    assert list(view) == []
+    assert view[:] == []
+
+
+def test_offset_view_subtracts_start_value():
+    prefix = [0, 1, 1, 2, 3, 3, 4]  # 可见消息数前缀
+    view = OffsetView(prefix, 2, 6)
+    assert list(view) == [0, 1, 2, 2]
+    assert view[0] == 0 and view[-1] == 2
+    assert view[1:3] == [1, 2]
+    assert len(view) == 4
+
+
+def test_thread_log_base_and_own():
+    log = ThreadLog(SliceView(list("abcdef"), 1, 4))
+    log.append("x")
+    log.append("y")
+    expected = list("bcd") + ["x", "y"]
+    assert len(log) == 5
+    assert list(log) == expected
+    for i in range(-5, 5):
+        assert log[i] == expected[i]
+    with pytest.raises(IndexError):
+        log[5]
+    with pytest.raises(IndexError):
+        log[-6]
+
+
+def test_thread_log_slices_across_boundary():
+    log = ThreadLog(SliceView(list(range(10)), 0, 4))
+    for v in (10, 11, 12):
+        log.append(v)
+    expected = [0, 1, 2, 3, 10, 11, 12]
+    for start in range(-8, 9):
+        for stop in range(-8, 9):
+            assert list(log[start:stop]) == expected[start:stop], (start, stop)
+    assert log[::2] == expected[::2]
+    assert log[::-1] == expected[::-1]
+
+
+def test_thread_log_nested_views():
+    # data_in 线程从另一个 data_in 线程继承：ThreadLog 的切片视图再作为 base
+    parent = ThreadLog(SliceView(list("abc"), 0, 3))
+    parent.append("d")
+    child = ThreadLog(SliceView(parent, 1, 4))
+    child.append("e")
+    assert list(child) == list("bcde")
+    assert child[1:] == list("cde")
+    # 父日志之后追加不影响子视图
+    parent.append("z")
+    assert list(child) == list("bcde")
+
+
+def test_thread_log_without_base():
+    log = ThreadLog()
+    assert len(log) == 0
+    log.append(1)
+    assert list(log) == [1] and log[0] == 1 and log[:] == [1]